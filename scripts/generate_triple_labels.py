@@ -1,16 +1,16 @@
-import cv2
 import random
 import numpy as np
-import pandas as pd
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 from os import makedirs
-from os.path import join
-from shutil import move
 from pathlib import Path
-from random import shuffle
+from typing import Tuple
 from natsort import natsorted
 import matplotlib.pyplot as plt
-import xml.etree.ElementTree as ET
+
+from src.dataset import AnnotationIndex, BuildCache, VideoBuild, split_clip_indices, write_video_clips
+from src.video_io import ClipSpec, VideoIndex
 
 plt.rcParams['figure.figsize'] = [15, 10]
 
@@ -24,290 +24,248 @@ videos = [vid for vid in videos if vid.stem in [annot.stem for annot in annotati
 pairs = list(zip(videos, annotations))
 
 
-def get_label(annots, label_name):
-    return [f.get('name') for f in annots if f.find('tag').get('label') == label_name]
-
-
-def get_frame_nos(annot_path, label='serving-start'):
-    # Parse file
-    data = ET.parse(annot_path)
-    # Separate all images tags
-    images = data.findall('image')
-    # Filter the images with no image_tag
-    images = [img for img in images if img.find('tag') is not None]
-    # Get the image frame number of the ones that matches the label given like `serving-start`, ....
-    frame_str = get_label(images, label)
-    frame_nos = [int(f.split('_')[1]) for f in frame_str]
-    return frame_nos
-
-
-def random_start_frame(st, end, divisions=5, vdo_length=50):
+def random_start_frame(st, end, divisions=5, vdo_length=50, rng: random.Random = random):
     arr = np.arange(st, end - vdo_length, dtype=np.int32)
     arrays = np.array_split(arr, divisions)
-    results = [random.choice(r.tolist()) for r in arrays]
+    results = [rng.choice(r.tolist()) for r in arrays]
     return results
 
 
-def write_video(cap: cv2.VideoCapture, st: int, fps: int, width: int, height: int,
-                video_length: int, output_path: Path, video: Path, label: str, augment_LR=True):
-    cap.set(1, st)
-    filename = f'{label}_{video.stem}_st_{st}_end_{st + video_length}'
-    output_file = (output_path / (filename + '.mp4')).as_posix()
-    output_file_LR = (output_path / (filename + '_flipped_LR.mp4')).as_posix()
-
-    writer = cv2.VideoWriter(
-        output_file,
-        cv2.VideoWriter_fourcc(*'mp4v'),
-        fps,
-        (width, height)
-    )
-    if augment_LR:
-        writer2 = cv2.VideoWriter(
-            output_file_LR,
-            cv2.VideoWriter_fourcc(*'mp4v'),
-            fps,
-            (width, height)
-        )
-
-    for i in range(video_length):
-        status, frame = cap.read()
-        if status:
-            writer.write(frame)
-            if augment_LR:
-                transformed = frame[:, ::-1]
-                writer2.write(transformed)
-    writer.release()
-    writer2.release()
-
-
-if __name__ == '__main__':  # noqa: C901
-    output_base_dir = 'data/preprocessed/game-state'
-    game_dir = Path(output_base_dir) / 'play'
-    no_game_dir = Path(output_base_dir) / 'no-play'
-    service_dir = Path(output_base_dir) / 'service'
-    makedirs(game_dir.as_posix(), exist_ok=True)
-    makedirs(no_game_dir.as_posix(), exist_ok=True)
-    makedirs(service_dir.as_posix(), exist_ok=True)
-    vdo_length = 30
-    serve_counter = 0
-    inplay_counter = 0
-    noplay_counter = 0
-
-    for video, annot in pairs:
-        cap = cv2.VideoCapture(video.as_posix())
-        w, h, fps = [int(cap.get(i)) for i in range(3, 6)]
-
-        serves = get_frame_nos(annot, 'serving-start')
-        end_serves = get_frame_nos(annot, 'serving-end')
-        end_games = get_frame_nos(annot, 'in-game-end')
-
-        data = {
-            'serve': serves, 'end_serve': end_serves, 'end_game': end_games
-        }
-        df = pd.DataFrame(data=data)
-
-        df['next_serve'] = None
+def clip_specs(st: int, video_length: int, output_path: Path, video: Path, label: str):
+    filename = f'{label}_{video.stem}_st_{st}_end_{st + video_length}.mp4'
+    return [ClipSpec(label, st, st + video_length, output_path / filename)]
+
+
+output_base_dir = 'data/preprocessed/game-state'
+game_dir = Path(output_base_dir) / 'play'
+no_game_dir = Path(output_base_dir) / 'no-play'
+service_dir = Path(output_base_dir) / 'service'
+vdo_length = 30
+# 'opencv' writes mp4v like before; 'pyav' encodes libx264 with the options below.
+encoder = 'opencv'
+encoder_options = {}
+# 'mp4' writes one video file per clip; 'shards' writes resized uint8 clip shards to `shard_dir` instead.
+output_format = 'mp4'
+shard_dir = 'data/preprocessed/game-state-shards'
+# In 'mp4' mode every video also gets a manifest of its clip files here.
+manifest_dir = Path(output_base_dir) / 'manifests'
+# Worker processes and base seed of the clip sampling; the output is the same for any n_workers.
+n_workers = 4
+seed = 0
+# Unchanged videos are skipped and already written clips are kept between runs (see BuildCache).
+build_cache = Path(output_base_dir) / 'build_cache.json'
+# Train/test split written to `split_dir` (see split_clip_indices); 'hardlink', 'symlink', 'copy' or None.
+split_dir = 'data/processed/game-status'
+test_size = 0.1
+link_mode = 'hardlink'
+# Augmentations the dataset readers derive from the train clips at read time (no extra files are written):
+# variant -> labels it applies to, None for all. Recorded in `split_dir`/split.json, see scripts/augment.py.
+train_variants = {'flip_lr': None}
+
+
+def build_params(seed: int) -> dict:
+    """Generator settings that change the clips; the clips of a video are re-planned when they change."""
+    return {
+        'seed': seed, 'vdo_length': vdo_length, 'output_format': output_format,
+        'encoder': encoder, 'encoder_options': encoder_options
+    }
+
+
+def process_video(
+        video: Path, annot: Path, seed: int = 0, record: dict | None = None
+) -> Tuple[Counter, dict]:
+    """
+    Plan and write all clips of one video.
+
+    The clip start frames are sampled with an RNG seeded from `seed` and the video name, so the
+    output does not depend on the order or the process in which the videos are handled.
+
+    Args:
+        video: Source video.
+        annot: Its annotation file.
+        seed: Base seed of the clip sampling.
+        record: The video's `BuildCache` record of the previous run; the video is skipped if neither
+            it, its annotation nor the settings changed, and clips still on disk are not written again.
+
+    Returns:
+        Number of clips per label and the video's new build record.
+    """
+    build = VideoBuild(video, annot, build_params(seed), record)
+    if build.up_to_date:
+        return Counter(build.previous['counts']), build.previous
+
+    rng = random.Random(f'{seed}-{video.stem}')
+    # Scans the video once (cached next to it) so every clip is read from its nearest keyframe
+    index = VideoIndex.load_or_build(video)
+
+    # One streaming parse per annotation file (cached next to it), rallies as a vectorized table
+    rallies = AnnotationIndex.load_or_build(annot).rally_table()
+
+    # All clips of the video are planned first, then written in one sequential decode
+    clips = []
+    for rally in rallies.itertuples(index=False):
+        start_serve_fno = rally.serve
+        end_serve_fno = start_inplay_fno = rally.end_serve
+        end_inplay_fno = start_noplay_fno = rally.end_game
+        end_noplay_fno = rally.next_serve
+
+        #  ####################### Generate service videos #################################
+        length = rally.serve_length
+        if length < 30:
+            continue
+        if length >= 30:
+            clips += clip_specs(
+                st=start_serve_fno,
+                video_length=vdo_length,
+                output_path=service_dir,
+                video=video,
+                label='service'
+            )
 
-        for i in range(len(df)):
-            if i != len(df) - 1:
-                next_serve = df.at[i + 1, 'serve']
-                df.at[i, 'next_serve'] = next_serve
-            else:
-                df.at[i, 'next_serve'] = None
+            clips += clip_specs(
+                st=end_serve_fno-30,
+                video_length=vdo_length,
+                output_path=service_dir,
+                video=video,
+                label='service'
+            )
 
-        pbar = tqdm(total=len(df))
-        pbar.set_description(f"Processing {video.name}")
-        for i, row in df.iterrows():
-            pbar.set_description(
-                f"Process {video.name} => | no_play: {noplay_counter} | in_play: {inplay_counter} | service {serve_counter} |"
+        #  ####################### Generate in-play videos #################################
+        length = rally.inplay_length
+        if length < (vdo_length + 5):
+            continue
+        if (vdo_length + 5) <= length <= 120:
+            # Generate 1 video.
+            st = random_start_frame(
+                start_inplay_fno, end_inplay_fno, divisions=1, vdo_length=vdo_length, rng=rng
+            )
+            clips += clip_specs(
+                st=st[0],
+                video_length=vdo_length,
+                output_path=game_dir,
+                video=video,
+                label='inplay'
             )
-            pbar.update(1)
-            start_serve_fno = row['serve']
-            end_serve_fno = start_inplay_fno = row['end_serve']
-            end_inplay_fno = start_noplay_fno = row['end_game']
-            end_noplay_fno = row['next_serve']
-
-            #  ####################### Generate service videos #################################
-            length = end_serve_fno - start_serve_fno
-            cap.set(1, start_serve_fno)
-
-            if length < 30:
-                continue
-            if length >= 30:
-                write_video(
-                    cap=cap,
-                    st=start_serve_fno,
-                    fps=fps,
-                    width=w,
-                    height=h,
+        elif 120 < length <= 300:
+            start_frames = random_start_frame(
+                start_inplay_fno, end_inplay_fno, divisions=4, vdo_length=vdo_length, rng=rng
+            )
+            for f in start_frames:
+                clips += clip_specs(
+                    st=f,
                     video_length=vdo_length,
-                    output_path=service_dir,
+                    output_path=game_dir,
                     video=video,
-                    label='service'
+                    label='inplay'
                 )
 
-                write_video(
-                    cap=cap,
-                    st=end_serve_fno-30,
-                    fps=fps,
-                    width=w,
-                    height=h,
-                    video_length=vdo_length,
-                    output_path=service_dir,
-                    video=video,
-                    label='service'
-                )
-                serve_counter += 4  # if LR augment is on
-
-            #  ####################### Generate in-play videos #################################
-            length = end_inplay_fno - start_inplay_fno
-            if length < (vdo_length + 5):
-                continue
-            if (vdo_length + 5) <= length <= 120:
-                # Generate 1 video.
-                st = random_start_frame(
-                    start_inplay_fno, end_inplay_fno, divisions=1, vdo_length=vdo_length
-                )
-                write_video(
-                    cap=cap,
-                    st=st[0],
-                    fps=fps,
-                    width=w,
-                    height=h,
+        elif length >= 300:
+            st = start_inplay_fno
+            end = end_inplay_fno
+
+            start_frames = random_start_frame(
+                st, end, divisions=(length // vdo_length) - 1, vdo_length=vdo_length, rng=rng
+            )
+            for f in start_frames:
+                clips += clip_specs(
+                    st=f,
                     video_length=vdo_length,
                     output_path=game_dir,
                     video=video,
                     label='inplay'
                 )
-                inplay_counter += 2
-            elif 120 < length <= 300:
-                start_frames = random_start_frame(
-                    start_inplay_fno, end_inplay_fno, divisions=4, vdo_length=vdo_length
-                )
-                for f in start_frames:
-                    write_video(
-                        cap=cap,
-                        st=f,
-                        fps=fps,
-                        width=w,
-                        height=h,
-                        video_length=vdo_length,
-                        output_path=game_dir,
-                        video=video,
-                        label='inplay'
-                    )
-                    inplay_counter += 2
-
-            elif length >= 300:
-                st = start_inplay_fno
-                end = end_inplay_fno
-
-                start_frames = random_start_frame(
-                    st, end, divisions=(length // vdo_length) - 1, vdo_length=vdo_length
-                )
-                for f in start_frames:
-                    write_video(
-                        cap=cap,
-                        st=f,
-                        fps=fps,
-                        width=w,
-                        height=h,
-                        video_length=vdo_length,
-                        output_path=game_dir,
-                        video=video,
-                        label='inplay'
-                    )
-                    inplay_counter += 2
-
-            #  ######################## Generate no-play videos #################################
-
-            if end_noplay_fno is None or start_noplay_fno is None:
-                continue
-            length = end_noplay_fno - start_noplay_fno
-
-            if length < vdo_length + 5:
-                continue
-
-            if (vdo_length + 5) <= length <= 120:
-                # Generate 1 video.
-                st = random_start_frame(
-                    start_noplay_fno, end_noplay_fno, divisions=1, vdo_length=vdo_length
-                )
-                write_video(
-                    cap=cap,
-                    st=st[0],
-                    fps=fps,
-                    width=w,
-                    height=h,
+
+        #  ######################## Generate no-play videos #################################
+
+        # The last rally has no next serve (-1)
+        if end_noplay_fno < 0:
+            continue
+        length = rally.noplay_length
+
+        if length < vdo_length + 5:
+            continue
+
+        if (vdo_length + 5) <= length <= 120:
+            # Generate 1 video.
+            st = random_start_frame(
+                start_noplay_fno, end_noplay_fno, divisions=1, vdo_length=vdo_length, rng=rng
+            )
+            clips += clip_specs(
+                st=st[0],
+                video_length=vdo_length,
+                output_path=no_game_dir,
+                video=video,
+                label='noplay'
+            )
+
+        elif 120 < length <= 300:
+            start_frames = random_start_frame(
+                start_noplay_fno, end_noplay_fno, divisions=4, vdo_length=vdo_length, rng=rng
+            )
+            for f in start_frames:
+                clips += clip_specs(
+                    st=f,
                     video_length=vdo_length,
                     output_path=no_game_dir,
                     video=video,
                     label='noplay'
                 )
-                noplay_counter += 2
 
-            elif 120 < length <= 300:
-                start_frames = random_start_frame(
-                    start_noplay_fno, end_noplay_fno, divisions=4, vdo_length=vdo_length
-                )
-                for f in start_frames:
-                    write_video(
-                        cap=cap,
-                        st=f,
-                        fps=fps,
-                        width=w,
-                        height=h,
-                        video_length=vdo_length,
-                        output_path=no_game_dir,
-                        video=video,
-                        label='noplay'
-                    )
-                    noplay_counter += 2
-
-            elif length > 500:
-                start_frames = random_start_frame(
-                    start_noplay_fno, end_noplay_fno, divisions=(length // vdo_length) - 1, vdo_length=vdo_length
+        elif length > 500:
+            start_frames = random_start_frame(
+                start_noplay_fno, end_noplay_fno, divisions=(length // vdo_length) - 1, vdo_length=vdo_length,
+                rng=rng
+            )
+            for f in start_frames:
+                clips += clip_specs(
+                    st=f,
+                    video_length=vdo_length,
+                    output_path=no_game_dir,
+                    video=video,
+                    label='noplay'
                 )
-                for f in start_frames:
-                    write_video(
-                        cap=cap,
-                        st=f,
-                        fps=fps,
-                        width=w,
-                        height=h,
-                        video_length=vdo_length,
-                        output_path=no_game_dir,
-                        video=video,
-                        label='noplay'
-                    )
-                    noplay_counter += 2
-
-        pbar.close()
 
-    print("finished data generation ....")
-    # Split to train-test
-    # dataset_root = 'data/preprocessed/game-state'
-    new_path = 'data/processed/game-status'
-    all_videos = list(Path(output_base_dir).rglob('*.mp4'))
-
-    # services = [v for v in all_videos if v.parent.stem == 'service']
-    noplay = [v for v in all_videos if v.parent.stem == 'play']
-    inplay = [v for v in all_videos if v.parent.stem == 'no-play']
-    service = [v for v in all_videos if v.parent.stem == 'service']
-
-    test_size = 0.1
-
-    for pack in [noplay, inplay, service]:
-        shuffle(pack)
-        test_length = int(len(pack) * test_size)
-        for i, item in enumerate(pack):
-            parent = item.parent.stem
-            if i <= test_length:
-                path = join(new_path, 'test', parent)
-            else:
-                path = join(new_path, 'train', parent)
-            makedirs(path, exist_ok=True)
-            move(item.as_posix(), path)  # This is a lot faster, but a little risky...
-            # copy2(item.as_posix(), path)
+    # Clip files already on disk from a previous run are kept, see write_video_clips
+    counts = write_video_clips(
+        build, index, clips, video, output_format=output_format, manifest_dir=manifest_dir,
+        shard_dir=shard_dir, clip_length=vdo_length, encoder=encoder, encoder_options=encoder_options
+    )
+    return counts, build.record(counts)
+
+
+if __name__ == '__main__':
+    makedirs(game_dir.as_posix(), exist_ok=True)
+    makedirs(no_game_dir.as_posix(), exist_ok=True)
+    makedirs(service_dir.as_posix(), exist_ok=True)
 
+    # Videos are processed in parallel; the per-video counters and build records are merged as they finish.
+    # The build cache is saved after every video, so an interrupted run resumes where it stopped.
+    cache = BuildCache(build_cache)
+    counters = Counter()
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {
+            executor.submit(process_video, video, annot, seed, cache.video(video.name)): video
+            for video, annot in pairs
+        }
+        pbar = tqdm(as_completed(futures), total=len(futures))
+        for future in pbar:
+            counts, record = future.result()
+            cache.update_video(futures[future].name, record)
+            cache.save()
+            counters += counts
+            pbar.set_description(
+                f"{futures[future].name} done => | no_play: {counters['noplay']} | in_play: {counters['inplay']} "
+                f"| service {counters['service']} |"
+            )
+
+    print("finished data generation ....")
+    # Split to train-test by source video: the clips stay where they are, each split is a clip index
+    # (plus class folders of links in 'mp4' mode). Re-run split_clip_indices with another seed to re-split.
+    clip_index_dir = shard_dir if output_format == 'shards' else manifest_dir
+    summary = split_clip_indices(
+        clip_index_dir, split_dir, test_size=test_size, seed=seed,
+        link_mode=link_mode if output_format == 'mp4' else None, variants=train_variants
+    )
+    for split, info in summary['splits'].items():
+        print(f"{split}: {info['clips']} clips from {len(info['groups'])} videos | {info['labels']}")
     print("finished data split ....")
@@ -1,3 +1,7 @@
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import List
 
 import cv2
@@ -12,6 +16,11 @@ from src.ml.yolo.ball.ball_detection import BallSegmentor
 from src.ml.yolo.vb_action.action_detection import ActionDetector
 from src.ml.yolo.players.pose_estimation import PoseEstimator
 from src.utilities.utils import BoundingBox, KeyPointBox, Meta, CourtCoordinates
+from src.tracking import (
+    COURT_LENGTH, COURT_WIDTH, N_KEYPOINTS, ColorHistogramEmbedder, CourtProjector, CourtZoneIndex, DetectionScheduler,
+    ReIDGallery, TrackStoreWriter, foot_points
+)
+from src.video_io import open_video_writer
 
 DISTANCE_THRESHOLD_BBOX: float = 0.7
 DISTANCE_THRESHOLD_CENTROID: int = 30
@@ -35,36 +44,64 @@ court_coordinates = {
 COURT = CourtCoordinates(points=court_coordinates)
 
 
-def embedding_distance(matched_not_init_trackers, unmatched_trackers):
-    snd_embedding = unmatched_trackers.last_detection.embedding
+def detection_boxes(yolo_detections: List[BoundingBox | KeyPointBox]) -> np.ndarray:
+    """xyxy boxes of all detections (zeros for undetected ones), in the same order."""
+    boxes = np.zeros((len(yolo_detections), 4), dtype=np.float32)
+    for i, detection in enumerate(yolo_detections):
+        bbox = detection if isinstance(detection, BoundingBox) else detection.get_bbox()
+        if bbox.detected:
+            boxes[i] = [bbox.x1, bbox.y1, bbox.x2, bbox.y2]
+    return boxes
 
-    if snd_embedding is None:
-        for detection in reversed(unmatched_trackers.past_detections):
-            if detection.embedding is not None:
-                snd_embedding = detection.embedding
-                break
-        else:
-            return 1
 
-    for detection_fst in matched_not_init_trackers.past_detections:
-        if detection_fst.embedding is None:
-            continue
+def pose_keypoints(detection, n_keypoints: int = N_KEYPOINTS) -> np.ndarray:
+    """(n_keypoints, 3) x, y, confidence of a pose detection; NaN when it has no keypoints."""
+    keypoints = np.full((n_keypoints, 3), np.nan, dtype=np.float32)
+    values = getattr(detection, "keypoints", None)
+    if values is not None:
+        values = np.asarray(values, dtype=np.float32).reshape(-1, np.shape(values)[-1])[:n_keypoints]
+        keypoints[:len(values), :values.shape[1]] = values[:, :3]
+        if values.shape[1] == 2:
+            keypoints[:len(values), 2] = 1
+    return keypoints
+
+
+def track_rows(tracked_players, player_detections: List[Detection]):
+    """
+    track ids, boxes and keypoints of the tracked players of one frame, for the track store.
+    Keypoints are only known on frames where the track was matched to a fresh pose detection.
+    """
+    current = {id(detection) for detection in player_detections}
+    track_ids = np.array([obj.id for obj in tracked_players], dtype=np.int32)
+    bboxes = np.full((len(tracked_players), 4), np.nan, dtype=np.float32)
+    keypoints = np.full((len(tracked_players), N_KEYPOINTS, 3), np.nan, dtype=np.float32)
+    for i, obj in enumerate(tracked_players):
+        if len(obj.estimate) >= 2:
+            bboxes[i] = obj.estimate[:2].ravel()
+        if id(obj.last_detection) in current:
+            keypoints[i] = pose_keypoints(obj.last_detection.data)
+    return track_ids, bboxes, keypoints
 
-        distance = 1 - cv2.compareHist(
-            snd_embedding, detection_fst.embedding, cv2.HISTCMP_CORREL
-        )
-        if distance < 0.5:
-            return distance
-    return 1
+
+def draw_court_map(frame: np.ndarray, court_xy: np.ndarray, scale: int = 12, margin: int = 20) -> np.ndarray:
+    """draw a top-down court in the top-right corner of the frame with the players' court positions."""
+    width, length = int(COURT_WIDTH * scale), int(COURT_LENGTH * scale)
+    x0, y0 = frame.shape[1] - width - margin, margin
+    cv2.rectangle(frame, (x0, y0), (x0 + width, y0 + length), Meta.white, 1)
+    cv2.line(frame, (x0, y0 + length // 2), (x0 + width, y0 + length // 2), Meta.white, 1)
+    for x, y in court_xy[np.isfinite(court_xy).all(axis=1)]:
+        cv2.circle(frame, (x0 + int(x * scale), y0 + int(y * scale)), 3, (0, 255, 0), -1)
+    return frame
 
 
 def convert_to_norfair_detection(
-        yolo_detections: List[BoundingBox | KeyPointBox], track_points: str = "centroid") -> List[Detection]:
-    """convert detections_as_xywh to norfair detections"""
+        yolo_detections: List[BoundingBox | KeyPointBox], track_points: str = "centroid",
+        embeddings: np.ndarray | None = None) -> List[Detection]:
+    """convert detections_as_xywh to norfair detections, attaching `embeddings[i]` to the i-th detection if given."""
     norfair_detections: List[Detection] = []
 
     if track_points == "centroid":
-        for detection in yolo_detections:
+        for i, detection in enumerate(yolo_detections):
             bbox = detection if isinstance(detection, BoundingBox) else detection.get_bbox()
             if not bbox.detected:
                 continue
@@ -77,10 +114,12 @@ def convert_to_norfair_detection(
                     points=centroid,
                     scores=score,
                     label=bbox.name,
+                    embedding=None if embeddings is None else embeddings[i],
+                    data=detection,
                 )
             )
     elif track_points == "bbox":
-        for detection in yolo_detections:
+        for i, detection in enumerate(yolo_detections):
             bbox = detection if isinstance(detection, BoundingBox) else detection.get_bbox()
             if not bbox.detected:
                 continue
@@ -95,7 +134,8 @@ def convert_to_norfair_detection(
             )
             norfair_detections.append(
                 Detection(
-                    points=box, scores=scores, label=detection.name)
+                    points=box, scores=scores, label=detection.name,
+                    embedding=None if embeddings is None else embeddings[i], data=detection)
             )
     return norfair_detections
 
@@ -108,90 +148,140 @@ def config():
     parser.add_argument(
         '--output', type=str, default='./runs/inference/'
     )
+    parser.add_argument('--videos', type=str, default=None,
+                        help='directory of videos or manifest (.txt / .json) to track instead of --video.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes for --videos; each loads the models once.')
     parser.add_argument("--use-pose", type=bool, default=False)
     parser.add_argument('--disable-reid', type=bool, default=False)
     parser.add_argument('--track-points', type=str, default='bbox')
+    parser.add_argument('--gallery-size', type=int, default=16,
+                        help='number of appearance embeddings kept per track for re-identification.')
+    parser.add_argument('--detect-every', type=int, default=1,
+                        help='run the pose estimator every n frames; the tracker predicts the players in between.')
+    parser.add_argument('--max-uncertainty', type=float, default=None,
+                        help='also run it when a track\'s estimated position error exceeds this many pixels.')
+    parser.add_argument('--court-map', action='store_true',
+                        help='draw the players\' top-down court positions on the output video.')
+    parser.add_argument('--encoder', type=str, default='opencv', choices=['opencv', 'pyav'])
+    parser.add_argument('--crf', type=int, default=23)
+    parser.add_argument('--preset', type=str, default='veryfast')
+    parser.add_argument('--encoder-threads', type=int, default=0)
+    parser.add_argument('--output-size', type=int, nargs=2, default=None, metavar=('WIDTH', 'HEIGHT'))
 
     return parser.parse_args()
 
 
-if __name__ == '__main__':
-    args = config()
-    video_path = args.video
-    output_path = args.output
-    disable_reid = args.disable_reid
-    if disable_reid:
-        tracker = Tracker(
-            initialization_delay=1,
-            distance_function="euclidean",
-            hit_counter_max=10,
-            filter_factory=OptimizedKalmanFilterFactory(),
-            distance_threshold=50,
-            past_detections_length=5,
-        )
-    else:
-        tracker = Tracker(
+def create_tracker(gallery: ReIDGallery | None = None) -> Tracker:
+    """norfair tracker for the players; appearance re-identification is enabled when a gallery is given."""
+    if gallery is None:
+        return Tracker(
             initialization_delay=1,
             distance_function="euclidean",
             hit_counter_max=10,
             filter_factory=OptimizedKalmanFilterFactory(),
             distance_threshold=50,
             past_detections_length=5,
-            reid_distance_function=embedding_distance,
-            reid_distance_threshold=0.5,
-            reid_hit_counter_max=500,
         )
+    tracker = Tracker(
+        initialization_delay=1,
+        distance_function="euclidean",
+        hit_counter_max=10,
+        filter_factory=OptimizedKalmanFilterFactory(),
+        distance_threshold=50,
+        past_detections_length=5,
+        reid_distance_function=gallery.pair_distance,
+        reid_distance_threshold=0.5,
+        reid_hit_counter_max=500,
+    )
+    gallery.attach(tracker)
+    return tracker
+
+
+def load_models():
+    """(ball_detector, action_detector, kp_detector)"""
+    return BallSegmentor(), ActionDetector(), PoseEstimator()
+
+
+def track_video(
+        video_path: str, output_path: str, args, models, show_progress: bool = True, name: str | None = None
+) -> dict:
+    """
+    track the players of one video, write the annotated video, the track store and the schedule report.
+    the outputs are named after `name` (the video file stem by default).
 
-    ball_detector = BallSegmentor()
-    action_detector = ActionDetector()
-    kp_detector = PoseEstimator()
+    Returns:
+        per-video summary: frame count, processing time and output paths.
+    """
+    t_start = time()
+    name = Path(video_path).stem if name is None else name
+    ball_detector, action_detector, kp_detector = models
+    disable_reid = args.disable_reid
+    embedder = None if disable_reid else ColorHistogramEmbedder()
+    gallery = None if disable_reid else ReIDGallery(gallery_size=args.gallery_size)
+    tracker = create_tracker(gallery)
+    scheduler = DetectionScheduler(every=args.detect_every, max_uncertainty=args.max_uncertainty)
 
     cap = cv2.VideoCapture(video_path)
-    assert cap.isOpened(), 'file does not exist...'
+    assert cap.isOpened(), f'file does not exist: {video_path}'
 
     w, h, fps, _, total_frames = [int(cap.get(i)) for i in range(3, 8)]
+    # Zone polygons rasterized once; per-frame zone checks are array lookups
+    court_zones = CourtZoneIndex(court_coordinates, frame_size=(w, h))
+    # Homography from the court corners; all foot points of a frame are projected at once
+    court_projector = CourtProjector.from_zone(court_coordinates, "main_zone")
 
-    filename = Path(output_path) / (Path(video_path).stem + '.mp4')
-    codec = cv2.VideoWriter_fourcc(*'mp4v')
-
-    output = cv2.VideoWriter(
-        filename.as_posix(),
-        codec,
-        fps,
-        (w, h)
-    )
+    filename = Path(output_path) / (name + '.mp4')
+    encoder_options = {}
+    if args.encoder == 'pyav':
+        encoder_options.update(crf=args.crf, preset=args.preset, threads=args.encoder_threads)
+    if args.output_size:
+        encoder_options['output_size'] = tuple(args.output_size)
 
-    pbar = tqdm(list(range(total_frames)))
+    output = open_video_writer(filename, fps, (w, h), backend=args.encoder, **encoder_options)
 
-    distance_function = "iou" if args.track_points == "bbox" else "euclidean"
+    pbar = tqdm(total=total_frames, disable=not show_progress)
 
-    distance_threshold = (
-        DISTANCE_THRESHOLD_BBOX
-        if args.track_points == "bbox"
-        else DISTANCE_THRESHOLD_CENTROID
+    # Per-frame tracks are persisted so analyses don't need to re-run the video
+    store_path = Path(output_path) / (name + '_tracks')
+    track_store = TrackStoreWriter(
+        store_path, video=video_path, fps=fps, frame_size=[w, h], zones=court_zones.names
     )
 
-    # tracker = Tracker(
-    #     distance_function=distance_function,
-    #     distance_threshold=distance_threshold,
-    # )
-
-    print("Total frames: ", total_frames)
+    if show_progress:
+        print("Total frames: ", total_frames)
+    frames = 0
     for fno in range(0, total_frames):
         pbar.update(1)
-        cap.set(1, fno)
+        # Frames are read sequentially; seeking before every read decodes again from the last keyframe.
         status, frame = cap.read()
+        if not status:
+            break
+        frames += 1
         t1 = time()
-        cv2.putText(frame, f"FNO# {fno}", (50, 50),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, Meta.white, 2)
         ball = ball_detector.detect_one(frame)
         actions = action_detector.detect(frame)
-        poses = kp_detector.predict(frame)
+        inferred = scheduler.should_detect(fno, tracker.get_active_objects())
+        if inferred:
+            poses = kp_detector.predict(frame)
+            embeddings = None if embedder is None else embedder(frame, detection_boxes(poses))
+            player_detections = convert_to_norfair_detection(
+                poses, track_points=args.track_points, embeddings=embeddings
+            )
+            tracked_players = tracker.update(detections=player_detections, period=scheduler.period(fno))
+            scheduler.mark_inferred(fno)
+        else:
+            # The Kalman filters carry the tracks until the next detector run
+            player_detections = []
+            tracked_players = tracker.update()
+            scheduler.mark_propagated(fno)
+        if gallery is not None:
+            gallery.update(tracker, player_detections)
         t2 = time()
         pbar.set_description(f"{t2 - t1: .4f} seconds. {fno}/{total_frames}")
 
-        player_detections = convert_to_norfair_detection(poses, track_points=args.track_points)
-        tracked_players = tracker.update(detections=player_detections)
+        cv2.putText(frame, f"FNO# {fno} {'inferred' if inferred else 'propagated'}", (50, 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, Meta.white, 2)
         if ball is not None:
             frame = ball_detector.draw(frame, [ball])
         frame = action_detector.draw(frame, actions)
@@ -201,6 +291,155 @@ if __name__ == '__main__':
         # elif args.track_points == "bbox":
         # norfair.draw_boxes(frame, player_detections)
         norfair.draw_boxes(frame, tracked_players)
+        player_feet = foot_points(tracked_players)
+        for (x, y), zone in zip(player_feet.astype(int), court_zones.zone_names(player_feet)):
+            if zone is not None:
+                cv2.putText(frame, zone, (x, y + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.4, Meta.white, 1)
+        court_xy = court_projector.project(player_feet)
+        track_ids, bboxes, keypoints = track_rows(tracked_players, player_detections)
+        track_store.append(
+            fno, track_ids, bboxes, keypoints, zones=court_zones.classify(player_feet), court_xy=court_xy
+        )
+        if args.court_map:
+            frame = draw_court_map(frame, court_xy)
         output.write(frame)
 
-    print(f'video output saved in {filename.as_posix()}')
+    pbar.close()
+    cap.release()
+    output.release()
+    track_store.close()
+    schedule = scheduler.save(Path(output_path) / (name + '_schedule.json'), video=video_path)
+    seconds = time() - t_start
+    if show_progress:
+        print(f'video output saved in {filename.as_posix()}')
+        print(f'{track_store.rows} track rows saved in {store_path.as_posix()}')
+        print(f"pose estimation ran on {schedule['inferred_count']}/{schedule['frames']} frames, "
+              f"{schedule['propagated_count']} propagated by the tracker.")
+
+    return {
+        'video': video_path,
+        'name': name,
+        'frames': frames,
+        'seconds': round(seconds, 3),
+        'fps': round(frames / seconds, 2) if seconds > 0 else 0.0,
+        'pose_inferred_frames': schedule['inferred_count'],
+        'track_rows': track_store.rows,
+        'output': filename.as_posix(),
+        'tracks': store_path.as_posix(),
+    }
+
+
+VIDEO_SUFFIXES = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def list_videos(source: str) -> List[str]:
+    """
+    videos of a directory (sorted), or of a manifest: a .json list (or {"videos": [...]}) or a text
+    file with one path per line ('#' starts a comment). Relative manifest entries are resolved
+    against the manifest's folder.
+    """
+    source = Path(source)
+    if source.is_dir():
+        return sorted(p.as_posix() for p in source.iterdir() if p.suffix.lower() in VIDEO_SUFFIXES)
+
+    if source.suffix == '.json':
+        entries = json.loads(source.read_text())
+        entries = entries['videos'] if isinstance(entries, dict) else entries
+    else:
+        entries = [line.split('#')[0].strip() for line in source.read_text().splitlines()]
+    return [(source.parent / entry).as_posix() for entry in entries if entry]
+
+
+_WORKER_MODELS = None
+_WORKER_LOAD_SECONDS = 0.0
+
+
+def init_worker():
+    """Load the models once per worker process; every video the worker handles reuses them."""
+    global _WORKER_MODELS, _WORKER_LOAD_SECONDS
+    t = time()
+    _WORKER_MODELS = load_models()
+    _WORKER_LOAD_SECONDS = time() - t
+
+
+def output_names(videos: List[str]) -> List[str]:
+    """
+    unique output name of every video: its file stem, prefixed with the parent folder when several
+    videos share a stem, and suffixed with its position if that is still ambiguous.
+    """
+    stems = Counter(Path(video).stem for video in videos)
+    names = [
+        f'{Path(video).parent.name}_{Path(video).stem}' if stems[Path(video).stem] > 1 else Path(video).stem
+        for video in videos
+    ]
+    counts = Counter(names)
+    return [f'{name}_{i}' if counts[name] > 1 else name for i, name in enumerate(names)]
+
+
+def worker_track_video(video_path: str, name: str, output_path: str, args) -> dict:
+    """track one video with the worker's models; a failure is returned as `{'error': ...}` instead of raised."""
+    try:
+        summary = track_video(video_path, output_path, args, _WORKER_MODELS, show_progress=False, name=name)
+    except Exception as e:
+        return {'video': video_path, 'name': name, 'error': repr(e)}
+    summary.update(worker=os.getpid(), worker_model_load_seconds=round(_WORKER_LOAD_SECONDS, 3))
+    return summary
+
+
+def track_videos(videos: List[str], output_path: str, args, n_workers: int = 1) -> List[dict]:
+    """
+    track several videos with a pool of `n_workers` processes, each loading the models once and
+    pulling the next video when it is done. A video that fails is reported in its summary and the
+    others carry on. A summary of every video is written to `<output>/tracking_summary.json`.
+    """
+    t_start = time()
+    names = output_names(videos)
+    order = {name: i for i, name in enumerate(names)}
+    summaries = []
+    if n_workers <= 1:
+        init_worker()
+        for video, name in tqdm(list(zip(videos, names)), desc='videos'):
+            summaries.append(worker_track_video(video, name, output_path, args))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=init_worker) as executor:
+            futures = {
+                executor.submit(worker_track_video, video, name, output_path, args): (video, name)
+                for video, name in zip(videos, names)
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc='videos'):
+                try:
+                    summaries.append(future.result())
+                except Exception as e:
+                    # The worker process itself died (e.g. out of memory)
+                    video, name = futures[future]
+                    summaries.append({'video': video, 'name': name, 'error': repr(e)})
+
+    summaries.sort(key=lambda summary: order[summary['name']])
+    done = [summary for summary in summaries if 'error' not in summary]
+    report = {
+        'workers': n_workers,
+        'videos': len(videos),
+        'failed': len(summaries) - len(done),
+        'frames': sum(summary['frames'] for summary in done),
+        'seconds': round(time() - t_start, 3),
+        'per_video': summaries,
+    }
+    Path(output_path).mkdir(parents=True, exist_ok=True)
+    with open(Path(output_path) / 'tracking_summary.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    return summaries
+
+
+if __name__ == '__main__':
+    args = config()
+    if args.videos is not None:
+        videos = list_videos(args.videos)
+        print(f"tracking {len(videos)} videos with {args.workers} workers...")
+        for summary in track_videos(videos, args.output, args, n_workers=args.workers):
+            if 'error' in summary:
+                print(f"{summary['video']}: FAILED {summary['error']}")
+            else:
+                print(f"{summary['video']}: {summary['frames']} frames in {summary['seconds']}s ({summary['fps']} FPS)")
+        print(f"summary saved in {(Path(args.output) / 'tracking_summary.json').as_posix()}")
+    else:
+        track_video(args.video, args.output, args, load_models())
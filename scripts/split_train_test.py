@@ -1,29 +1,37 @@
-from shutil import move
+import re
 from pathlib import Path
-from os import makedirs
-from os.path import join
-from random import shuffle
+
+from src.dataset import FOLDER_LABELS, split_clip_indices, split_clips
 
 dataset_root = 'data/preprocessed/game-state-3-classes'
 new_path = 'data/processed/game-status'
-all_videos = list(Path(dataset_root).rglob('*.mp4'))
-
-# services = [v for v in all_videos if v.parent.stem == 'service']
-noplay = [v for v in all_videos if v.parent.stem == 'play']
-inplay = [v for v in all_videos if v.parent.stem == 'no-play']
-service = [v for v in all_videos if v.parent.stem == 'service']
+# Clip manifests written by the generators; without them the clips are found by their class folders.
+manifest_dir = Path(dataset_root) / 'manifests'
 
 test_size = 0.1
+seed = 0
+# Besides the train/test manifests, build `<new_path>/<split>/<label>/` folders of 'hardlink', 'symlink'
+# or 'copy' files; None only writes the manifests. Nothing is moved, so re-running with another seed re-splits.
+link_mode = 'hardlink'
+
+# Generator file names: `<label>_<video stem>_st_<start>_end_<end>.mp4` (`st1` in the 2-class generator)
+clip_name = re.compile(r'^[^_]+_(?P<source>.+)_st1?_\d+_end_\d+')
+
+
+def source_video(path: Path) -> str:
+    match = clip_name.match(path.stem)
+    return match.group('source') if match else path.stem
+
+
+if manifest_dir.is_dir():
+    summary = split_clip_indices(manifest_dir, new_path, test_size=test_size, seed=seed, link_mode=link_mode)
+else:
+    # Clips without a manifest: label from the class folder (`play` -> `inplay`, ...), source from the file name
+    clips = [
+        {'file': v.as_posix(), 'label': FOLDER_LABELS.get(v.parent.stem, v.parent.stem), 'source': source_video(v)}
+        for v in Path(dataset_root).rglob('*.mp4')
+    ]
+    summary = split_clips(clips, new_path, test_size=test_size, seed=seed, link_mode=link_mode)
 
-for pack in [noplay, inplay, service]:
-    shuffle(pack)
-    test_length = int(len(pack) * test_size)
-    for i, item in enumerate(pack):
-        parent = item.parent.stem
-        if i <= test_length:
-            path = join(new_path, 'test', parent)
-        else:
-            path = join(new_path, 'train', parent)
-        makedirs(path, exist_ok=True)
-        move(item.as_posix(), path)  # This is a lot faster, but a little risky...
-        # copy2(item.as_posix(), path)
+for split, info in summary['splits'].items():
+    print(f"{split}: {info['clips']} clips from {len(info['groups'])} videos | {info['labels']}")
@@ -1,31 +1,49 @@
+import json
+import re
 from pathlib import Path
-from os import makedirs
-from os.path import join
-from random import shuffle
-from shutil import move
+from collections import Counter
 
 from natsort import natsorted
 
+from src.dataset import assign_splits, link_tree, previous_links
+
 dataset_root = 'data/preprocessed/6_classs_V2'
 new_path = 'data/processed/6_classs_V2'
 all_images = natsorted(list(Path(dataset_root).rglob('*.png')), key=lambda x: x.stem)
 all_labels = natsorted(list(Path(dataset_root).rglob('*.txt')), key=lambda x: x.stem)
 pairs = list(zip(all_images, all_labels))
 
-
 test_size = 0.1
-test_length = int(len(pairs) * test_size)
-
-shuffle(pairs)
-
-for i, (img, lbl) in enumerate(pairs):
-    if i <= test_length:
-        img_path = join(new_path, 'images', 'test')
-        lbl_path = join(new_path, 'labels', 'test')
-    else:
-        img_path = join(new_path, 'images', 'train')
-        lbl_path = join(new_path, 'labels', 'train')
-    makedirs(img_path, exist_ok=True)
-    makedirs(lbl_path, exist_ok=True)
-    move(img.as_posix(), img_path)
-    move(lbl.as_posix(), lbl_path)
+seed = 0
+# 'hardlink', 'symlink' or 'copy'; the originals stay where they are, so re-running re-splits.
+link_mode = 'hardlink'
+# Frames are grouped by the video they come from (`<video>_<frame number>.png`) so that neighbouring,
+# near-identical frames don't end up in both splits.
+frame_name = re.compile(r'^(?P<source>.+)_\d+$')
+
+
+def source_video(path: Path) -> str:
+    match = frame_name.match(path.stem)
+    return match.group('source') if match else path.stem
+
+
+def main_class(label_file: Path) -> str:
+    """The most frequent class of a YOLO label file (splits are stratified by it)."""
+    classes = Counter(line.split()[0] for line in open(label_file) if line.strip())
+    return classes.most_common(1)[0][0] if classes else 'empty'
+
+
+is_test = assign_splits(
+    [main_class(lbl) for _, lbl in pairs], [source_video(img) for img, _ in pairs], test_size=test_size, seed=seed
+)
+
+sources, targets = [], []
+for (img, lbl), test in zip(pairs, is_test):
+    split = 'test' if test else 'train'
+    sources += [img, lbl]
+    targets += [Path('images') / split / img.name, Path('labels') / split / lbl.name]
+# Only the links of the previous run (recorded in split.json) are replaced; other files are never deleted
+links = link_tree(sources, targets, new_path, mode=link_mode, previous=previous_links(new_path))
+with open(Path(new_path) / 'split.json', 'w') as f:
+    json.dump({'test_size': test_size, 'seed': seed, 'links': links}, f, indent=2)
+print(f"train: {int((~is_test).sum())} images | test: {int(is_test.sum())} images")
@@ -0,0 +1,14 @@
+"""
+Dataset building blocks for the game-state classifier: annotation indices, clip shards, clip manifests,
+lazy augmentation variants, the readers of the clips, source-grouped train/test splits and the
+incremental build cache of the clip generators.
+"""
+from .annotations import GAME_END, SERVE_END, SERVE_START, AnnotationIndex
+from .augment import ORIGINAL, VARIANTS, ClipVariantDataset, add_variant, apply_variant, flip_lr
+from .build_cache import BuildCache, VideoBuild, file_hash, write_video_clips
+from .manifest import ClipFileDataset, ClipManifest, read_clip
+from .shards import VIDEOMAE_INPUT_SIZE, ClipShardDataset, ClipShardWriter
+from .split import (
+    FOLDER_LABELS, LABEL_FOLDERS, add_split_variant, assign_splits, link_tree, previous_links, read_clip_indices,
+    split_clip_indices, split_clips
+)
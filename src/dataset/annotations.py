@@ -0,0 +1,115 @@
+"""
+Streaming index of CVAT game-state annotations.
+
+`AnnotationIndex.build` streams a CVAT "images" XML file once with `iterparse` and collects the
+frame numbers of every tag label (`serving-start`, `serving-end`, `in-game-end`, ...). The result
+is cached next to the annotation file, like `VideoIndex`. `rally_table` turns the tags into one
+row per rally with vectorized column operations.
+"""
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from ..video_io.sidecar import load_sidecar, save_sidecar, sidecar_path
+
+ANNOTATION_INDEX_VERSION = 1
+SERVE_START = "serving-start"
+SERVE_END = "serving-end"
+GAME_END = "in-game-end"
+
+
+class AnnotationIndex:
+    """
+    Tag label -> frame numbers (in document order) of one CVAT annotation file.
+
+    Example:
+        annotations = AnnotationIndex.load_or_build("game-status/match_1.xml")
+        rallies = annotations.rally_table()
+        for rally in rallies.itertuples(index=False):
+            ...
+    """
+
+    def __init__(self, annotation_path: str | Path, tags: Dict[str, np.ndarray]):
+        self.annotation_path = Path(annotation_path)
+        self.tags = tags
+
+    @property
+    def labels(self) -> List[str]:
+        return list(self.tags)
+
+    def frames(self, label: str) -> np.ndarray:
+        """Frame numbers tagged with `label` (empty if the label never occurs)."""
+        return self.tags.get(label, np.empty(0, dtype=np.int64))
+
+    @staticmethod
+    def cache_path(annotation_path: str | Path) -> Path:
+        return sidecar_path(annotation_path)
+
+    @classmethod
+    def build(cls, annotation_path: str | Path) -> "AnnotationIndex":
+        """
+        Stream the XML once. Only the first `<tag>` of an `<image>` counts, and the frame number is
+        taken from image names like `frame_000123`.
+        """
+        tags: Dict[str, List[int]] = {}
+        for _, element in ET.iterparse(annotation_path, events=("end",)):
+            if element.tag != "image":
+                continue
+            tag = element.find("tag")
+            if tag is not None:
+                frame_no = int(element.get("name").split("_")[1])
+                tags.setdefault(tag.get("label"), []).append(frame_no)
+            # Images are independent; drop them as soon as they're read to keep memory flat
+            element.clear()
+        return cls(annotation_path, {label: np.asarray(frames, dtype=np.int64) for label, frames in tags.items()})
+
+    def save(self, path: str | Path | None = None) -> Path:
+        tags = {label: frames.tolist() for label, frames in self.tags.items()}
+        return save_sidecar(self.annotation_path, ANNOTATION_INDEX_VERSION, {"tags": tags}, path)
+
+    @classmethod
+    def load_or_build(cls, annotation_path: str | Path, cache: bool = True) -> "AnnotationIndex":
+        """
+        Load the cached index of `annotation_path`, or build (and cache) it when missing or stale.
+        """
+        annotation_path = Path(annotation_path)
+        data = load_sidecar(annotation_path, ANNOTATION_INDEX_VERSION) if cache else None
+        if data is not None:
+            tags = {label: np.asarray(frames, dtype=np.int64) for label, frames in data["tags"].items()}
+            return cls(annotation_path, tags)
+        index = cls.build(annotation_path)
+        if cache:
+            index.save()
+        return index
+
+    def rally_table(self) -> pd.DataFrame:
+        """
+        One row per rally: `serve`, `end_serve`, `end_game` and `next_serve` (the following
+        rally's serve, -1 for the last rally), plus `serve_length` (serve -> end of the serve),
+        `inplay_length` (end of the serve -> end of the rally), `rally_length` (serve -> end of
+        the rally) and `noplay_length` (end of the rally -> next serve, -1 for the last rally).
+
+        Raises:
+            ValueError: The three tags don't occur the same number of times.
+        """
+        serve, end_serve, end_game = self.frames(SERVE_START), self.frames(SERVE_END), self.frames(GAME_END)
+        if not len(serve) == len(end_serve) == len(end_game):
+            raise ValueError(
+                f"{self.annotation_path.name}: {len(serve)} '{SERVE_START}', {len(end_serve)} '{SERVE_END}' "
+                f"and {len(end_game)} '{GAME_END}' tags; expected one of each per rally"
+            )
+        next_serve = np.append(serve[1:], -1)
+        has_next = next_serve >= 0
+        return pd.DataFrame({
+            "serve": serve,
+            "end_serve": end_serve,
+            "end_game": end_game,
+            "next_serve": next_serve,
+            "serve_length": end_serve - serve,
+            "inplay_length": end_game - end_serve,
+            "rally_length": end_game - serve,
+            "noplay_length": np.where(has_next, next_serve - end_game, -1),
+        })
@@ -0,0 +1,135 @@
+"""
+Lazy clip augmentations.
+
+Augmented copies of a clip are not written to disk. Clip indices (shard indices and clip manifests) list
+them as named variants of the clip, e.g. `"variants": ["flip_lr"]`, and the dataset readers expand every
+clip into its original plus one virtual item per variant. The transform is applied to the whole
+(T, H, W, C) clip, or to a (N, T, H, W, C) batch of clips, when it is read.
+
+Example:
+    dataset = ClipShardDataset("data/shards")          # 2x the stored clips if they all list `flip_lr`
+    clip, label_id = dataset[1]                         # flipped view of the first stored clip
+    clips, label_ids = dataset.get_batch(range(32))     # variants applied batch-wise
+"""
+import json
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+ORIGINAL = "original"
+
+
+def flip_lr(clips: np.ndarray) -> np.ndarray:
+    """Horizontal flip of (..., H, W, C) frames; a view, no copy."""
+    return clips[..., ::-1, :]
+
+
+VARIANTS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    ORIGINAL: lambda clips: clips,
+    "flip_lr": flip_lr,
+}
+
+
+def check_variants(variants: Iterable[str]) -> List[str]:
+    variants = list(variants)
+    unknown = [variant for variant in variants if variant not in VARIANTS or variant == ORIGINAL]
+    if unknown:
+        raise ValueError(f"Unknown clip variants {unknown}; expected some of {sorted(set(VARIANTS) - {ORIGINAL})}")
+    return variants
+
+
+def apply_variant(clips: np.ndarray, variant: str) -> np.ndarray:
+    """Apply the transform of `variant` to a clip or a batch of clips."""
+    try:
+        transform = VARIANTS[variant]
+    except KeyError:
+        raise ValueError(f"Unknown clip variant '{variant}'") from None
+    return transform(clips)
+
+
+def add_variant(index_path: str | Path, variant: str, labels: Sequence[str] | None = None) -> int:
+    """
+    Add `variant` to the clips of a clip index file (shard index or clip manifest) in place.
+
+    Args:
+        index_path: JSON index with a `clips` list.
+        variant: Name of the variant, a key of `VARIANTS`.
+        labels: Only add it to clips with these labels; all clips by default.
+
+    Returns:
+        Number of clips the variant was added to.
+    """
+    check_variants([variant])
+    with open(index_path) as f:
+        index = json.load(f)
+    added = 0
+    for clip in index["clips"]:
+        variants = clip.setdefault("variants", [])
+        if variant not in variants and (labels is None or clip["label"] in labels):
+            variants.append(variant)
+            added += 1
+    with open(index_path, "w") as f:
+        json.dump(index, f)
+    return added
+
+
+class ClipVariantDataset:
+    """
+    Base of the clip readers: every entry of `clips` is one item as is, plus one item per listed variant.
+
+    Subclasses fill `clips` with index entries (which have at least `label` and optionally `variants`),
+    call `_expand` and implement `clip(i)`, which reads the i-th stored clip.
+    """
+
+    def __init__(self, labels: List[str] | None = None, augment: bool = True):
+        """
+        Args:
+            labels: Class names in label-id order; defaults to the sorted labels found.
+            augment: Expand the listed variants; with False every stored clip is read once, as is.
+        """
+        self.clips: List[dict] = []
+        self.items: List[Tuple[int, str]] = []
+        self.labels = labels
+        self.label2id: Dict[str, int] = {}
+        self.augment = augment
+
+    def _expand(self) -> None:
+        if self.labels is None:
+            self.labels = sorted({clip["label"] for clip in self.clips})
+        self.label2id = {label: i for i, label in enumerate(self.labels)}
+        self.items = []
+        for i, clip in enumerate(self.clips):
+            self.items.append((i, ORIGINAL))
+            if self.augment:
+                self.items.extend((i, variant) for variant in check_variants(clip.get("variants", [])))
+
+    def clip(self, i: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, i: int) -> Tuple[np.ndarray, int]:
+        """(clip, label id) of the i-th item; variants are returned as views where the transform allows it."""
+        clip_i, variant = self.items[i]
+        return apply_variant(self.clip(clip_i), variant), self.label2id[self.clips[clip_i]["label"]]
+
+    def get_batch(self, indices: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Read several items as one contiguous (N, T, H, W, C) array; each variant is applied once to all
+        the clips of the batch that use it.
+
+        Returns:
+            Clips and their label ids.
+        """
+        items = [self.items[i] for i in indices]
+        # A clip and its variants in the same batch are read once
+        stored = {clip_i: self.clip(clip_i) for clip_i in dict.fromkeys(clip_i for clip_i, _ in items)}
+        batch = np.stack([stored[clip_i] for clip_i, _ in items])
+        variants = np.array([variant for _, variant in items])
+        for variant in set(variants.tolist()) - {ORIGINAL}:
+            mask = variants == variant
+            batch[mask] = apply_variant(batch[mask], variant)
+        label_ids = np.array([self.label2id[self.clips[clip_i]["label"]] for clip_i, _ in items], dtype=np.int64)
+        return batch, label_ids
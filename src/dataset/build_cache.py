@@ -0,0 +1,220 @@
+"""
+Incremental dataset builds.
+
+The clip generators keep a build cache with one record per source video: the content hashes of the
+video and of its annotation file, the generator parameters and the artifact of every clip, keyed by
+(video hash, frame interval, transform). On the next run a video whose hashes and parameters are
+unchanged is skipped without being opened, and a changed one only re-writes the clips that are not
+already on disk. Adding one match to the dataset costs one match of work.
+
+File hashes are memoized by size and modification time, so unchanged files are not read again.
+The workers get a copy of their video's record and return the new one; the main process merges the
+records with `update_video` and saves the cache after every video.
+
+`write_video_clips` is the write step the generators share: it writes the planned clips of a video
+as clip files plus a manifest, or as shards, and records them in the video's build.
+
+Example:
+    cache = BuildCache("data/preprocessed/game-state/build_cache.json")
+    build = VideoBuild(video, annotation, params, cache.video(video.name))
+    if not build.up_to_date:
+        counts = write_video_clips(build, VideoIndex.load_or_build(video), clips, video,
+                                   manifest_dir="data/preprocessed/game-state/manifests")
+        cache.update_video(video.name, build.record(counts))
+        cache.save()
+"""
+import hashlib
+import json
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from ..video_io.clips import ClipSpec, write_clips
+from ..video_io.index import VideoIndex
+from ..video_io.sidecar import fingerprint
+from .manifest import ClipManifest
+from .shards import ClipShardWriter
+
+BUILD_CACHE_VERSION = 1
+
+
+def file_hash(path: str | Path, known: dict | None = None, chunk_size: int = 1 << 20) -> dict:
+    """
+    Content hash of a file, as `{"fingerprint": ..., "hash": ...}`.
+
+    Args:
+        path: File to hash.
+        known: A previous result for the same file; reused if the file's size and mtime didn't change.
+        chunk_size: Read size.
+    """
+    current = fingerprint(path)
+    if known is not None and known.get("fingerprint") == current:
+        return known
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return {"fingerprint": current, "hash": digest.hexdigest()}
+
+
+class VideoBuild:
+    """
+    Build state of one source video inside a generator run.
+    """
+
+    def __init__(self, video_path: str | Path, annotation_path: str | Path, params: dict, record: dict | None = None):
+        """
+        Args:
+            video_path: Source video.
+            annotation_path: Annotation file of the video.
+            params: Generator parameters that change the clips (clip length, seed, output format, ...).
+            record: The video's record from the previous build, if any.
+        """
+        self.previous = record or {}
+        self.params = params
+        self.video = file_hash(video_path, self.previous.get("video"))
+        self.annotation = file_hash(annotation_path, self.previous.get("annotation"))
+        self.artifacts: Dict[str, dict] = {}
+
+    @property
+    def up_to_date(self) -> bool:
+        """Same video, annotation and parameters as the previous build, whose artifacts all still exist."""
+        previous = self.previous
+        return (
+            previous.get("video", {}).get("hash") == self.video["hash"]
+            and previous.get("annotation", {}).get("hash") == self.annotation["hash"]
+            and previous.get("params") == self.params
+            and all(Path(artifact["output"]).exists() for artifact in previous.get("artifacts", {}).values())
+        )
+
+    def key(self, start: int, end: int, transform: str) -> str:
+        """Artifact key of the frames `[start, end)` of this video written with `transform`."""
+        return f"{self.video['hash']}:{int(start)}-{int(end)}:{transform}"
+
+    def cached(self, key: str, output: str | Path) -> dict | None:
+        """The previous artifact of `key`, if it was written to `output` and is still there."""
+        artifact = self.previous.get("artifacts", {}).get(key)
+        if artifact is None or artifact["output"] != Path(output).as_posix() or not Path(output).exists():
+            return None
+        return artifact
+
+    def add(self, key: str, output: str | Path, frames: int) -> None:
+        self.artifacts[key] = {"output": Path(output).as_posix(), "frames": int(frames)}
+
+    def stale_outputs(self) -> List[Path]:
+        """Outputs of the previous build that this build no longer produces."""
+        current = {artifact["output"] for artifact in self.artifacts.values()}
+        previous = {artifact["output"] for artifact in self.previous.get("artifacts", {}).values()}
+        return [Path(output) for output in sorted(previous - current)]
+
+    def record(self, counts: Dict[str, int]) -> dict:
+        """The record to store in the cache; `counts` is the number of clips per label."""
+        return {
+            "video": self.video,
+            "annotation": self.annotation,
+            "params": self.params,
+            "artifacts": self.artifacts,
+            "counts": dict(counts),
+        }
+
+
+class BuildCache:
+    """
+    Records of all the source videos of a dataset, saved as one JSON file.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.videos: Dict[str, dict] = {}
+        if self.path.is_file():
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == BUILD_CACHE_VERSION:
+                self.videos = data["videos"]
+
+    def video(self, name: str) -> dict | None:
+        return self.videos.get(name)
+
+    def update_video(self, name: str, record: dict) -> None:
+        self.videos[name] = record
+
+    def save(self) -> Path:
+        # Write to a temporary file first so an interrupted run never leaves a truncated cache
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": BUILD_CACHE_VERSION, "videos": self.videos}, f)
+        os.replace(tmp_path, self.path)
+        return self.path
+
+
+def write_video_clips(
+        build: VideoBuild,
+        index: VideoIndex,
+        clips: Sequence[ClipSpec],
+        video: str | Path,
+        output_format: str = "mp4",
+        manifest_dir: str | Path | None = None,
+        shard_dir: str | Path | None = None,
+        clip_length: int = 30,
+        encoder: str = "opencv",
+        encoder_options: dict | None = None
+) -> Counter:
+    """
+    Write the planned clips of one video and add them to its build.
+
+    In "mp4" mode every clip is a video file; clips already on disk from a previous build (same video
+    content, interval and encoding) are kept, outputs the build no longer produces are deleted and the
+    complete clips are listed in `<manifest_dir>/<video stem>.json`. In "shards" mode the clips are
+    stored resized to the VideoMAE input size in `<shard_dir>/<video stem>*`, which are rewritten as a
+    whole.
+
+    Args:
+        build: Build of the video.
+        index: Index of the video.
+        clips: Planned clips.
+        video: Source video; its name is the `source` of the clips.
+        output_format: "mp4" or "shards".
+        manifest_dir: Directory of the clip manifests ("mp4" mode).
+        shard_dir: Directory of the shards ("shards" mode).
+        clip_length: Frames per clip ("shards" mode).
+        encoder: `open_video_writer` backend ("mp4" mode).
+        encoder_options: `open_video_writer` options ("mp4" mode).
+
+    Returns:
+        Number of complete clips per label, i.e. of the clips listed in the manifest or the shards.
+    """
+    video = Path(video)
+    fps, frame_size = int(round(index.fps)), (index.width, index.height)
+    if output_format == "shards":
+        with ClipShardWriter(shard_dir, name=video.stem, clip_length=clip_length) as shards:
+            frames = write_clips(
+                index, clips, fps, frame_size,
+                open_writer=lambda clip: shards.open_clip(clip.label, video.name, clip.start, clip.end)
+            )
+        for clip, n_frames in frames.items():
+            build.add(build.key(clip.start, clip.end, "shards"), Path(shard_dir) / f"{video.stem}.json", n_frames)
+        # The shard writer only stores clips that filled all `clip_length` frames
+        complete = [clip for clip, n_frames in frames.items() if n_frames >= clip_length]
+    elif output_format == "mp4":
+        encoder_options = encoder_options or {}
+        transform = f"mp4:{encoder}:{json.dumps(encoder_options, sort_keys=True)}"
+        keys = {clip: build.key(clip.start, clip.end, transform) for clip in clips}
+        todo = [clip for clip in clips if build.cached(keys[clip], clip.output_file) is None]
+        written = write_clips(index, todo, fps, frame_size, encoder=encoder, encoder_options=encoder_options)
+        frames = {}
+        for clip in clips:
+            cached = build.cached(keys[clip], clip.output_file)
+            frames[clip] = cached["frames"] if cached is not None else written.get(clip, 0)
+            build.add(keys[clip], clip.output_file, frames[clip])
+        for output in build.stale_outputs():
+            output.unlink(missing_ok=True)
+        # Clips cut short by the end of the video stay on disk (and in the build) but aren't listed
+        complete = [clip for clip, n_frames in frames.items() if n_frames == clip.length]
+        with ClipManifest(manifest_dir, name=video.stem) as manifest:
+            for clip in complete:
+                manifest.add(clip.output_file, clip.label, video.name, clip.start, clip.end)
+    else:
+        raise ValueError(f"Unknown output format '{output_format}'; expected 'mp4' or 'shards'")
+    return Counter(clip.label for clip in complete)
@@ -0,0 +1,121 @@
+"""
+Manifests of clip files.
+
+When the clips are written as one video file per clip, each generator run also saves a manifest per
+source video: `<root>/<name>.json` lists every clip file with its label, source video, frame range and
+variants. `ClipFileDataset` reads the manifests of a directory, decodes each clip file once and derives
+the variants (e.g. the left-right flip) from the decoded frames, so flipped copies never hit the disk.
+
+Example:
+    with ClipManifest("data/preprocessed/game-state/manifests", name=video.stem) as manifest:
+        manifest.add(clip.output_file, clip.label, video.name, clip.start, clip.end, variants=["flip_lr"])
+
+    dataset = ClipFileDataset("data/preprocessed/game-state/manifests")
+    clip, label_id = dataset[0]          # (T, H, W, 3) uint8 RGB
+"""
+import json
+import os
+from pathlib import Path
+from typing import List, Sequence
+
+import cv2
+import numpy as np
+
+from .augment import ClipVariantDataset, check_variants
+
+MANIFEST_VERSION = 1
+
+
+class ClipManifest:
+    """
+    Clip files of one source video, saved as `<root>/<name>.json`. File paths are stored relative to `root`.
+    """
+
+    def __init__(self, root: str | Path, name: str):
+        """
+        Args:
+            root: Directory of the manifests.
+            name: Manifest file name (e.g. the source video stem).
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.clips: List[dict] = []
+
+    @property
+    def path(self) -> Path:
+        return self.root / f"{self.name}.json"
+
+    def add(
+            self,
+            file: str | Path,
+            label: str,
+            source: str,
+            start: int,
+            end: int,
+            variants: Sequence[str] = (),
+            **extra
+    ) -> None:
+        self.clips.append({
+            "file": Path(os.path.relpath(file, self.root)).as_posix(),
+            "label": label,
+            "source": source,
+            "start": int(start),
+            "end": int(end),
+            "variants": check_variants(variants),
+            **extra
+        })
+
+    def save(self) -> Path:
+        with open(self.path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "clips": self.clips}, f)
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.save()
+
+
+def read_clip(path: str | Path) -> np.ndarray:
+    """Decode all frames of a clip file into a (T, H, W, 3) uint8 RGB array."""
+    cap = cv2.VideoCapture(Path(path).as_posix())
+    frames = []
+    while True:
+        status, frame = cap.read()
+        if not status:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    if not frames:
+        raise IOError(f"Could not read any frame from {path}")
+    return np.stack(frames)
+
+
+class ClipFileDataset(ClipVariantDataset):
+    """
+    Clip files of all manifests in a directory. Every item decodes one file; variants reuse the decode
+    of their clip instead of reading a second file.
+    """
+
+    def __init__(self, root: str | Path, labels: List[str] | None = None, augment: bool = True):
+        """
+        Args:
+            root: Directory with the `<name>.json` manifests.
+            labels: Class names in label-id order; defaults to the sorted labels found.
+            augment: Also return the variants listed for each clip.
+        """
+        super().__init__(labels, augment)
+        self.root = Path(root)
+        for manifest_file in sorted(self.root.glob("*.json")):
+            with open(manifest_file) as f:
+                manifest = json.load(f)
+            if manifest.get("version") != MANIFEST_VERSION:
+                continue
+            self.clips.extend(manifest["clips"])
+        self._expand()
+
+    def clip(self, i: int) -> np.ndarray:
+        """The i-th clip file, decoded."""
+        return read_clip(self.root / self.clips[i]["file"])
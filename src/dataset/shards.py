@@ -0,0 +1,197 @@
+"""
+Pre-decoded, pre-resized clip shards for training the game-state classifier.
+
+Clips are resized to the VideoMAE input size once, at dataset build time, converted to RGB and
+appended as raw uint8 arrays to large shard files. Each writer also saves a JSON index (label,
+source video, frame range, shard and position of every clip). `ClipShardDataset` memory-maps the
+shards, so reading a clip is a slice of the map: no decoding, no resizing and no copy. Augmented
+copies are not stored; clips list them as variants that the dataset applies at read time.
+
+Example:
+    with ClipShardWriter("data/shards", name=video.stem, clip_length=30) as shards:
+        write_clips(index, clips, fps, frame_size,
+                    open_writer=lambda clip: shards.open_clip(clip.label, video.name, clip.start, clip.end,
+                                                              variants=["flip_lr"]))
+
+    dataset = ClipShardDataset("data/shards")
+    clip, label_id = dataset[0]          # (30, 224, 224, 3) uint8 view
+    flipped, label_id = dataset[1]       # its flip_lr variant, also a view
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from ..video_io.frame_source import VIDEOMAE_INPUT_SIZE
+from .augment import ClipVariantDataset, check_variants
+
+SHARD_VERSION = 1
+
+
+class _ShardClip:
+    """
+    Clip writer handed out by `ClipShardWriter.open_clip`. Frames are resized into the clip's own
+    buffer as they arrive, so overlapping clips can be written at the same time.
+    """
+
+    def __init__(self, writer: "ClipShardWriter", entry: dict):
+        self.writer = writer
+        self.entry = entry
+        self.buffer = np.empty(writer.clip_shape, dtype=np.uint8)
+        self.n_frames = 0
+
+    def write(self, frame: np.ndarray) -> None:
+        if self.n_frames >= len(self.buffer):
+            return
+        resized = cv2.resize(frame, self.writer.size, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=self.buffer[self.n_frames])
+        self.n_frames += 1
+
+    def release(self) -> None:
+        # Clips cut short by the end of the video are dropped so every clip has the same shape
+        if self.n_frames == len(self.buffer):
+            self.writer.append(self.buffer, self.entry)
+
+
+class ClipShardWriter:
+    """
+    Append fixed-length clips to `<root>/<name>_<shard>.bin` files and index them in `<root>/<name>.json`.
+
+    Clips are added with `open_clip` ... `release`, which is how `write_clips` drives its
+    writers, or directly with `append`.
+    """
+
+    def __init__(
+            self,
+            root: str | Path,
+            name: str,
+            clip_length: int = 30,
+            size: Tuple[int, int] = VIDEOMAE_INPUT_SIZE,
+            clips_per_shard: int = 1024
+    ):
+        """
+        Args:
+            root: Output directory.
+            name: Prefix of the shard and index files (e.g. the source video stem).
+            clip_length: Frames per clip.
+            size: (width, height) the frames are resized to.
+            clips_per_shard: A new shard file is started after this many clips.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.clip_length = clip_length
+        self.size = tuple(size)
+        self.clips_per_shard = clips_per_shard
+        self.clips: List[dict] = []
+        self._shard = -1
+        self._file = None
+        self._in_shard = 0
+
+    @property
+    def clip_shape(self) -> Tuple[int, int, int, int]:
+        return self.clip_length, self.size[1], self.size[0], 3
+
+    def open_clip(
+            self,
+            label: str,
+            source: str,
+            start: int,
+            end: int,
+            variants: Sequence[str] = (),
+            **extra
+    ) -> _ShardClip:
+        """
+        Start a clip; the returned object has `write(frame)` and `release()`. `variants` lists the
+        augmentations (e.g. `flip_lr`) the dataset derives from the clip at read time.
+        """
+        entry = {
+            "label": label, "source": source, "start": int(start), "end": int(end),
+            "variants": check_variants(variants), **extra
+        }
+        return _ShardClip(self, entry)
+
+    def append(self, clip: np.ndarray, entry: dict) -> None:
+        """Append one (clip_length, height, width, 3) uint8 RGB clip with its index entry."""
+        if clip.shape != self.clip_shape or clip.dtype != np.uint8:
+            raise ValueError(f"Expected a {self.clip_shape} uint8 clip, got {clip.shape} {clip.dtype}")
+        if self._file is None or self._in_shard >= self.clips_per_shard:
+            self._next_shard()
+        self._file.write(np.ascontiguousarray(clip).tobytes())
+        self.clips.append({**entry, "shard": self._shard_name(self._shard), "position": self._in_shard})
+        self._in_shard += 1
+
+    def _shard_name(self, shard: int) -> str:
+        return f"{self.name}_{shard:05d}.bin"
+
+    def _next_shard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._shard += 1
+        self._in_shard = 0
+        self._file = open(self.root / self._shard_name(self._shard), "wb")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        index = {
+            "version": SHARD_VERSION,
+            "clip_shape": list(self.clip_shape),
+            "dtype": "uint8",
+            "channels": "rgb",
+            "clips": self.clips,
+        }
+        with open(self.root / f"{self.name}.json", "w") as f:
+            json.dump(index, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ClipShardDataset(ClipVariantDataset):
+    """
+    Clips of all shard indices in a directory, read as zero-copy views of memory-mapped shards.
+    """
+
+    def __init__(self, root: str | Path, labels: List[str] | None = None, augment: bool = True):
+        """
+        Args:
+            root: Directory with the `<name>.json` indices and their shards.
+            labels: Class names in label-id order; defaults to the sorted labels found.
+            augment: Also return the variants listed for each clip.
+        """
+        super().__init__(labels, augment)
+        self.root = Path(root)
+        self.clip_shape: Tuple[int, ...] | None = None
+        for index_file in sorted(self.root.glob("*.json")):
+            with open(index_file) as f:
+                index = json.load(f)
+            if index.get("version") != SHARD_VERSION:
+                continue
+            shape = tuple(index["clip_shape"])
+            if self.clip_shape is None:
+                self.clip_shape = shape
+            elif shape != self.clip_shape:
+                raise ValueError(f"{index_file.name} has clips of shape {shape}, expected {self.clip_shape}")
+            self.clips.extend(index["clips"])
+        self._expand()
+        self._shards: Dict[str, np.ndarray] = {}
+
+    def shard(self, name: str) -> np.ndarray:
+        """(n_clips, T, H, W, 3) memory map of a shard file, opened on first use."""
+        shard = self._shards.get(name)
+        if shard is None:
+            shard = np.memmap(self.root / name, dtype=np.uint8, mode="r").reshape(-1, *self.clip_shape)
+            self._shards[name] = shard
+        return shard
+
+    def clip(self, i: int) -> np.ndarray:
+        """The i-th stored clip, a (T, H, W, 3) uint8 RGB view of its shard."""
+        entry = self.clips[i]
+        return self.shard(entry["shard"])[entry["position"]]
@@ -0,0 +1,306 @@
+"""
+Train/test splits that never move a file.
+
+Clips are assigned to a split per source video, so clips cut from the same video never end up in both
+splits, and the groups are picked so that every class gets close to `test_size` of its clips in the
+test split. A split is written as one clip index per split (`<out>/train/clips.json`, ...) that points
+back at the original clip files or shards, optionally with a hardlink / symlink tree
+(`<out>/train/play/<file>`, ...) for tools that expect class folders. Augmentation variants are part
+of the split: they are recorded in `<out>/split.json` and only listed in the train index, so the test
+split is always evaluated on the clips as they are.
+
+Re-splitting with another seed or test size rewrites those indices and replaces the links recorded
+in `<out>/split.json`, which takes seconds even for 100k clips; files that aren't links of a
+previous split are never deleted.
+
+Example:
+    summary = split_clip_indices("data/preprocessed/game-state/manifests", "data/processed/game-status",
+                                 test_size=0.1, seed=0, link_mode="hardlink")
+    train = ClipFileDataset("data/processed/game-status/train")
+"""
+import json
+import os
+import shutil
+from collections import Counter
+from itertools import compress
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .augment import add_variant, check_variants
+
+SPLIT_VERSION = 1
+SPLITS = ("train", "test")
+LINK_MODES = ("hardlink", "symlink", "copy")
+# Class folder of a label in the link trees; the folder names the clip generators have always used
+LABEL_FOLDERS = {"inplay": "play", "noplay": "no-play", "service": "service"}
+FOLDER_LABELS = {folder: label for label, folder in LABEL_FOLDERS.items()}
+# Entry fields holding a path relative to the directory of their index
+PATH_KEYS = ("file", "shard")
+
+
+def assign_splits(labels: Sequence[str], groups: Sequence[str], test_size: float = 0.1, seed: int = 0) -> np.ndarray:
+    """
+    Pick whole groups for the test split so that each class gets about `test_size` of its items.
+
+    The groups are visited in a random order (set by `seed`) and one is moved to the test split
+    whenever that brings the per-class test counts closer to their targets.
+
+    Args:
+        labels: Class of every item.
+        groups: Group (e.g. source video) of every item.
+        test_size: Target fraction of every class in the test split.
+        seed: Seed of the group order.
+
+    Returns:
+        Boolean mask of the test items.
+    """
+    classes, label_ids = np.unique(np.asarray(labels), return_inverse=True)
+    group_names, group_ids = np.unique(np.asarray(groups), return_inverse=True)
+    counts = np.zeros((len(group_names), len(classes)))
+    np.add.at(counts, (group_ids, label_ids), 1)
+
+    target = counts.sum(axis=0) * test_size
+    # Relative errors, so small classes weigh as much as large ones
+    scale = 1 / np.maximum(target, 1)
+    test_counts = np.zeros(len(classes))
+    in_test = np.zeros(len(group_names), dtype=bool)
+    for g in np.random.default_rng(seed).permutation(len(group_names)):
+        with_group = test_counts + counts[g]
+        if (np.abs(with_group - target) * scale).sum() < (np.abs(test_counts - target) * scale).sum():
+            in_test[g] = True
+            test_counts = with_group
+    return in_test[group_ids]
+
+
+def read_clip_indices(root: str | Path) -> Tuple[dict, List[dict]]:
+    """
+    Read all clip indices (shard indices or clip manifests) of a directory.
+
+    Returns:
+        The index header (every key but `clips`, which must be the same for all indices) and the clip
+        entries, with their paths made relative to the working directory.
+    """
+    root = Path(root)
+    header: dict | None = None
+    clips: List[dict] = []
+    for index_file in sorted(root.glob("*.json")):
+        with open(index_file) as f:
+            index = json.load(f)
+        if "clips" not in index:
+            continue
+        index_header = {key: value for key, value in index.items() if key != "clips"}
+        if header is None:
+            header = index_header
+        elif index_header != header:
+            raise ValueError(f"{index_file.name} has header {index_header}, expected {header}")
+        for clip in index["clips"]:
+            clips.append({key: (root / value).as_posix() if key in PATH_KEYS else value for key, value in clip.items()})
+    return header or {}, clips
+
+
+def _is_link_to(path: Path, source: str | Path) -> bool:
+    """Whether removing `path` loses nothing: a symlink, or a hardlink / `copy2` copy of `source`."""
+    if path.is_symlink():
+        return True
+    if not path.is_file() or not os.path.exists(source) or path.resolve() == Path(source).resolve():
+        return False
+    if os.path.samefile(path, source):
+        return True
+    stat, source_stat = path.stat(), os.stat(source)
+    return stat.st_size == source_stat.st_size and stat.st_mtime_ns == source_stat.st_mtime_ns
+
+
+def link_tree(
+        sources: Sequence[str | Path],
+        targets: Sequence[str | Path],
+        dest: str | Path,
+        mode: str = "hardlink",
+        previous: Dict[str, str] | None = None
+) -> Dict[str, str]:
+    """
+    Create `dest/<target>` as a hardlink, symlink or copy of each source, after removing the links
+    of a previous call, so calling it again re-splits. Nothing else under `dest` is touched.
+
+    Args:
+        sources: Files to link.
+        targets: Their paths relative to `dest`.
+        dest: Root of the tree.
+        mode: One of `LINK_MODES`.
+        previous: The return value of the previous call on `dest`.
+
+    Returns:
+        The links made, target (relative to `dest`) -> source.
+
+    Raises:
+        ValueError: Unknown `mode`; a previous link was replaced by a file that isn't a link to its
+            source; or a target already exists and is not a previous link. Nothing is changed then.
+    """
+    if mode not in LINK_MODES:
+        raise ValueError(f"Unknown link mode '{mode}'; expected one of {LINK_MODES}")
+    dest = Path(dest)
+    previous = previous or {}
+    links = {Path(target).as_posix(): Path(source).as_posix() for source, target in zip(sources, targets)}
+
+    stale = []
+    for target, source in previous.items():
+        path = dest / target
+        if not os.path.lexists(path):
+            continue
+        if not _is_link_to(path, source):
+            raise ValueError(f"{path} is not a link to {source}; refusing to remove it")
+        stale.append(path)
+    for target in links:
+        if target not in previous and os.path.lexists(dest / target):
+            raise ValueError(f"{dest / target} already exists and is not a link of a previous split")
+
+    for path in stale:
+        path.unlink()
+    # Drop the folders the old links leave empty, deepest first
+    for folder in sorted({path.parent for path in stale}, key=lambda folder: len(folder.parts), reverse=True):
+        while folder != dest and folder.is_dir() and not any(folder.iterdir()):
+            folder.rmdir()
+            folder = folder.parent
+
+    for target, source in links.items():
+        path = dest / target
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if mode == "hardlink":
+            os.link(source, path)
+        elif mode == "symlink":
+            os.symlink(Path(source).resolve(), path)
+        else:
+            shutil.copy2(source, path)
+    return links
+
+
+def _previous_split(out_dir: str | Path) -> dict:
+    path = Path(out_dir) / "split.json"
+    if not path.is_file():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def previous_links(out_dir: str | Path) -> Dict[str, str]:
+    """The link tree recorded in `<out_dir>/split.json` by the last split, if any."""
+    return _previous_split(out_dir).get("links", {})
+
+
+def _train_variants(label: str, variants: Dict[str, List[str] | None]) -> List[str]:
+    return [variant for variant, labels in variants.items() if labels is None or label in labels]
+
+
+def split_clips(
+        clips: List[dict],
+        out_dir: str | Path,
+        test_size: float = 0.1,
+        seed: int = 0,
+        header: dict | None = None,
+        group_key: str = "source",
+        link_mode: str | None = None,
+        variants: Dict[str, List[str] | None] | None = None
+) -> dict:
+    """
+    Split clip entries by group and write `<out_dir>/<split>/clips.json` plus a `split.json` summary.
+
+    `split.json` is the one place the augmentation variants of a dataset are recorded: the train
+    entries get the variants given here (or recorded by the previous split), whatever `variants` the
+    input entries list, and the test entries get none.
+
+    Args:
+        clips: Clip entries with `label`, `group_key` and paths relative to the working directory.
+        out_dir: Output directory.
+        test_size: Target fraction of every class in the test split.
+        seed: Seed of the split.
+        header: Index header of the clips (e.g. `version` and `clip_shape` of shard indices).
+        group_key: Entry field the clips are grouped by.
+        link_mode: Also build a `<out_dir>/<split>/<folder>/<file>` tree of the clip files with this
+            `link_tree` mode (the folder of a label is given by `LABEL_FOLDERS`, e.g. `play` for
+            `inplay`); None writes the indices only.
+        variants: Variants of the train clips, variant -> labels it applies to (None for all labels),
+            e.g. `{"flip_lr": None}`; None keeps the variants of the previous split of `out_dir`.
+
+    Returns:
+        The summary: clips, groups and clips per label of every split, and the links made.
+    """
+    out_dir = Path(out_dir)
+    previous = _previous_split(out_dir)
+    variants = previous.get("variants", {}) if variants is None else variants
+    variants = {
+        variant: None if variants[variant] is None else list(variants[variant])
+        for variant in check_variants(variants)
+    }
+    is_test = assign_splits([clip["label"] for clip in clips], [clip[group_key] for clip in clips], test_size, seed)
+    masks = {"train": ~is_test, "test": is_test}
+
+    # The links of the previous split are replaced (or only removed when link_mode is None)
+    files = [] if link_mode is None else [
+        (clip["file"], Path(split) / LABEL_FOLDERS.get(clip["label"], clip["label"]) / Path(clip["file"]).name)
+        for split in SPLITS for clip in compress(clips, masks[split]) if "file" in clip
+    ]
+    links = link_tree(
+        [source for source, _ in files], [target for _, target in files], out_dir,
+        mode=link_mode or "hardlink", previous=previous.get("links", {})
+    )
+
+    summary = {
+        "version": SPLIT_VERSION, "test_size": test_size, "seed": seed, "group_key": group_key,
+        "variants": variants, "splits": {}
+    }
+    for split in SPLITS:
+        split_dir = out_dir / split
+        split_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for clip in compress(clips, masks[split]):
+            entry = {key: Path(os.path.relpath(value, split_dir)).as_posix() if key in PATH_KEYS else value
+                     for key, value in clip.items() if key != "variants"}
+            if split == "train":
+                entry["variants"] = _train_variants(clip["label"], variants)
+            entries.append(entry)
+        with open(split_dir / "clips.json", "w") as f:
+            json.dump({**(header or {}), "clips": entries}, f)
+        summary["splits"][split] = {
+            "clips": len(entries),
+            "groups": sorted({clip[group_key] for clip in entries}),
+            "labels": dict(Counter(clip["label"] for clip in entries)),
+        }
+
+    summary["links"] = links
+    with open(out_dir / "split.json", "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def split_clip_indices(root: str | Path, out_dir: str | Path, **kwargs) -> dict:
+    """`split_clips` on all the clip indices of `root` (see `read_clip_indices`)."""
+    header, clips = read_clip_indices(root)
+    return split_clips(clips, out_dir, header=header, **kwargs)
+
+
+def add_split_variant(out_dir: str | Path, variant: str, labels: Sequence[str] | None = None) -> int:
+    """
+    Add `variant` to the train split of `out_dir` and record it in its `split.json`, so re-splitting
+    keeps it.
+
+    Args:
+        out_dir: Directory of a `split_clips` split.
+        variant: Name of the variant, a key of `VARIANTS`.
+        labels: Only add it to clips with these labels; all clips by default.
+
+    Returns:
+        Number of train clips the variant was added to.
+    """
+    out_dir = Path(out_dir)
+    summary = _previous_split(out_dir)
+    if not summary:
+        raise FileNotFoundError(f"No split.json in {out_dir}; split the clips with split_clips first")
+    added = add_variant(out_dir / "train" / "clips.json", variant, labels=labels)
+    # Clips that already have the variant keep it, so the recorded labels only ever grow
+    variants = summary.setdefault("variants", {})
+    recorded = variants.get(variant, [])
+    variants[variant] = None if labels is None or recorded is None else sorted(set(recorded) | set(labels))
+    with open(out_dir / "split.json", "w") as f:
+        json.dump(summary, f, indent=2)
+    return added
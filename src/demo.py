@@ -1,102 +1,147 @@
 """
 Demo script for volleyball analytics ML Manager.
 
-This script provides two main functions:
+This script provides four main functions:
 1. run_object_detection: Detects and tracks ball with trailing path, detects actions
-2. run_video_classification: Classifies game state every 30 frames and visualizes results
+   (run_object_detection_parallel does the same on keyframe-aligned chunks in several processes)
+2. run_video_classification: Classifies game state over a sliding window of frames and visualizes results
+3. run_gated_detection: Classifies game state and only runs the detectors during SERVICE and PLAY
+4. run_headless_analytics: Streams detections and game states to JSONL/Parquet without rendering or encoding
 """
-from typing import List
+from typing import List, Tuple
+from argparse import ArgumentParser
 
 import cv2
 import numpy as np
-import supervision as sv
 from pathlib import Path
 from rich.progress import Progress
 
-from ml_manager.core import Detection, PlayerKeyPoints
 from ml_manager.ml_manager import MLManager
+from pipeline import (
+    BallTracker, DetectionArrays, DetectionRenderer, FrameDetections, FrameRingBuffer, GameStateGate, StagedPipeline,
+    StageProfiler, VideoChunk, batched, detect_all_batch, iter_chunk_frames, open_event_sink, run_chunked
+)
+from video_io import open_frame_source, open_video_writer
 
+# Frames without a ball measurement before the ball tracker drops the ball; bounds --ball_detect_every
+BALL_MAX_GAP = 5
 
-def det2supervision(detections: List[Detection | PlayerKeyPoints]):
-    if detections:
-        boxes = []
-        confidences = []
-        class_ids = []
-        labels = []
-
-        for detection in detections:
-            if detection.bbox is not None:
-                bbox = detection.bbox
-                boxes.append([bbox.x1, bbox.y1, bbox.x2, bbox.y2])
-                confidences.append(detection.confidence)
-                class_ids.append(detection.class_id)
-                labels.append(f"{detection.class_name}: {detection.confidence:.2f}")
-
-        if boxes:
-            sv_detections = sv.Detections(
-                xyxy=np.array(boxes),
-                confidence=np.array(confidences),
-                class_id=np.array(class_ids)
-            )
-            return sv_detections
 
-    return []
+def save_profile(profiler: StageProfiler, profile_path: str | None, **metadata) -> None:
+    """
+    Write the profiler report to `profile_path` (if given) and print the per-stage p50/p95/p99.
+    """
+    if profile_path is None:
+        return
+    profiler.stop()
+    report = profiler.save(profile_path, **metadata)
+    print(f"Profile: {report['frames']} frames, {report['fps']:.2f} FPS")
+    for name, stage in report["stages"].items():
+        print(
+            f"  {name:<28} n={stage['count']:<8} p50={stage['p50_ms']:.2f}ms "
+            f"p95={stage['p95_ms']:.2f}ms p99={stage['p99_ms']:.2f}ms"
+        )
+    print(f"Profile report saved to: {profile_path}")
+
+
+def create_renderer(ml_manager: MLManager) -> DetectionRenderer:
+    """
+    Create the detection renderer; its annotators and label tables are built once per video.
+    """
+    return DetectionRenderer(
+        class_name=ml_manager.action_detector.yolo_module.id2class,
+        label_name=ml_manager.action_detector.action_id2name
+    )
+
 
+def ball_center(detections: FrameDetections) -> np.ndarray | None:
+    """Center of the detected ball, or None if there is none."""
+    return detections.ball.centers[0] if len(detections.ball) > 0 else None
 
-def run_object_detection(ml_manager: MLManager, video_path: str, output_path: str) -> None:
+
+def render_detections(
+        renderer: DetectionRenderer,
+        frame: np.ndarray,
+        detections: FrameDetections,
+        ball_tracker: BallTracker,
+        frame_no: int
+) -> np.ndarray:
+    """
+    Update the ball tracker with the detected ball (or its prediction) and draw all detections on the frame.
+    """
+    ball_tracker.update(frame_no, ball_center(detections))
+    return renderer.render(frame, detections, ball_tracker.trajectory(renderer.trail_length))
+
+
+def run_object_detection(
+        ml_manager: MLManager,
+        video_path: str,
+        output_path: str,
+        pipelined: bool = False,
+        queue_size: int = 8,
+        batch_size: int = 1,
+        decoder: str = "opencv",
+        encoder: str = "opencv",
+        encoder_options: dict | None = None,
+        profile_path: str | None = None,
+        ball_detect_every: int = 1
+) -> None:
     """
     Run object detection on video with ball tracking, action detection, and player detection.
     
     This function:
     - Loads the ML Manager
-    - Detects and tracks ball with 8-frame trailing path
+    - Detects and tracks ball (Kalman filtered, short gaps interpolated) with 8-frame trailing path
     - Detects actions (no tracking needed for actions)
     - Detects players and visualizes them with triangles
     - Visualizes ball with yellow circles, actions with class-specific colored boxes, and players with green triangles
     - Saves the output video
-    
+
+    With `pipelined=True`, decoding, inference, annotation and encoding each run in their own
+    thread and pass frames through bounded queues (see `pipeline.StagedPipeline`). Frames are
+    still written in their original order.
+
+    With `batch_size > 1`, frames are grouped and sent to the models together through
+    `pipeline.detect_all_batch`, which amortizes the per-call overhead of each model.
+
     Args:
         ml_manager: The MLManager instance.
         video_path: Path to input video file.
         output_path: Path to save output video with visualizations
+        pipelined: Run decode / inference / annotate / encode as concurrent stages.
+        queue_size: Maximum number of batches buffered between two stages in pipelined mode.
+        batch_size: Number of frames per inference call.
+        decoder: Frame source backend, "opencv" or "pyav" (multithreaded FFmpeg decoding).
+        encoder: Output writer backend, "opencv" (mp4v) or "pyav" (libx264).
+        encoder_options: Backend options for `video_io.open_video_writer`, e.g.
+            `{"crf": 23, "preset": "veryfast", "threads": 4, "output_size": (1280, 720)}`.
+        profile_path: When set, time every stage and model call and write a JSON latency report there.
+        ball_detect_every: Run the ball detector on every n-th frame only; the ball tracker predicts
+            its position on the other frames (2 halves the ball model calls). At most `BALL_MAX_GAP + 1`.
     """
     print("Initializing ML Manager...")
     
     ml_manager.check_models()
+    profiler = StageProfiler(enabled=profile_path is not None)
     
     print("Opening video...")
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise RuntimeError(f"Could not open video: {video_path}")
-    
+    source = open_frame_source(video_path, backend=decoder)
+
     # Get video properties
-    width, height, fps, _, total_frames = [int(cap.get(prop)) for prop in range(3, 8)]
+    width, height, fps, total_frames = source.width, source.height, source.fps, source.total_frames
     print(f"Video properties: {width}x{height}, {fps} FPS, {total_frames} frames")
 
     # setup output folder
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
 
     # Setup video writer
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    out = open_video_writer(output_path, fps, (width, height), backend=encoder, **(encoder_options or {}))
     
-    # Initialize supervision annotators
-    ball_annotator = sv.LabelAnnotator(color=sv.Color.YELLOW, text_thickness=1, text_scale=0.5)
-    label_annotator = sv.LabelAnnotator(text_thickness=1, text_scale=0.5)
-    triangle_annotator = sv.TriangleAnnotator(color=sv.Color.GREEN)
-    
-    # Define colors for different action classes (class_id -> color)
-    COLORS = {
-        "ball": sv.Color.RED,
-        "block": sv.Color.BLUE,
-        "receive": sv.Color.from_hex('#800080'),
-        "set": sv.Color.from_hex("#FFA500"),
-        "spike": sv.Color.from_hex("#FFC0CB")
-    }
-    
-    # Tracking state
-    ball_trajectory = []
-    frame_count = 0
+    # Initialize the renderer (annotators and label tables are built once)
+    renderer = create_renderer(ml_manager)
+
+    # Tracking state (fixed-size trajectory, constant memory)
+    ball_tracker = BallTracker(max_gap=BALL_MAX_GAP, detect_every=ball_detect_every)
     print("Processing video frames...")
 
     with Progress() as progress:
@@ -105,157 +150,323 @@ def run_object_detection(ml_manager: MLManager, video_path: str, output_path: st
             total=total_frames
         )
 
-        while frame_count < total_frames:
-            ret, frame = cap.read()
-            progress.update(task, advance=1)
+        def detect(batch: List[Tuple[int, np.ndarray]]):
+            frame_nos, frames = zip(*batch)
+            # Detect all objects (actions, ball, players) for the whole batch
+            with profiler.stage("inference"):
+                detections = detect_all_batch(
+                    ml_manager, list(frames), conf_threshold=0.25, iou_threshold=0.45,
+                    detect_ball=[ball_tracker.should_detect(frame_no) for frame_no in frame_nos]
+                )
+            with profiler.stage("postprocess"):
+                detections = [FrameDetections.from_ml_manager(d) for d in detections]
+            return frame_nos, frames, detections
+
+        def annotate(item) -> List[np.ndarray]:
+            frame_nos, frames, detections = item
+            with profiler.stage("annotate"):
+                return [
+                    render_detections(renderer, frame, frame_detections, ball_tracker, frame_no)
+                    for frame_no, frame, frame_detections in zip(frame_nos, frames, detections)
+                ]
+
+        def encode(annotated_frames: List[np.ndarray]) -> None:
+            # Write frames to output video
+            with profiler.stage("encode"):
+                for annotated_frame in annotated_frames:
+                    out.write(annotated_frame)
+            profiler.add_frames(len(annotated_frames))
+            progress.update(task, advance=len(annotated_frames))
+
+        batches = batched(enumerate(profiler.iterate("decode", source.frames())), batch_size)
+        with profiler.instrument(ml_manager):
+            if pipelined:
+                StagedPipeline(
+                    stages=[("inference", detect), ("annotate", annotate), ("encode", encode)],
+                    queue_size=queue_size
+                ).run(batches)
+            else:
+                for batch in batches:
+                    encode(annotate(detect(batch)))
 
-            if not ret:
-                progress.update(task, advance=30)
-                break
+        # Cleanup
+        source.close()
+        out.release()
+        ml_manager.cleanup()
 
-            frame_count += 1
-            # Detect all objects (actions, ball, players) using detect_all
-            action_detections, ball_detection, player_detections = ml_manager.detect_all(
-                frame, conf_threshold=0.25, iou_threshold=0.45
-            )
+        print(f"Object detection completed (ball, actions, players). Output saved to: {output_path}")
 
-            # Process ball detections
-            if ball_detection:
-                ball_detections_sv = ball_detection.to_supervision()
-                # Update ball trajectory for tracking
-                ball_trajectory.append(ball_detection.bbox.center)
-
-            # Process action detections
-            action_detections_sv = det2supervision(detections=action_detections)
-
-            # Process player detections
-            player_detections_sv = det2supervision(detections=player_detections)
-
-            # Annotate frame
-            annotated_frame = frame.copy()
-
-            # Draw ball trajectory (8 frames trailing)
-            if ball_trajectory:
-                # Keep only last 8 points for trailing effect
-                recent_trajectory = ball_trajectory[-8:]
-                if len(recent_trajectory) > 1:
-                    # Draw trajectory line using OpenCV
-                    for i in range(1, len(recent_trajectory)):
-                        # Calculate alpha (transparency) for fading effect
-                        alpha = i / len(recent_trajectory)
-                        thickness = max(1, int(3 * alpha))
-
-                        # Convert points to integers
-                        pt1 = (int(recent_trajectory[i-1][0]), int(recent_trajectory[i-1][1]))
-                        pt2 = (int(recent_trajectory[i][0]), int(recent_trajectory[i][1]))
-
-                        # Draw line segment with varying thickness for trailing effect
-                        cv2.line(annotated_frame, pt1, pt2, (0, 255, 255), thickness)  # Yellow trail
-
-                    # Draw current ball position as a circle
-                    if recent_trajectory:
-                        current_pos = (int(recent_trajectory[-1][0]), int(recent_trajectory[-1][1]))
-                        cv2.circle(annotated_frame, current_pos, 5, (0, 0, 255), -1)  # Red dot
-
-            # Draw ball detections with circles (yellow)
-            if len(ball_detections_sv) > 0:
-                annotated_frame = ball_annotator.annotate(
-                    scene=annotated_frame,
-                    detections=ball_detections_sv,
-                    labels=["Ball"]
-                )
+    save_profile(
+        profiler, profile_path, video=video_path, mode="detection", pipelined=pipelined, batch_size=batch_size,
+        ball_detect_every=ball_detect_every
+    )
 
-            # Draw action detections with class-specific colors
-            if len(action_detections_sv) > 0:
-                # Group detections by class_id for color-specific annotation
-                for class_id in np.unique(action_detections_sv.class_id):
-                    # Filter detections for this class
-                    class_mask = action_detections_sv.class_id == class_id
-                    class_detections: sv.Detections = action_detections_sv[class_mask]
-
-                    # Get color for this class, default to RED if not found
-                    action = ml_manager.action_detector.yolo_module.id2class(class_id)
-                    color = COLORS.get(action, sv.Color.WHITE)
-
-                    # Create annotator for this specific color
-                    class_box_annotator = sv.BoxAnnotator(thickness=2, color=color)
-
-                    # Annotate with class-specific color
-                    annotated_frame = class_box_annotator.annotate(
-                        scene=annotated_frame,
-                        detections=class_detections
-                    )
 
-                    # Get labels for this class
-                    class_labels = [
-                        ml_manager.action_detector.action_id2name(det)
-                        for det in class_detections.class_id
-                    ]
-                    # class_labels = [action_labels[i] for i, mask in enumerate(class_mask) if mask]
-                    annotated_frame = label_annotator.annotate(
-                        scene=annotated_frame,
-                        detections=class_detections,
-                        labels=class_labels
-                    )
+def draw_game_state(frame: np.ndarray, game_state: str, confidence: float, frame_count: int) -> np.ndarray:
+    """
+    Draw the game state box (state, confidence and frame number) on a copy of the frame.
 
-            # Draw player detections with triangles (green)
-            if len(player_detections_sv) > 0:
-                annotated_frame = triangle_annotator.annotate(
-                    scene=annotated_frame,
-                    detections=player_detections_sv
-                )
+    Args:
+        frame: The decoded BGR frame.
+        game_state: Predicted game state class name.
+        confidence: Confidence of the prediction.
+        frame_count: Frame number shown in the box.
 
-            # Write frame to output video
-            out.write(annotated_frame)
+    Returns:
+        The annotated frame.
+    """
+    annotated_frame = frame.copy()
+
+    state_text = f"Game State: {game_state}"
+    confidence_text = f"Confidence: {confidence:.3f}"
+    frame_text = f"Frame: {frame_count}"
+
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    font_scale = 0.7
+    thickness = 2
+
+    text_size = cv2.getTextSize(
+        state_text,
+        font,
+        font_scale,
+        thickness
+    )[0]
+
+    cv2.rectangle(
+        annotated_frame,
+        (10, 10),
+        (text_size[0] + 20, 100),
+        (0, 0, 0),
+        -1
+    )
+
+    cv2.rectangle(
+        annotated_frame,
+        (10, 10),
+        (text_size[0] + 20, 100),
+        (255, 255, 255),
+        2
+    )
+
+    cv2.putText(
+        annotated_frame,
+        state_text,
+        (15, 35),
+        font,
+        font_scale,
+        (255, 255, 255),
+        thickness
+    )
+
+    cv2.putText(
+        annotated_frame,
+        confidence_text,
+        (15, 60),
+        font,
+        font_scale,
+        (255, 255, 255),
+        thickness
+    )
+
+    cv2.putText(
+        annotated_frame,
+        frame_text,
+        (15, 85),
+        font,
+        font_scale,
+        (255, 255, 255),
+        thickness
+    )
+
+    if game_state == "Play":
+        color = (0, 255, 0)
+    elif game_state == "No Play":
+        color = (0, 0, 255)
+    elif game_state == "Service":
+        color = (255, 0, 255)
+    else:
+        color = (255, 255, 255)
+
+    cv2.rectangle(
+        annotated_frame,
+        (10, 10),
+        (text_size[0] + 20, 100),
+        color,
+        3
+    )
+    return annotated_frame
+
+
+_WORKER_ML_MANAGER: MLManager | None = None
+
+
+def detect_chunk(
+        video_path: str,
+        chunk: VideoChunk,
+        segment_path: str,
+        events_path: str | None,
+        fps: int,
+        frame_size: Tuple[int, int],
+        encoder: str = "opencv",
+        encoder_options: dict | None = None,
+        batch_size: int = 1,
+        ball_detect_every: int = 1
+) -> int:
+    """
+    Worker function of `run_object_detection_parallel`: detect and render one chunk.
 
-        # Cleanup
-        cap.release()
-        out.release()
-        ml_manager.cleanup()
+    The MLManager is created once per worker process and reused for every chunk it handles.
+    Warm-up frames only run the ball detector, to update the ball tracker so the trail is continuous
+    across chunks. Which frames run the ball detector only depends on the frame number, so the
+    chunks skip the same frames as a sequential run.
 
-        print(f"Object detection completed (ball, actions, players). Output saved to: {output_path}")
+    Returns:
+        Number of frames written.
+    """
+    global _WORKER_ML_MANAGER
+    if _WORKER_ML_MANAGER is None:
+        _WORKER_ML_MANAGER = MLManager()
+    ml_manager = _WORKER_ML_MANAGER
+
+    renderer = create_renderer(ml_manager)
+    ball_tracker = BallTracker(max_gap=BALL_MAX_GAP, detect_every=ball_detect_every)
+    written = 0
+
+    def chunk_frames():
+        for frame_no, frame, is_warmup in iter_chunk_frames(video_path, chunk):
+            if not is_warmup:
+                yield frame_no, frame
+            elif ball_tracker.should_detect(frame_no):
+                # Warm-up frames only seed the ball trail, so only the ball model runs on them
+                ball = DetectionArrays.from_detections(
+                    ml_manager.detect_ball(frame, conf_threshold=0.25, iou_threshold=0.45)
+                )
+                ball_tracker.update(frame_no, ball.centers[0] if len(ball) > 0 else None)
+            else:
+                ball_tracker.update(frame_no, None)
+
+    sink = open_event_sink(events_path) if events_path is not None else None
+    out = open_video_writer(segment_path, fps, frame_size, backend=encoder, **(encoder_options or {}))
+    try:
+        for batch in batched(chunk_frames(), batch_size):
+            frame_nos, frames = zip(*batch)
+            detections = detect_all_batch(
+                ml_manager, list(frames), conf_threshold=0.25, iou_threshold=0.45, columnar=True,
+                detect_ball=[ball_tracker.should_detect(frame_no) for frame_no in frame_nos]
+            )
+            for frame_no, frame, frame_detections in zip(frame_nos, frames, detections):
+                out.write(render_detections(renderer, frame, frame_detections, ball_tracker, frame_no))
+                if sink is not None:
+                    sink.write_detections(frame_no, frame_detections)
+                written += 1
+    finally:
+        out.release()
+        if sink is not None:
+            sink.close()
+    return written
+
+
+def run_object_detection_parallel(
+        video_path: str,
+        output_path: str,
+        n_workers: int = 4,
+        warmup: int = 30,
+        events_path: str | None = None,
+        encoder: str = "opencv",
+        encoder_options: dict | None = None,
+        batch_size: int = 1,
+        ball_detect_every: int = 1
+) -> None:
+    """
+    Run object detection on a single video split into chunks processed by `n_workers` processes.
 
+    The chunks start on keyframes; each worker loads its own MLManager, warms up the ball trail
+    on `warmup` frames before its chunk, and writes its own segment. The segments (and the
+    optional JSONL events) are stitched back together in order. The chunks are always decoded
+    with PyAV, which can seek to their keyframes.
 
-def run_video_classification(ml_manager: MLManager, video_path: str, output_path: str) -> None:
+    Args:
+        video_path: Path to input video file.
+        output_path: Path to save output video with visualizations
+        n_workers: Number of worker processes and chunks.
+        warmup: Number of frames decoded before each chunk to warm up tracking state.
+        events_path: Optional `.jsonl` file receiving the per-frame detections.
+        encoder: Output writer backend, "opencv" (mp4v) or "pyav" (libx264).
+        encoder_options: Backend options for `video_io.open_video_writer`.
+        batch_size: Number of frames per inference call in every worker.
+        ball_detect_every: Run the ball detector on every n-th frame only (see `run_object_detection`).
+    """
+    with open_frame_source(video_path, backend="pyav") as source:
+        fps, frame_size = source.fps, (source.width, source.height)
+
+    print(f"Processing {video_path} with {n_workers} workers...")
+    written = run_chunked(
+        video_path, output_path, detect_chunk, n_workers=n_workers, warmup=warmup, events_path=events_path,
+        fps=fps, frame_size=frame_size, encoder=encoder, encoder_options=encoder_options, batch_size=batch_size,
+        ball_detect_every=ball_detect_every
+    )
+    print(f"Parallel object detection completed: {sum(written)} frames in {len(written)} chunks. "
+          f"Output saved to: {output_path}")
+
+
+def run_video_classification(
+        ml_manager: MLManager,
+        video_path: str,
+        output_path: str,
+        window_size: int = 30,
+        stride: int = 30,
+        decoder: str = "opencv",
+        encoder: str = "opencv",
+        encoder_options: dict | None = None,
+        classifier_size: Tuple[int, int] | None = None,
+        profile_path: str | None = None
+) -> None:
     """
-    Run game state classification on video every 30 frames.
+    Run game state classification on video over a sliding window of frames.
 
     This function:
     - Loads the ML Manager
-    - Classifies game state every 30 frames
-    - Visualizes classification results on the video
+    - Keeps the last `window_size` frames in a preallocated ring buffer
+    - Classifies game state every `stride` frames once the buffer is full
+    - Visualizes the most recent classification result on every frame
     - Saves the output video
 
     Args:
         ml_manager: Model Manager that loads and manages models.
         video_path: Path to input video file
         output_path: Path to save output video with visualizations
+        window_size: Number of frames given to the classifier, e.g. 16.
+        stride: Number of frames between two classifications, e.g. 8.
+        decoder: Frame source backend, "opencv" or "pyav" (multithreaded FFmpeg decoding).
+        encoder: Output writer backend, "opencv" (mp4v) or "pyav" (libx264).
+        encoder_options: Backend options for `video_io.open_video_writer`, e.g.
+            `{"crf": 23, "preset": "veryfast", "threads": 4, "output_size": (1280, 720)}`.
+        classifier_size: Optional (width, height), e.g. (224, 224). When set, the classifier is fed
+            a downscaled copy of each frame produced by the decoder, which also shrinks the ring buffer.
+        profile_path: When set, time every stage and model call and write a JSON latency report there.
     """
     print("Initializing ML Manager...")
+    profiler = StageProfiler(enabled=profile_path is not None)
 
     # Check if game state classification model is available
     if not ml_manager.is_model_available('game_state_classification'):
         raise RuntimeError("Game state classification model not available")
 
     print("Opening video...")
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise RuntimeError(f"Could not open video: {video_path}")
+    source = open_frame_source(video_path, backend=decoder, secondary_size=classifier_size)
 
     # Get video properties
-    width, height, fps, _, total_frames = [int(cap.get(prop)) for prop in range(3, 8)]
+    width, height, fps, total_frames = source.width, source.height, source.fps, source.total_frames
     print(f"Video properties: {width}x{height}, {fps} FPS, {total_frames} frames")
 
     # setup output folder
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
 
     # Setup video writer
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    out = open_video_writer(output_path, fps, (width, height), backend=encoder, **(encoder_options or {}))
 
     # Classification parameters
-    classification_interval = 30  # Classify every 30 frames
-    frame_buffer = []
+    frame_buffer = FrameRingBuffer(window_size=window_size, stride=stride)
     current_game_state = "Unknown"
     current_confidence = 0.0
 
@@ -268,149 +479,363 @@ def run_video_classification(ml_manager: MLManager, video_path: str, output_path
             total=total_frames
         )
 
-        while True:
-            ret, frame = cap.read()
-            frame_count += 1
-            progress.update(task, advance=1)
+        if classifier_size is not None:
+            frames = source.frame_pairs()
+        else:
+            frames = ((frame, frame) for frame in source.frames())
+
+        with profiler.instrument(ml_manager):
+            for frame, classifier_frame in profiler.iterate("decode", frames):
+                frame_count += 1
+                progress.update(task, advance=1)
+
+                # Add frame to the ring buffer (overwrites the oldest frame)
+                with profiler.stage("preprocess"):
+                    frame_buffer.push(classifier_frame)
+
+                if frame_buffer.is_ready():
+                    # Classify game state on stride boundaries
+                    game_state_result = ml_manager.classify_game_state(frame_buffer.window())
+
+                    current_game_state = game_state_result.predicted_class
+                    current_confidence = game_state_result.confidence
+
+                    progress.update(
+                        task,
+                        description=(
+                            f"[green]Frame {frame_count} | "
+                            f"State: {current_game_state} | "
+                            f"Conf: {current_confidence:.3f}"
+                        )
+                    )
+
+                # Annotate every frame with the most recent game state
+                with profiler.stage("annotate"):
+                    annotated_frame = draw_game_state(frame, current_game_state, current_confidence, frame_count)
+                with profiler.stage("encode"):
+                    out.write(annotated_frame)
+                profiler.add_frames(1)
+
+    # Cleanup
+    source.close()
+    out.release()
+    ml_manager.cleanup()
+
+    print(f"Video classification completed. Output saved to: {output_path}")
+    save_profile(
+        profiler, profile_path, video=video_path, mode="classification", window_size=window_size, stride=stride
+    )
+
+
+def run_gated_detection(
+        ml_manager: MLManager,
+        video_path: str,
+        output_path: str,
+        window_size: int = 16,
+        stride: int = 8,
+        decoder: str = "opencv",
+        encoder: str = "opencv",
+        encoder_options: dict | None = None
+) -> None:
+    """
+    Run game state classification and object detection in a single pass over the video.
+
+    The game state is classified every `stride` frames. Actions, ball and players are only
+    detected while the current state is SERVICE or PLAY; NO-PLAY frames skip the detectors and
+    go straight to the writer with just the game state overlay.
+
+    Args:
+        ml_manager: The MLManager instance.
+        video_path: Path to input video file.
+        output_path: Path to save output video with visualizations
+        window_size: Number of frames given to the game state classifier.
+        stride: Number of frames between two game state classifications.
+        decoder: Frame source backend, "opencv" or "pyav" (multithreaded FFmpeg decoding).
+        encoder: Output writer backend, "opencv" (mp4v) or "pyav" (libx264).
+        encoder_options: Backend options for `video_io.open_video_writer`, e.g.
+            `{"crf": 23, "preset": "veryfast", "threads": 4, "output_size": (1280, 720)}`.
+    """
+    print("Initializing ML Manager...")
 
-            if not ret:
-                progress.update(task, advance=30)
-                break
+    ml_manager.check_models()
+    if not ml_manager.is_model_available('game_state_classification'):
+        raise RuntimeError("Game state classification model not available")
 
-            # Add frame to buffer
-            frame_buffer.append(frame.copy())
+    print("Opening video...")
+    source = open_frame_source(video_path, backend=decoder)
+
+    # Get video properties
+    width, height, fps, total_frames = source.width, source.height, source.fps, source.total_frames
+    print(f"Video properties: {width}x{height}, {fps} FPS, {total_frames} frames")
 
-            if len(frame_buffer) != 30:
-                continue
+    # setup output folder
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
 
-            # Classify game state every 30 frames
-            game_state_result = ml_manager.classify_game_state(frame_buffer)
+    # Setup video writer
+    out = open_video_writer(output_path, fps, (width, height), backend=encoder, **(encoder_options or {}))
 
-            current_game_state = game_state_result.predicted_class
-            current_confidence = game_state_result.confidence
+    renderer = create_renderer(ml_manager)
+    gate = GameStateGate(ml_manager, window_size=window_size, stride=stride)
+    ball_tracker = BallTracker()
+    detected_frames = 0
+    frame_count = 0
 
+    print("Processing video frames...")
+    with Progress() as progress:
+        task = progress.add_task(
+            "[green]Processing video...",
+            total=total_frames
+        )
+
+        for frame in source.frames():
+            frame_count += 1
+            if gate.update(frame):
+                detections = FrameDetections.from_ml_manager(
+                    ml_manager.detect_all(frame, conf_threshold=0.25, iou_threshold=0.45)
+                )
+                annotated_frame = render_detections(renderer, frame, detections, ball_tracker, frame_count)
+                detected_frames += 1
+            else:
+                # Do not connect the ball trail across rallies
+                ball_tracker.reset()
+                annotated_frame = frame
+
+            out.write(draw_game_state(annotated_frame, gate.state, gate.confidence, frame_count))
             progress.update(
                 task,
-                description=(
-                    f"[green]Frame {frame_count} | "
-                    f"State: {current_game_state} | "
-                    f"Conf: {current_confidence:.3f}"
-                )
+                advance=1,
+                description=f"[green]Frame {frame_count} | State: {gate.state} | Detected: {detected_frames}"
             )
 
-            # Annotate frame with game state
-            annotated_frame = frame.copy()
-
-            state_text = f"Game State: {current_game_state}"
-            confidence_text = f"Confidence: {current_confidence:.3f}"
-            frame_text = f"Frame: {frame_count}"
-
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            font_scale = 0.7
-            thickness = 2
-
-            text_size = cv2.getTextSize(
-                state_text,
-                font,
-                font_scale,
-                thickness
-            )[0]
-
-            cv2.rectangle(
-                annotated_frame,
-                (10, 10),
-                (text_size[0] + 20, 100),
-                (0, 0, 0),
-                -1
-            )
+    # Cleanup
+    source.close()
+    out.release()
+    ml_manager.cleanup()
 
-            cv2.rectangle(
-                annotated_frame,
-                (10, 10),
-                (text_size[0] + 20, 100),
-                (255, 255, 255),
-                2
-            )
+    print(
+        f"Gated detection completed: detectors ran on {detected_frames}/{frame_count} frames. "
+        f"Output saved to: {output_path}"
+    )
+
+
+def run_headless_analytics(
+        ml_manager: MLManager,
+        video_path: str,
+        events_path: str,
+        gated: bool = True,
+        window_size: int = 16,
+        stride: int = 8,
+        decoder: str = "opencv"
+) -> None:
+    """
+    Run the models without drawing or encoding anything and stream the results to a file.
 
-            cv2.putText(
-                annotated_frame,
-                state_text,
-                (15, 35),
-                font,
-                font_scale,
-                (255, 255, 255),
-                thickness
-            )
+    Per-frame detections (actions, ball, players) and game state windows are written as they
+    are produced to a JSONL or Parquet file (picked from the `events_path` suffix), see
+    `pipeline.events` for the record layout.
 
-            cv2.putText(
-                annotated_frame,
-                confidence_text,
-                (15, 60),
-                font,
-                font_scale,
-                (255, 255, 255),
-                thickness
-            )
+    Args:
+        ml_manager: The MLManager instance.
+        video_path: Path to input video file.
+        events_path: Output `.jsonl` or `.parquet` file.
+        gated: Only run the detectors during SERVICE and PLAY (see `run_gated_detection`).
+        window_size: Number of frames given to the game state classifier.
+        stride: Number of frames between two game state classifications.
+        decoder: Frame source backend, "opencv" or "pyav" (multithreaded FFmpeg decoding).
+    """
+    print("Initializing ML Manager...")
 
-            cv2.putText(
-                annotated_frame,
-                frame_text,
-                (15, 85),
-                font,
-                font_scale,
-                (255, 255, 255),
-                thickness
-            )
+    ml_manager.check_models()
+    if not ml_manager.is_model_available('game_state_classification'):
+        raise RuntimeError("Game state classification model not available")
 
-            if current_game_state == "Play":
-                color = (0, 255, 0)
-            elif current_game_state == "No Play":
-                color = (0, 0, 255)
-            elif current_game_state == "Service":
-                color = (255, 0, 255)
-            else:
-                color = (255, 255, 255)
-
-            cv2.rectangle(
-                annotated_frame,
-                (10, 10),
-                (text_size[0] + 20, 100),
-                color,
-                3
-            )
+    print("Opening video...")
+    source = open_frame_source(video_path, backend=decoder)
+    print(f"Video properties: {source.width}x{source.height}, {source.fps} FPS, {source.total_frames} frames")
+
+    gate = GameStateGate(ml_manager, window_size=window_size, stride=stride)
+    detected_frames = 0
+    frame_no = -1
 
-            out.write(annotated_frame)
+    with Progress() as progress, open_event_sink(events_path) as sink:
+        task = progress.add_task(
+            "[green]Processing video...",
+            total=source.total_frames
+        )
+
+        for frame_no, frame in enumerate(source.frames()):
+            active = gate.update(frame)
+            if gate.classified:
+                sink.write_game_state(*gate.window_range, gate.state, gate.confidence)
+
+            if active or not gated:
+                detections = FrameDetections.from_ml_manager(
+                    ml_manager.detect_all(frame, conf_threshold=0.25, iou_threshold=0.45)
+                )
+                sink.write_detections(frame_no, detections)
+                detected_frames += 1
+
+            progress.update(task, advance=1)
 
     # Cleanup
-    cap.release()
-    out.release()
+    source.close()
     ml_manager.cleanup()
 
-    print(f"Video classification completed. Output saved to: {output_path}")
+    print(
+        f"Headless analytics completed: detectors ran on {detected_frames}/{frame_no + 1} frames. "
+        f"Events saved to: {events_path}"
+    )
+
+
+def config():
+    parser = ArgumentParser(description="Volleyball analytics demo")
+    parser.add_argument(
+        '--mode', type=str, default='all',
+        choices=['all', 'detection', 'parallel', 'classification', 'gated', 'headless'],
+        help="'all' runs the detection and the classification demos one after another."
+    )
+    parser.add_argument('--video_path', type=str, default='./tokyo2020-poland-vs-iran.mp4')
+    parser.add_argument('--output_detection', type=str, default='../output/object_detection_demo.mp4')
+    parser.add_argument('--output_classification', type=str, default='../output/video_classification_demo.mp4')
+    parser.add_argument('--output_gated', type=str, default='../output/gated_detection_demo.mp4')
+    parser.add_argument(
+        '--events', type=str, default=None,
+        help="Output of the headless mode, .jsonl or .parquet (default ../output/events.jsonl). "
+             "Parallel mode: optional .jsonl file receiving the per-frame detections."
+    )
+    parser.add_argument('--no_gate', action='store_true', help="Headless mode: run the detectors on every frame.")
+    parser.add_argument('--pipelined', action='store_true', help="Detection mode: run the stages concurrently.")
+    parser.add_argument('--workers', type=int, default=4, help="Number of processes of the parallel mode.")
+    parser.add_argument(
+        '--profile', type=str, default=None, metavar='REPORT.json',
+        help="Write per-stage latency reports (one per demo, e.g. REPORT_detection.json). "
+             "Not supported in parallel mode."
+    )
+    parser.add_argument('--batch_size', type=int, default=1)
+    parser.add_argument(
+        '--ball_detect_every', type=int, default=1,
+        help="Detection mode: run the ball detector every n frames and predict the ball in between. "
+             f"At most {BALL_MAX_GAP + 1}, the ball tracker drops the ball after {BALL_MAX_GAP} frames without "
+             "a detection."
+    )
+    parser.add_argument(
+        '--window_size', type=int, default=None,
+        help="Frames given to the game state classifier (default 30 in classification mode, 16 in gated and "
+             "headless modes)."
+    )
+    parser.add_argument(
+        '--stride', type=int, default=None,
+        help="Frames between two game state classifications (default 30 in classification mode, 8 in gated "
+             "and headless modes)."
+    )
+    parser.add_argument(
+        '--classifier_size', type=int, nargs=2, default=None, metavar=('WIDTH', 'HEIGHT'),
+        help="Classification mode: feed the classifier frames downscaled to this size by the decoder."
+    )
+    parser.add_argument(
+        '--decoder', type=str, default=None, choices=['opencv', 'pyav'],
+        help="Frame decoder, opencv by default. The parallel mode always decodes with pyav."
+    )
+    parser.add_argument('--encoder', type=str, default='opencv', choices=['opencv', 'pyav'])
+    parser.add_argument('--crf', type=int, default=23, help="PyAV encoder quality (lower is better).")
+    parser.add_argument('--preset', type=str, default='veryfast', help="PyAV encoder speed preset.")
+    parser.add_argument('--encoder_threads', type=int, default=0, help="PyAV encoder threads, 0 = auto.")
+    parser.add_argument(
+        '--output_size', type=int, nargs=2, default=None, metavar=('WIDTH', 'HEIGHT'),
+        help="Encode the output videos at a reduced resolution."
+    )
+    args = parser.parse_args()
+    if not 1 <= args.ball_detect_every <= BALL_MAX_GAP + 1:
+        parser.error(f"--ball_detect_every must be between 1 and {BALL_MAX_GAP + 1}, got {args.ball_detect_every}")
+    for name in ('batch_size', 'window_size', 'stride'):
+        value = getattr(args, name)
+        if value is not None and value < 1:
+            parser.error(f"--{name} must be positive, got {value}")
+    if args.mode == 'parallel':
+        # The workers decode their chunks with PyAV, and each worker would only profile its own chunk
+        if args.profile is not None:
+            parser.error("--profile is not supported with --mode parallel")
+        if args.pipelined:
+            parser.error("--pipelined is not supported with --mode parallel")
+        if args.decoder == 'opencv':
+            parser.error("--decoder opencv is not supported with --mode parallel, the chunks are decoded with pyav")
+        if args.events is not None and Path(args.events).suffix != '.jsonl':
+            parser.error("--events must be a .jsonl file with --mode parallel")
+    else:
+        args.decoder = args.decoder or 'opencv'
+    return args
+
+
+def encoder_options(args) -> dict:
+    options = {}
+    if args.encoder == 'pyav':
+        options.update(crf=args.crf, preset=args.preset, threads=args.encoder_threads)
+    if args.output_size:
+        options['output_size'] = tuple(args.output_size)
+    return options
+
+
+def window_options(args) -> dict:
+    """The game state window options given on the command line; the others keep the demo's defaults."""
+    return {name: getattr(args, name) for name in ('window_size', 'stride') if getattr(args, name) is not None}
+
+
+def profile_report_path(path: str | None, mode: str) -> str | None:
+    if path is None:
+        return None
+    path = Path(path)
+    return path.with_name(f"{path.stem}_{mode}{path.suffix or '.json'}").as_posix()
 
 
 def main():
     """
     Example usage of the demo functions.
     """
-    # Example video path (update with your actual video path)
-    video_path = "./tokyo2020-poland-vs-iran.mp4"
-    output_detection = "../output/object_detection_demo.mp4"
-    ml_manager = MLManager()
-    output_classification = "../output/video_classification_demo.mp4"
-    
-    # Create output directory if it doesn't exist
-    Path("output").mkdir(exist_ok=True)
-    
-    print("Running object detection demo...")
-    run_object_detection(ml_manager, video_path, output_detection)
-    
-    print("\nRunning video classification demo...")
-    run_video_classification(ml_manager, video_path, output_classification)
-    
+    args = config()
+    video_path = args.video_path
+    # The parallel mode loads one MLManager per worker process instead
+    ml_manager = MLManager() if args.mode != 'parallel' else None
+    writer_args = dict(encoder=args.encoder, encoder_options=encoder_options(args))
+
+    if args.mode in ('all', 'detection'):
+        print("Running object detection demo...")
+        run_object_detection(
+            ml_manager, video_path, args.output_detection,
+            pipelined=args.pipelined, batch_size=args.batch_size, decoder=args.decoder,
+            ball_detect_every=args.ball_detect_every, profile_path=profile_report_path(args.profile, 'detection'),
+            **writer_args
+        )
+        print(f"Object detection output: {args.output_detection}")
+
+    if args.mode == 'parallel':
+        print("Running parallel object detection...")
+        run_object_detection_parallel(
+            video_path, args.output_detection, n_workers=args.workers, events_path=args.events,
+            batch_size=args.batch_size, ball_detect_every=args.ball_detect_every, **writer_args
+        )
+
+    if args.mode in ('all', 'classification'):
+        print("\nRunning video classification demo...")
+        run_video_classification(
+            ml_manager, video_path, args.output_classification, decoder=args.decoder,
+            classifier_size=tuple(args.classifier_size) if args.classifier_size else None,
+            profile_path=profile_report_path(args.profile, 'classification'), **window_options(args), **writer_args
+        )
+
+    if args.mode == 'gated':
+        print("Running gated detection demo...")
+        run_gated_detection(
+            ml_manager, video_path, args.output_gated, decoder=args.decoder, **window_options(args), **writer_args
+        )
+
+    if args.mode == 'headless':
+        print("Running headless analytics...")
+        run_headless_analytics(
+            ml_manager, video_path, args.events or '../output/events.jsonl', gated=not args.no_gate,
+            decoder=args.decoder, **window_options(args)
+        )
+
     print("\nDemo completed successfully!")
-    print(f"Object detection output: {output_detection}")
-    # print(f"Video classification output: {output_classification}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,13 @@
+"""
+Building blocks for running the volleyball analytics models over long videos.
+"""
+from .stages import StagedPipeline
+from .inference import batched, detect_all_batch, detect_without_ball
+from .frame_buffer import FrameRingBuffer
+from .ball_tracker import BallTracker
+from .gating import ACTIVE_STATES, GameStateGate
+from .detections import DetectionArrays, FrameDetections
+from .renderer import ACTION_COLORS, DetectionRenderer
+from .events import EventSink, JsonlEventSink, ParquetEventSink, open_event_sink
+from .chunked import VideoChunk, concat_videos, iter_chunk_frames, plan_chunks, run_chunked
+from .profiling import MODEL_METHODS, LatencyHistogram, StageProfiler
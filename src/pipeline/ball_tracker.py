@@ -0,0 +1,212 @@
+"""
+Ball tracking with a constant-velocity Kalman filter and a fixed-size trajectory ring buffer.
+
+Example:
+    tracker = BallTracker(capacity=64, max_gap=5, detect_every=2)
+    for frame_no, frame in enumerate(frames):
+        if tracker.should_detect(frame_no):
+            ball = ml_manager.detect_ball(frame)
+            tracker.update(frame_no, center_of(ball))   # None when the ball was not found
+        else:
+            tracker.predict(frame_no)
+        renderer.draw_trail(frame, tracker.trajectory(8))
+"""
+from typing import Sequence
+
+import numpy as np
+
+DETECTED = 0
+PREDICTED = 1
+INTERPOLATED = 2
+
+
+class BallTracker:
+    """
+    Track the ball center across frames.
+
+    Measured centers correct a constant-velocity Kalman filter. Frames without a measurement
+    (missed detections, or frames where the detector was skipped on purpose) get the filter's
+    prediction, and once the ball is measured again those predicted points are replaced by a
+    linear interpolation between the two measurements. After more than `max_gap` frames without
+    a measurement the ball is considered lost and the trail is cleared.
+
+    The trajectory lives in preallocated arrays of `capacity` points, so memory stays constant
+    however long the video is.
+    """
+
+    def __init__(
+            self,
+            capacity: int = 64,
+            max_gap: int = 5,
+            detect_every: int = 1,
+            process_noise: float = 5.0,
+            measurement_noise: float = 2.0
+    ):
+        """
+        Args:
+            capacity: Number of trajectory points kept.
+            max_gap: Maximum number of consecutive frames without a measurement before the ball is lost.
+            detect_every: Run the ball detector on every `detect_every`-th frame only and predict in
+                between (1 detects on every frame, 2 halves the ball detector calls). At most `max_gap + 1`,
+                otherwise the ball is lost before every detection frame.
+            process_noise: Standard deviation of the ball acceleration, in pixels / frame^2.
+            measurement_noise: Standard deviation of the detected center, in pixels.
+        """
+        if max_gap >= capacity:
+            raise ValueError(f"max_gap ({max_gap}) must be smaller than capacity ({capacity})")
+        if detect_every < 1:
+            raise ValueError(f"detect_every must be >= 1, got {detect_every}")
+        if detect_every > max_gap + 1:
+            raise ValueError(
+                f"detect_every ({detect_every}) must be at most max_gap + 1 ({max_gap + 1}): the frames skipped "
+                f"between two detections would exceed the gap after which the ball is lost"
+            )
+        self.capacity = capacity
+        self.max_gap = max_gap
+        self.detect_every = detect_every
+
+        # Constant-velocity model over one frame: state = [x, y, vx, vy]
+        self._F = np.eye(4)
+        self._F[0, 2] = self._F[1, 3] = 1.0
+        self._H = np.eye(2, 4)
+        g = np.array([[0.5, 0.0], [0.0, 0.5], [1.0, 0.0], [0.0, 1.0]])
+        self._Q = g @ g.T * process_noise ** 2
+        self._R = np.eye(2) * measurement_noise ** 2
+
+        self._points = np.zeros((capacity, 2), dtype=np.float32)
+        self._frame_nos = np.zeros(capacity, dtype=np.int64)
+        self._sources = np.zeros(capacity, dtype=np.uint8)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the ball (e.g. between rallies) and clear the trajectory."""
+        self._x: np.ndarray | None = None
+        self._P: np.ndarray | None = None
+        self._frame_no = -1
+        self._last_measured = -1
+        self._pending = 0
+        self._head = 0
+        self._count = 0
+
+    @property
+    def is_tracking(self) -> bool:
+        return self._x is not None
+
+    @property
+    def position(self) -> np.ndarray | None:
+        """Current estimate of the ball center, or None when the ball is lost."""
+        return None if self._x is None else self._x[:2].astype(np.float32)
+
+    @property
+    def velocity(self) -> np.ndarray | None:
+        """Current estimate of the ball velocity in pixels per frame."""
+        return None if self._x is None else self._x[2:].astype(np.float32)
+
+    def should_detect(self, frame_no: int) -> bool:
+        """
+        Whether the ball detector should run on `frame_no`.
+
+        This only depends on the frame number, so it can be decided ahead of the tracker (e.g. in
+        the inference stage of a pipeline, while the tracker is updated in the annotate stage).
+        """
+        return frame_no % self.detect_every == 0
+
+    def _push(self, frame_no: int, point: np.ndarray, source: int) -> None:
+        index = (self._head + self._count) % self.capacity
+        if self._count == self.capacity:
+            self._head = (self._head + 1) % self.capacity
+        else:
+            self._count += 1
+        self._points[index] = point
+        self._frame_nos[index] = frame_no
+        self._sources[index] = source
+
+    def _advance(self, frame_no: int) -> None:
+        for _ in range(frame_no - self._frame_no):
+            self._x = self._F @ self._x
+            self._P = self._F @ self._P @ self._F.T + self._Q
+        self._frame_no = frame_no
+
+    def _interpolate_gap(self, frame_no: int, point: np.ndarray) -> None:
+        """Replace the predicted points since the last measurement by a straight line."""
+        n = min(self._pending, self._count - 1)
+        if n <= 0:
+            return
+        indices = (self._head + self._count - n + np.arange(n)) % self.capacity
+        start = self._points[(indices[0] - 1) % self.capacity]
+        t = (self._frame_nos[indices] - self._last_measured) / (frame_no - self._last_measured)
+        self._points[indices] = start + t[:, None] * (point - start)
+        self._sources[indices] = INTERPOLATED
+
+    def predict(self, frame_no: int) -> np.ndarray | None:
+        """
+        Advance the filter to `frame_no` without a measurement.
+
+        Returns:
+            The predicted center, or None if the ball is lost (never seen, or unmeasured for more
+            than `max_gap` frames).
+        """
+        if self._x is None or frame_no <= self._frame_no:
+            return self.position
+        if frame_no - self._last_measured > self.max_gap:
+            self.reset()
+            return None
+        self._advance(frame_no)
+        position = self.position
+        self._push(frame_no, position, PREDICTED)
+        self._pending += 1
+        return position
+
+    def update(self, frame_no: int, center: Sequence[float] | None) -> np.ndarray | None:
+        """
+        Advance the filter to `frame_no` and correct it with the detected `center`.
+
+        Args:
+            frame_no: Frame number; must not decrease between calls.
+            center: Detected ball center (x, y), or None when the detector found no ball.
+
+        Returns:
+            The filtered center, or None if the ball is lost.
+        """
+        if center is None:
+            return self.predict(frame_no)
+
+        z = np.asarray(center, dtype=np.float64)[:2]
+        if self._x is None or frame_no - self._last_measured > self.max_gap + 1:
+            self.reset()
+            self._x = np.array([z[0], z[1], 0.0, 0.0])
+            self._P = np.diag([self._R[0, 0], self._R[1, 1], 100.0, 100.0])
+            self._frame_no = frame_no
+        else:
+            self._advance(frame_no)
+            y = z - self._H @ self._x
+            s = self._H @ self._P @ self._H.T + self._R
+            k = self._P @ self._H.T @ np.linalg.inv(s)
+            self._x = self._x + k @ y
+            self._P = (np.eye(4) - k @ self._H) @ self._P
+
+        position = self.position
+        self._interpolate_gap(frame_no, position)
+        self._push(frame_no, position, DETECTED)
+        self._last_measured = frame_no
+        self._pending = 0
+        return position
+
+    def _ordered(self, n: int | None) -> np.ndarray:
+        n = self._count if n is None else min(n, self._count)
+        return (self._head + self._count - n + np.arange(n)) % self.capacity
+
+    def trajectory(self, n: int | None = None) -> np.ndarray:
+        """(k, 2) array of the last `n` (default: all kept) trajectory points, oldest first."""
+        return self._points[self._ordered(n)]
+
+    def frame_numbers(self, n: int | None = None) -> np.ndarray:
+        """Frame numbers of the points returned by `trajectory(n)`."""
+        return self._frame_nos[self._ordered(n)]
+
+    def sources(self, n: int | None = None) -> np.ndarray:
+        """DETECTED / PREDICTED / INTERPOLATED flag of each point returned by `trajectory(n)`."""
+        return self._sources[self._ordered(n)]
+
+    def __len__(self) -> int:
+        return self._count
@@ -0,0 +1,197 @@
+"""
+Process one long video in parallel chunks.
+
+The video is split into time chunks whose boundaries fall on keyframes, so each worker can
+seek straight to its chunk. Every chunk also gets `warmup` frames from before its start that
+are decoded and run through the models but not written, which lets stateful components (the
+ball trail, trackers) start the chunk in the same state as a sequential run. Each chunk is
+written to its own segment file and the segments are stitched back together in order.
+"""
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, List, Tuple
+
+import av
+import numpy as np
+
+
+@dataclass
+class VideoChunk:
+    """
+    Frame range `[start, end)` of one chunk; frames in `[warmup_start, start)` are only used to
+    warm up state and are not part of the chunk output.
+    """
+    index: int
+    start: int
+    end: int
+    warmup_start: int
+
+    @property
+    def n_frames(self) -> int:
+        return self.end - self.start
+
+
+def scan_keyframes(video_path: str | Path) -> Tuple[List[int], int]:
+    """
+    Demux (without decoding) the video stream and return the keyframe frame indices and the
+    total number of frames.
+    """
+    with av.open(Path(video_path).as_posix()) as container:
+        stream = container.streams.video[0]
+        pts, keyframe = [], []
+        for packet in container.demux(stream):
+            if packet.pts is None:
+                continue
+            pts.append(packet.pts)
+            keyframe.append(packet.is_keyframe)
+
+    # Packets come in decode order; the frame index is the rank of the presentation timestamp.
+    order = np.argsort(np.asarray(pts, dtype=np.int64), kind="stable")
+    keyframes = np.flatnonzero(np.asarray(keyframe, dtype=bool)[order])
+    return keyframes.tolist(), len(pts)
+
+
+def plan_chunks(video_path: str | Path, n_chunks: int, warmup: int = 30) -> List[VideoChunk]:
+    """
+    Split a video into at most `n_chunks` chunks of similar length starting on keyframes.
+
+    Args:
+        video_path: Path to the video file.
+        n_chunks: Desired number of chunks, usually the number of workers.
+        warmup: Number of frames before each chunk used to warm up state.
+    """
+    keyframes, total_frames = scan_keyframes(video_path)
+    if total_frames == 0:
+        return []
+
+    targets = np.linspace(0, total_frames, n_chunks, endpoint=False)[1:]
+    keyframes = np.asarray(keyframes, dtype=np.int64)
+    # Snap every target boundary to the closest keyframe.
+    nearest = keyframes[np.abs(keyframes[None, :] - targets[:, None]).argmin(axis=1)] if len(targets) else []
+    boundaries = sorted({0, *[int(b) for b in nearest if 0 < b < total_frames]})
+    boundaries.append(total_frames)
+
+    return [
+        VideoChunk(index=i, start=start, end=end, warmup_start=max(0, start - warmup))
+        for i, (start, end) in enumerate(zip(boundaries[:-1], boundaries[1:]))
+    ]
+
+
+def iter_chunk_frames(video_path: str | Path, chunk: VideoChunk,
+                      thread_count: int = 0) -> Iterator[Tuple[int, np.ndarray, bool]]:
+    """
+    Decode the frames of a chunk including its warm-up frames.
+
+    Yields:
+        (frame index, BGR frame, is_warmup) tuples from `chunk.warmup_start` to `chunk.end - 1`.
+    """
+    with av.open(Path(video_path).as_posix()) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        stream.codec_context.thread_count = thread_count
+        rate = float(stream.average_rate or stream.guessed_rate)
+        time_base = float(stream.time_base)
+        start_pts = stream.start_time or 0
+
+        def frame_index(pts: int) -> int:
+            return int(round((pts - start_pts) * time_base * rate))
+
+        if chunk.warmup_start > 0:
+            # Seek lands on the keyframe at or before the target; decode forward from there.
+            target = start_pts + int(chunk.warmup_start / rate / time_base)
+            container.seek(target, backward=True, any_frame=False, stream=stream)
+
+        for frame in container.decode(stream):
+            index = frame_index(frame.pts)
+            if index < chunk.warmup_start:
+                continue
+            if index >= chunk.end:
+                break
+            yield index, frame.to_ndarray(format="bgr24"), index < chunk.start
+
+
+def concat_videos(segment_paths: List[str | Path], output_path: str | Path) -> None:
+    """
+    Losslessly join video segments with identical encoding settings by remuxing their packets.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with av.open(output_path.as_posix(), mode="w") as output:
+        out_stream = None
+        offset = 0
+        for segment_path in segment_paths:
+            with av.open(Path(segment_path).as_posix()) as segment:
+                in_stream = segment.streams.video[0]
+                if out_stream is None:
+                    out_stream = output.add_stream_from_template(in_stream)
+                last = offset
+                for packet in segment.demux(in_stream):
+                    if packet.dts is None:
+                        continue
+                    packet.pts += offset
+                    packet.dts += offset
+                    last = max(last, packet.pts + (packet.duration or 0))
+                    packet.stream = out_stream
+                    output.mux(packet)
+                offset = last
+
+
+def concat_text_files(paths: List[str | Path], output_path: str | Path) -> None:
+    """Concatenate line-oriented files (e.g. JSONL event segments) in order."""
+    with open(output_path, "wb") as output:
+        for path in paths:
+            with open(path, "rb") as segment:
+                shutil.copyfileobj(segment, output)
+
+
+def run_chunked(
+        video_path: str | Path,
+        output_path: str | Path,
+        process_chunk: Callable,
+        n_workers: int = 4,
+        warmup: int = 30,
+        events_path: str | Path | None = None,
+        **kwargs
+) -> List:
+    """
+    Process the chunks of a video in a process pool and stitch their outputs in order.
+
+    Args:
+        video_path: Path to the input video.
+        output_path: Path of the stitched output video.
+        process_chunk: Picklable (module level) function called in the worker processes as
+            `process_chunk(video_path, chunk, segment_path, events_path, **kwargs)`. It must write
+            exactly the frames `[chunk.start, chunk.end)` to `segment_path` and, when
+            `events_path` is not None, the JSONL events of those frames to `events_path`.
+            Its return value is collected per chunk.
+        n_workers: Number of worker processes (and target number of chunks).
+        warmup: Number of frames before each chunk used to warm up state.
+        events_path: Optional path of the stitched JSONL events.
+        **kwargs: Extra arguments forwarded to `process_chunk`.
+
+    Returns:
+        The return values of `process_chunk` in chunk order.
+    """
+    chunks = plan_chunks(video_path, n_workers, warmup=warmup)
+    with tempfile.TemporaryDirectory(prefix="chunks_") as tmp_dir:
+        suffix = Path(output_path).suffix or ".mp4"
+        segments = [Path(tmp_dir) / f"segment_{chunk.index:04d}{suffix}" for chunk in chunks]
+        event_segments = [Path(tmp_dir) / f"events_{chunk.index:04d}.jsonl" for chunk in chunks]
+
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(
+                    process_chunk, str(video_path), chunk, str(segment),
+                    str(event_segment) if events_path is not None else None, **kwargs
+                )
+                for chunk, segment, event_segment in zip(chunks, segments, event_segments)
+            ]
+            results = [future.result() for future in futures]
+
+        concat_videos(segments, output_path)
+        if events_path is not None:
+            concat_text_files(event_segments, events_path)
+    return results
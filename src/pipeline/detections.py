@@ -0,0 +1,101 @@
+"""
+Columnar detection containers.
+
+`DetectionArrays` stores the detections of one frame as parallel numpy arrays instead of a list
+of `Detection` objects, so filtering, masking and conversion to `sv.Detections` are array
+operations and the arrays are shared with supervision without copying.
+"""
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+import supervision as sv
+
+
+@dataclass
+class DetectionArrays:
+    """
+    Detections of one frame as columns.
+
+    Attributes:
+        xyxy: (N, 4) float32 array of boxes.
+        confidence: (N,) float32 array of scores.
+        class_id: (N,) int32 array of class ids.
+    """
+    xyxy: np.ndarray
+    confidence: np.ndarray
+    class_id: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "DetectionArrays":
+        return cls(
+            xyxy=np.empty((0, 4), dtype=np.float32),
+            confidence=np.empty(0, dtype=np.float32),
+            class_id=np.empty(0, dtype=np.int32)
+        )
+
+    @classmethod
+    def from_detections(cls, detections: Iterable | None) -> "DetectionArrays":
+        """
+        Build the columns from `ml_manager.core.Detection` / `PlayerKeyPoints` objects.
+
+        A single detection (e.g. the ball) or None are accepted as well. Detections without a
+        bbox are skipped.
+        """
+        if detections is None:
+            return cls.empty()
+        if hasattr(detections, "bbox"):
+            detections = [detections]
+
+        rows = [
+            (d.bbox.x1, d.bbox.y1, d.bbox.x2, d.bbox.y2, d.confidence, d.class_id)
+            for d in detections if d.bbox is not None
+        ]
+        if not rows:
+            return cls.empty()
+
+        table = np.array(rows, dtype=np.float32)
+        return cls(
+            xyxy=table[:, :4],
+            confidence=table[:, 4],
+            class_id=table[:, 5].astype(np.int32)
+        )
+
+    def __len__(self) -> int:
+        return len(self.class_id)
+
+    def __getitem__(self, index) -> "DetectionArrays":
+        """Select detections with a boolean mask, index array or slice."""
+        return DetectionArrays(
+            xyxy=self.xyxy[index],
+            confidence=self.confidence[index],
+            class_id=self.class_id[index]
+        )
+
+    @property
+    def centers(self) -> np.ndarray:
+        """(N, 2) array of box centers."""
+        return (self.xyxy[:, :2] + self.xyxy[:, 2:]) / 2
+
+    def to_supervision(self) -> sv.Detections:
+        """Wrap the columns in `sv.Detections`; the arrays are shared, not copied."""
+        return sv.Detections(xyxy=self.xyxy, confidence=self.confidence, class_id=self.class_id)
+
+
+@dataclass
+class FrameDetections:
+    """
+    Columnar version of the `(actions, ball, players)` tuple returned by `MLManager.detect_all`.
+    """
+    actions: DetectionArrays
+    ball: DetectionArrays
+    players: DetectionArrays
+
+    @classmethod
+    def from_ml_manager(cls, detections: tuple) -> "FrameDetections":
+        action_detections, ball_detection, player_detections = detections
+        return cls(
+            actions=DetectionArrays.from_detections(action_detections),
+            ball=DetectionArrays.from_detections(ball_detection),
+            players=DetectionArrays.from_detections(player_detections)
+        )
@@ -0,0 +1,153 @@
+"""
+Structured event sinks for headless analytics runs.
+
+Two kinds of events are written while the video is processed:
+
+- detection: one record per detected object (`kind` is "action", "ball" or "player") with the
+  frame number, class id, confidence and box.
+- game_state: one record per classified window with its first/last frame, state and confidence.
+
+`JsonlEventSink` writes both kinds to one JSON-lines file (with an `event` field).
+`ParquetEventSink` writes `<name>.parquet` for detections and `<name>_game_states.parquet` for
+game states, flushing a row group every `row_group_size` rows so memory stays bounded.
+"""
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from .detections import FrameDetections
+
+DETECTION_COLUMNS = ("frame", "kind", "class_id", "confidence", "x1", "y1", "x2", "y2")
+GAME_STATE_COLUMNS = ("start_frame", "end_frame", "state", "confidence")
+
+
+class EventSink:
+    """
+    Base class of the event sinks; use as a context manager so the file is always closed.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write_detections(self, frame_no: int, detections: FrameDetections) -> None:
+        raise NotImplementedError
+
+    def write_game_state(self, start_frame: int, end_frame: int, state: str, confidence: float) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    @staticmethod
+    def _detection_rows(frame_no: int, detections: FrameDetections) -> List[tuple]:
+        rows = []
+        for kind, arrays in (("action", detections.actions), ("ball", detections.ball), ("player", detections.players)):
+            for xyxy, conf, class_id in zip(arrays.xyxy.tolist(), arrays.confidence.tolist(), arrays.class_id.tolist()):
+                rows.append((frame_no, kind, class_id, conf, *xyxy))
+        return rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class JsonlEventSink(EventSink):
+    """
+    Append events as JSON lines.
+    """
+
+    def __init__(self, path: str | Path):
+        super().__init__(path)
+        self._file = open(self.path, "w")
+
+    def write_detections(self, frame_no: int, detections: FrameDetections) -> None:
+        for row in self._detection_rows(frame_no, detections):
+            record = {"event": "detection", **dict(zip(DETECTION_COLUMNS, row))}
+            self._file.write(json.dumps(record) + "\n")
+
+    def write_game_state(self, start_frame: int, end_frame: int, state: str, confidence: float) -> None:
+        row = (start_frame, end_frame, state, float(confidence))
+        record = {"event": "game_state", **dict(zip(GAME_STATE_COLUMNS, row))}
+        self._file.write(json.dumps(record) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetEventSink(EventSink):
+    """
+    Write detections and game states to two Parquet files. Requires `pyarrow`.
+    """
+
+    def __init__(self, path: str | Path, row_group_size: int = 50_000):
+        super().__init__(path)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from e
+        self._pa = pa
+        self._pq = pq
+        self.row_group_size = row_group_size
+        self.game_state_path = self.path.with_name(self.path.stem + "_game_states.parquet")
+
+        self._schemas = {
+            "detections": pa.schema([
+                ("frame", pa.int64()), ("kind", pa.string()), ("class_id", pa.int32()),
+                ("confidence", pa.float32()), ("x1", pa.float32()), ("y1", pa.float32()),
+                ("x2", pa.float32()), ("y2", pa.float32())
+            ]),
+            "game_states": pa.schema([
+                ("start_frame", pa.int64()), ("end_frame", pa.int64()),
+                ("state", pa.string()), ("confidence", pa.float32())
+            ])
+        }
+        self._writers = {
+            "detections": pq.ParquetWriter(self.path.as_posix(), self._schemas["detections"]),
+            "game_states": pq.ParquetWriter(self.game_state_path.as_posix(), self._schemas["game_states"])
+        }
+        self._rows: Dict[str, List[tuple]] = {"detections": [], "game_states": []}
+
+    def _append(self, table: str, rows: List[tuple]) -> None:
+        self._rows[table].extend(rows)
+        if len(self._rows[table]) >= self.row_group_size:
+            self._flush(table)
+
+    def _flush(self, table: str) -> None:
+        rows = self._rows[table]
+        if not rows:
+            return
+        schema = self._schemas[table]
+        columns = list(zip(*rows))
+        batch = self._pa.RecordBatch.from_arrays(
+            [self._pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        )
+        self._writers[table].write_batch(batch)
+        self._rows[table] = []
+
+    def write_detections(self, frame_no: int, detections: FrameDetections) -> None:
+        self._append("detections", self._detection_rows(frame_no, detections))
+
+    def write_game_state(self, start_frame: int, end_frame: int, state: str, confidence: float) -> None:
+        self._append("game_states", [(start_frame, end_frame, state, float(confidence))])
+
+    def close(self) -> None:
+        for table, writer in self._writers.items():
+            self._flush(table)
+            writer.close()
+
+
+def open_event_sink(path: str | Path) -> EventSink:
+    """
+    Open a JSONL or Parquet event sink depending on the file suffix.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in (".jsonl", ".json"):
+        return JsonlEventSink(path)
+    if suffix == ".parquet":
+        return ParquetEventSink(path)
+    raise ValueError(f"Unsupported event file type: {path} (use .jsonl or .parquet)")
@@ -0,0 +1,80 @@
+"""
+Fixed-size ring buffer of video frames for sliding-window classification.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    Preallocated ring buffer holding the last `window_size` frames.
+
+    Frames are copied into a single preallocated array, so memory stays constant for the whole
+    video no matter how long it is. `is_ready` becomes true every `stride` frames once the
+    buffer is full, e.g. a window of 16 frames with a stride of 8 classifies the last 16 frames
+    on every 8th frame.
+
+    Example:
+        buffer = FrameRingBuffer(window_size=16, stride=8)
+        for frame in frames:
+            buffer.push(frame)
+            if buffer.is_ready():
+                result = ml_manager.classify_game_state(buffer.window())
+    """
+
+    def __init__(self, window_size: int = 30, stride: int = 30):
+        """
+        Args:
+            window_size: Number of frames in each classification window.
+            stride: Number of new frames between two consecutive windows.
+        """
+        if window_size < 1 or stride < 1:
+            raise ValueError(f"window_size and stride must be positive, got {window_size}, {stride}")
+        self.window_size = window_size
+        self.stride = stride
+        self._frames: np.ndarray | None = None
+        self._count = 0
+
+    @property
+    def count(self) -> int:
+        """Total number of frames pushed so far."""
+        return self._count
+
+    def _allocate(self, shape: Tuple[int, ...], dtype: np.dtype) -> None:
+        self._frames = np.empty((self.window_size, *shape), dtype=dtype)
+
+    def push(self, frame: np.ndarray) -> None:
+        """
+        Copy a frame into the next slot, overwriting the oldest frame once the buffer is full.
+        """
+        if self._frames is None:
+            self._allocate(frame.shape, frame.dtype)
+        elif frame.shape != self._frames.shape[1:]:
+            raise ValueError(f"Frame shape {frame.shape} does not match buffer shape {self._frames.shape[1:]}")
+        np.copyto(self._frames[self._count % self.window_size], frame)
+        self._count += 1
+
+    def is_full(self) -> bool:
+        return self._count >= self.window_size
+
+    def is_ready(self) -> bool:
+        """
+        True when the buffer is full and the latest frame falls on a stride boundary.
+        """
+        return self.is_full() and (self._count - self.window_size) % self.stride == 0
+
+    def window(self) -> List[np.ndarray]:
+        """
+        Frames of the current window from oldest to newest, as views into the buffer.
+
+        The views are overwritten by later `push` calls, so consumers must not keep them.
+        """
+        if not self.is_full():
+            raise RuntimeError(f"Buffer holds {self._count} of {self.window_size} frames")
+        start = self._count % self.window_size
+        return [self._frames[(start + i) % self.window_size] for i in range(self.window_size)]
+
+    def reset(self) -> None:
+        """Forget all frames, keeping the allocated memory."""
+        self._count = 0
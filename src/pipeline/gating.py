@@ -0,0 +1,69 @@
+"""
+Game-state gate: classify the game state on a cheap stride and tell callers whether the
+expensive detectors should run on the current frame.
+"""
+from typing import Iterable
+
+import numpy as np
+
+from .frame_buffer import FrameRingBuffer
+
+ACTIVE_STATES = ("Service", "Play")
+
+
+class GameStateGate:
+    """
+    Track the current game state of a video and report whether it is SERVICE or PLAY.
+
+    Example:
+        gate = GameStateGate(ml_manager, window_size=16, stride=8)
+        for frame in frames:
+            if gate.update(frame):
+                detections = ml_manager.detect_all(frame)
+    """
+
+    def __init__(
+            self,
+            ml_manager,
+            window_size: int = 16,
+            stride: int = 8,
+            active_states: Iterable[str] = ACTIVE_STATES
+    ):
+        """
+        Args:
+            ml_manager: The MLManager instance used for `classify_game_state`.
+            window_size: Number of frames given to the classifier.
+            stride: Number of frames between two classifications.
+            active_states: Game states in which the detectors should run.
+        """
+        self.ml_manager = ml_manager
+        self.buffer = FrameRingBuffer(window_size=window_size, stride=stride)
+        self.active_states = set(active_states)
+        self.state = "Unknown"
+        self.confidence = 0.0
+        self.n_classifications = 0
+        self.classified = False
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in self.active_states
+
+    @property
+    def window_range(self) -> tuple:
+        """(first, last) 0-based frame index of the current buffer window."""
+        return self.buffer.count - self.buffer.window_size, self.buffer.count - 1
+
+    def update(self, frame: np.ndarray) -> bool:
+        """
+        Add a frame, re-classify the game state on stride boundaries and return `is_active`.
+
+        `classified` tells whether this call ran the classifier.
+        """
+        self.buffer.push(frame)
+        self.classified = self.buffer.is_ready()
+        if self.classified:
+            result = self.ml_manager.classify_game_state(self.buffer.window())
+            self.state = result.predicted_class
+            self.confidence = result.confidence
+            self.n_classifications += 1
+        return self.is_active
@@ -0,0 +1,135 @@
+"""
+Multi-frame inference helpers on top of `MLManager`.
+"""
+import warnings
+from itertools import compress, islice
+from typing import Iterable, Iterator, List, Sequence
+
+import numpy as np
+
+from .detections import FrameDetections
+
+# Optional per-model batch calls of MLManager, in `detect_all` result order
+MODEL_BATCH_METHODS = ("detect_actions", "detect_ball", "detect_players")
+_warned_unbatched = False
+
+
+def batched(frames: Iterable[np.ndarray], batch_size: int) -> Iterator[List[np.ndarray]]:
+    """
+    Group an iterable of frames into lists of at most `batch_size` frames, keeping their order.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, got {batch_size}")
+    frames = iter(frames)
+    while batch := list(islice(frames, batch_size)):
+        yield batch
+
+
+def detect_all_batch(
+        ml_manager,
+        frames: List[np.ndarray],
+        conf_threshold: float = 0.25,
+        iou_threshold: float = 0.45,
+        columnar: bool = False,
+        detect_ball: Sequence[bool] | None = None
+) -> List[tuple] | List[FrameDetections]:
+    """
+    Run action, ball and player detection on a batch of frames.
+
+    The models live in the `ml_manager` submodule; when the installed version exposes a native
+    `detect_all_batch`, all frames are sent to each model in a single call. Older versions only
+    have the single-frame `detect_all`, in which case the frames are processed one by one so
+    callers can use the batched API regardless of the submodule version; a `RuntimeWarning` is
+    issued the first time that happens, since the batch size then brings no speed-up.
+
+    When some frames skip the ball model and the submodule has per-model batch calls
+    (`detect_actions_batch`, `detect_ball_batch`, `detect_players_batch`), actions and players are
+    detected on the whole batch and the ball only on the flagged frames. With only
+    `detect_all_batch`, the whole batch still goes through it and the ball results of the skipped
+    frames are dropped, so the batching is kept.
+
+    Args:
+        ml_manager: The MLManager instance.
+        frames: Decoded BGR frames.
+        conf_threshold: Confidence threshold passed to the detectors.
+        iou_threshold: NMS IoU threshold passed to the detectors.
+        columnar: Return `FrameDetections` (numpy columns) instead of detection objects.
+        detect_ball: Per-frame flags; frames flagged False skip the ball model and get a None ball
+            (their position is left to a `BallTracker` prediction).
+
+    Returns:
+        One `(action_detections, ball_detection, player_detections)` tuple (or `FrameDetections`
+        when `columnar=True`) per frame, in the same order as `frames`.
+    """
+    if not frames:
+        return []
+
+    with_ball = [True] * len(frames) if detect_ball is None else list(detect_ball)
+    thresholds = dict(conf_threshold=conf_threshold, iou_threshold=iou_threshold)
+    native = getattr(ml_manager, "detect_all_batch", None)
+    per_model = [getattr(ml_manager, f"{method}_batch", None) for method in MODEL_BATCH_METHODS]
+
+    if all(per_model) and (native is None or not all(with_ball)):
+        detect_actions, detect_balls, detect_players = per_model
+        actions = _batch_results(detect_actions(frames, **thresholds), len(frames), "detect_actions_batch")
+        players = _batch_results(detect_players(frames, **thresholds), len(frames), "detect_players_batch")
+        ball_frames = list(compress(frames, with_ball))
+        balls = iter(
+            _batch_results(detect_balls(ball_frames, **thresholds), len(ball_frames), "detect_ball_batch")
+            if ball_frames else []
+        )
+        results = [
+            (action, next(balls) if flag else None, player)
+            for action, player, flag in zip(actions, players, with_ball)
+        ]
+    elif native is not None:
+        results = _batch_results(native(frames, **thresholds), len(frames), "detect_all_batch")
+        results = [
+            result if flag else (result[0], None, result[2])
+            for result, flag in zip(results, with_ball)
+        ]
+    else:
+        _warn_unbatched(len(frames))
+        results = [
+            ml_manager.detect_all(frame, **thresholds)
+            if flag else detect_without_ball(ml_manager, frame, conf_threshold, iou_threshold)
+            for frame, flag in zip(frames, with_ball)
+        ]
+
+    if columnar:
+        return [FrameDetections.from_ml_manager(result) for result in results]
+    return results
+
+
+def _batch_results(results: Iterable, n_frames: int, name: str) -> list:
+    results = list(results)
+    if len(results) != n_frames:
+        raise RuntimeError(f"{name} returned {len(results)} results for {n_frames} frames")
+    return results
+
+
+def _warn_unbatched(n_frames: int) -> None:
+    """Warn, once per process, that a batch of several frames is run frame by frame."""
+    global _warned_unbatched
+    if n_frames > 1 and not _warned_unbatched:
+        warnings.warn(
+            "The installed ml_manager has no detect_all_batch; batch_size > 1 runs detect_all once per "
+            "frame and gives no speed-up.",
+            RuntimeWarning,
+            stacklevel=3
+        )
+        _warned_unbatched = True
+
+
+def detect_without_ball(
+        ml_manager,
+        frame: np.ndarray,
+        conf_threshold: float = 0.25,
+        iou_threshold: float = 0.45
+) -> tuple:
+    """
+    Same result layout as `ml_manager.detect_all`, with the ball model skipped (ball is None).
+    """
+    actions = ml_manager.detect_actions(frame, conf_threshold=conf_threshold, iou_threshold=iou_threshold)
+    players = ml_manager.detect_players(frame, conf_threshold=conf_threshold, iou_threshold=iou_threshold)
+    return actions, None, players
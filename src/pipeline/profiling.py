@@ -0,0 +1,188 @@
+"""
+Per-stage timing instrumentation.
+
+`StageProfiler` records how long each stage (decode, preprocess, model inference, annotate,
+encode, ...) takes into fixed-size log-scale latency histograms, so memory stays constant on
+long videos, and produces a JSON report with p50/p95/p99 latencies and overall FPS.
+
+Example:
+    profiler = StageProfiler()
+    with profiler.instrument(ml_manager, MODEL_METHODS):
+        for frame in profiler.iterate("decode", source.frames()):
+            with profiler.stage("annotate"):
+                ...
+            profiler.add_frames(1)
+    profiler.save("profile.json")
+"""
+import bisect
+import json
+import math
+import threading
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List
+
+# MLManager methods timed by `StageProfiler.instrument` when the instance has them.
+MODEL_METHODS = (
+    "detect_all", "detect_actions", "detect_ball", "detect_players", "segment_court", "classify_game_state"
+)
+
+
+class LatencyHistogram:
+    """
+    Log-spaced latency histogram (default: 10us to 100s, 20 buckets per decade).
+    """
+
+    def __init__(self, min_seconds: float = 1e-5, max_seconds: float = 100.0, buckets_per_decade: int = 20):
+        n_buckets = int(round(math.log10(max_seconds / min_seconds) * buckets_per_decade))
+        self.edges = [min_seconds * 10 ** (i / buckets_per_decade) for i in range(n_buckets + 1)]
+        # counts[0] is underflow, counts[-1] is overflow
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_right(self.edges, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """
+        Upper edge of the bucket holding the q-th percentile, in seconds (bounded by the max).
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= rank and n:
+                upper = self.edges[i] if i < len(self.edges) else self.max
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "mean_ms": round(1000 * self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(1000 * self.percentile(50), 3),
+            "p95_ms": round(1000 * self.percentile(95), 3),
+            "p99_ms": round(1000 * self.percentile(99), 3),
+            "max_ms": round(1000 * self.max, 3),
+        }
+
+
+class StageProfiler:
+    """
+    Collect stage latencies from one or more threads. A disabled profiler costs almost nothing.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.frames = 0
+        self._lock = threading.Lock()
+        self._start = perf_counter()
+        self._end: float | None = None
+
+    def record(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(seconds)
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - start)
+
+    def stage(self, name: str):
+        """Context manager timing the enclosed block as one sample of `name`."""
+        return self._timed(name) if self.enabled else nullcontext()
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """Yield from `iterable`, timing every `next()` call (e.g. frame decoding)."""
+        if not self.enabled:
+            yield from iterable
+            return
+        iterator = iter(iterable)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(name, perf_counter() - start)
+            yield item
+
+    @contextmanager
+    def instrument(self, obj, method_names: Iterable[str] = MODEL_METHODS, prefix: str = "model."):
+        """
+        Temporarily wrap the given methods of `obj` (e.g. an MLManager) with timers.
+
+        Methods missing on `obj` are skipped. Calls made between the wrapped methods, e.g.
+        `detect_all` calling `detect_ball`, are timed at both levels.
+        """
+        if not self.enabled:
+            yield obj
+            return
+
+        patched: List[str] = []
+        for method_name in method_names:
+            method = getattr(obj, method_name, None)
+            if method is None or not callable(method):
+                continue
+            setattr(obj, method_name, self._wrap(prefix + method_name, method))
+            patched.append(method_name)
+        try:
+            yield obj
+        finally:
+            for method_name in patched:
+                # Removing the instance attribute restores the class method.
+                delattr(obj, method_name)
+
+    def _wrap(self, name: str, method):
+        @wraps(method)
+        def timed(*args, **kwargs):
+            with self._timed(name):
+                return method(*args, **kwargs)
+        return timed
+
+    def add_frames(self, n: int = 1) -> None:
+        with self._lock:
+            self.frames += n
+
+    def stop(self) -> None:
+        self._end = perf_counter()
+
+    def report(self) -> dict:
+        """
+        Summary of the run: frames, wall time, FPS and per-stage latency percentiles.
+        """
+        wall_time = (self._end or perf_counter()) - self._start
+        return {
+            "frames": self.frames,
+            "wall_time_s": round(wall_time, 3),
+            "fps": round(self.frames / wall_time, 3) if wall_time > 0 else 0.0,
+            "stages": {name: histogram.summary() for name, histogram in self.histograms.items()},
+        }
+
+    def save(self, path: str | Path, **metadata) -> dict:
+        """Write the report (plus any metadata such as the video path) as JSON and return it."""
+        report = {**metadata, **self.report()}
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,124 @@
+"""
+Frame renderer for the object detection demo.
+"""
+from typing import Callable, Dict, Sequence, Tuple
+
+import cv2
+import numpy as np
+import supervision as sv
+
+from .detections import FrameDetections
+
+# Colors for the different action classes (class name -> color)
+ACTION_COLORS = {
+    "ball": sv.Color.RED,
+    "block": sv.Color.BLUE,
+    "receive": sv.Color.from_hex('#800080'),
+    "set": sv.Color.from_hex("#FFA500"),
+    "spike": sv.Color.from_hex("#FFC0CB")
+}
+
+
+class DetectionRenderer:
+    """
+    Draw the ball trail, ball, actions and players on a frame.
+
+    All supervision annotators are created once. The per-class box annotators and label strings
+    are built the first time a class id shows up and reused for the rest of the video.
+
+    Example:
+        renderer = DetectionRenderer(
+            class_name=ml_manager.action_detector.yolo_module.id2class,
+            label_name=ml_manager.action_detector.action_id2name
+        )
+        annotated = renderer.render(frame, FrameDetections.from_ml_manager(detections), trajectory)
+    """
+
+    def __init__(
+            self,
+            class_name: Callable[[int], str],
+            label_name: Callable[[int], str],
+            colors: Dict[str, sv.Color] | None = None,
+            trail_length: int = 8
+    ):
+        """
+        Args:
+            class_name: Maps an action class id to its class name (used to pick the color).
+            label_name: Maps an action class id to the label drawn next to the box.
+            colors: Class name -> color; classes not listed are drawn in white.
+            trail_length: Number of ball positions in the trailing path.
+        """
+        self.class_name = class_name
+        self.label_name = label_name
+        self.colors = ACTION_COLORS if colors is None else colors
+        self.trail_length = trail_length
+
+        self.ball_annotator = sv.LabelAnnotator(color=sv.Color.YELLOW, text_thickness=1, text_scale=0.5)
+        self.label_annotator = sv.LabelAnnotator(text_thickness=1, text_scale=0.5)
+        self.triangle_annotator = sv.TriangleAnnotator(color=sv.Color.GREEN)
+        self._class_styles: Dict[int, Tuple[sv.BoxAnnotator, str]] = {}
+
+    def _class_style(self, class_id: int) -> Tuple[sv.BoxAnnotator, str]:
+        style = self._class_styles.get(class_id)
+        if style is None:
+            color = self.colors.get(self.class_name(class_id), sv.Color.WHITE)
+            style = (sv.BoxAnnotator(thickness=2, color=color), self.label_name(class_id))
+            self._class_styles[class_id] = style
+        return style
+
+    def draw_trail(self, frame: np.ndarray, trajectory: Sequence[Sequence[float]]) -> np.ndarray:
+        """
+        Draw the last `trail_length` ball positions as a fading yellow line with a red dot on top.
+        """
+        recent_trajectory = list(trajectory)[-self.trail_length:]
+        if len(recent_trajectory) > 1:
+            points = np.asarray(recent_trajectory, dtype=np.float64).astype(np.int32)
+            for i in range(1, len(points)):
+                # Thicker segments for more recent positions
+                thickness = max(1, int(3 * i / len(points)))
+                cv2.line(frame, tuple(points[i - 1].tolist()), tuple(points[i].tolist()), (0, 255, 255), thickness)
+            cv2.circle(frame, tuple(points[-1].tolist()), 5, (0, 0, 255), -1)
+        return frame
+
+    def render(
+            self,
+            frame: np.ndarray,
+            detections: FrameDetections,
+            ball_trajectory: Sequence[Sequence[float]] = ()
+    ) -> np.ndarray:
+        """
+        Args:
+            frame: The decoded BGR frame; it is not modified.
+            detections: Columnar detections of the frame.
+            ball_trajectory: Recent ball centers, oldest first.
+
+        Returns:
+            The annotated copy of the frame.
+        """
+        annotated_frame = self.draw_trail(frame.copy(), ball_trajectory)
+
+        if len(detections.ball) > 0:
+            annotated_frame = self.ball_annotator.annotate(
+                scene=annotated_frame,
+                detections=detections.ball.to_supervision(),
+                labels=["Ball"] * len(detections.ball)
+            )
+
+        actions = detections.actions
+        for class_id in np.unique(actions.class_id):
+            box_annotator, label = self._class_style(int(class_id))
+            class_detections = actions[actions.class_id == class_id].to_supervision()
+            annotated_frame = box_annotator.annotate(scene=annotated_frame, detections=class_detections)
+            annotated_frame = self.label_annotator.annotate(
+                scene=annotated_frame,
+                detections=class_detections,
+                labels=[label] * len(class_detections)
+            )
+
+        if len(detections.players) > 0:
+            annotated_frame = self.triangle_annotator.annotate(
+                scene=annotated_frame,
+                detections=detections.players.to_supervision()
+            )
+
+        return annotated_frame
@@ -0,0 +1,109 @@
+"""
+Threaded stage pipeline.
+
+Each stage (decode, inference, annotate, encode, ...) runs in its own worker thread and hands
+items to the next stage through a bounded queue. Having exactly one worker per stage keeps
+the items in their original order, and the bounded queues provide backpressure, so a slow
+stage (usually inference) throttles the decoder instead of letting frames pile up in memory.
+"""
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Tuple
+
+_STOP = object()
+
+
+class StagedPipeline:
+    """
+    Run a chain of callables concurrently, one thread per stage.
+
+    The source iterable is consumed in its own thread (the "decode" stage). Every stage receives
+    the output of the previous one; the return value of the last stage is discarded, so it is
+    expected to be a sink such as `VideoWriter.write`.
+
+    Example:
+        pipeline = StagedPipeline(
+            stages=[("inference", detect), ("annotate", draw), ("encode", writer.write)],
+            queue_size=8
+        )
+        pipeline.run(frames)
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[Any], Any]]], queue_size: int = 8):
+        """
+        Args:
+            stages: Ordered list of (name, callable) pairs.
+            queue_size: Maximum number of items waiting between two consecutive stages.
+        """
+        if not stages:
+            raise ValueError("StagedPipeline needs at least one stage")
+        if queue_size < 1:
+            raise ValueError(f"queue_size must be positive, got {queue_size}")
+        self.stages = stages
+        self.queue_size = queue_size
+
+    def run(self, source: Iterable[Any]) -> int:
+        """
+        Push every item of `source` through the stages and block until all of them are done.
+
+        If any stage raises, the remaining items are drained without being processed and the
+        first exception is re-raised in the calling thread.
+
+        Args:
+            source: Iterable of input items, e.g. a generator of decoded frames.
+
+        Returns:
+            Number of items read from the source.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        failed = threading.Event()
+        errors: List[BaseException] = []
+        n_items = [0]
+
+        def produce():
+            try:
+                for item in source:
+                    if failed.is_set():
+                        break
+                    queues[0].put(item)
+                    n_items[0] += 1
+            except BaseException as e:
+                errors.append(e)
+                failed.set()
+            finally:
+                queues[0].put(_STOP)
+
+        def consume(fn: Callable, inbox: queue.Queue, outbox: queue.Queue | None):
+            while True:
+                item = inbox.get()
+                if item is _STOP:
+                    break
+                if failed.is_set():
+                    # Keep draining so that upstream stages never block on a full queue.
+                    continue
+                try:
+                    result = fn(item)
+                except BaseException as e:
+                    errors.append(e)
+                    failed.set()
+                    continue
+                if outbox is not None:
+                    outbox.put(result)
+            if outbox is not None:
+                outbox.put(_STOP)
+
+        threads = [threading.Thread(target=produce, name="decode", daemon=True)]
+        for i, (name, fn) in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            threads.append(
+                threading.Thread(target=consume, args=(fn, queues[i], outbox), name=name, daemon=True)
+            )
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+        return n_items[0]
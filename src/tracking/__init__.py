@@ -0,0 +1,9 @@
+"""
+Player tracking components: appearance re-identification, detection scheduling, court zones, court
+projection and the columnar track store.
+"""
+from .reid import ColorHistogramEmbedder, ReIDGallery
+from .scheduler import DetectionScheduler, track_uncertainty
+from .zones import OUTSIDE, CourtZoneIndex, foot_points
+from .court import COURT_CORNERS, COURT_LENGTH, COURT_WIDTH, CourtProjector, apply_homography, order_corners
+from .store import N_KEYPOINTS, TrackStore, TrackStoreWriter, track_columns
@@ -0,0 +1,112 @@
+"""
+Image-to-court homography projection.
+
+A homography is estimated once from the four court corners, taken from the `CourtCoordinates`
+polygon or from the court segmentation mask. Points are then projected with one matrix product,
+for all tracks of a frame or a whole batch of frames at once.
+
+Example:
+    projector = CourtProjector.from_zone(court_coordinates, "main_zone")
+    court_xy = projector.project(foot_points(tracked_players))     # (N, 2) meters
+    batch_xy = projector.project(points_per_frame)                  # (F, N, 2), NaN padded
+"""
+from typing import Dict, Sequence
+
+import cv2
+import numpy as np
+
+# Indoor volleyball court, in meters
+COURT_WIDTH = 9.0
+COURT_LENGTH = 18.0
+# Court plane corners (top-left, top-right, bottom-right, bottom-left): the far baseline at y=0,
+# the near baseline at y=COURT_LENGTH.
+COURT_CORNERS = np.array(
+    [[0.0, 0.0], [COURT_WIDTH, 0.0], [COURT_WIDTH, COURT_LENGTH], [0.0, COURT_LENGTH]], dtype=np.float64
+)
+
+
+def order_corners(points: np.ndarray) -> np.ndarray:
+    """Order four points as top-left, top-right, bottom-right, bottom-left."""
+    points = np.asarray(points, dtype=np.float64).reshape(4, 2)
+    total = points.sum(axis=1)
+    diff = points[:, 1] - points[:, 0]
+    return points[[np.argmin(total), np.argmin(diff), np.argmax(total), np.argmax(diff)]]
+
+
+def apply_homography(matrix: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """
+    Project (..., 2) points with a 3x3 homography in one operation; NaN points stay NaN.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    projected = points @ matrix[:2, :2].T + matrix[:2, 2]
+    scale = points @ matrix[2, :2] + matrix[2, 2]
+    return (projected / scale[..., None]).astype(np.float32)
+
+
+class CourtProjector:
+    """
+    Map image pixels to court-plane coordinates (meters) and back.
+    """
+
+    def __init__(self, image_corners: Sequence[Sequence[float]], court_corners: np.ndarray | None = None):
+        """
+        Args:
+            image_corners: The four court corners in the image, in any order.
+            court_corners: The same corners on the court plane, ordered top-left, top-right,
+                bottom-right, bottom-left. Defaults to the full 9 x 18 m court (`COURT_CORNERS`).
+        """
+        self.image_corners = order_corners(image_corners)
+        self.court_corners = COURT_CORNERS if court_corners is None else np.asarray(court_corners, np.float64)
+        self.matrix = cv2.getPerspectiveTransform(
+            self.image_corners.astype(np.float32), self.court_corners.astype(np.float32)
+        )
+        self.inverse = np.linalg.inv(self.matrix)
+
+    @classmethod
+    def from_zone(
+            cls,
+            zones: Dict[str, Sequence[Sequence[float]]],
+            name: str = "main_zone",
+            court_corners: np.ndarray | None = None
+    ) -> "CourtProjector":
+        """Build from a four-point polygon of the `CourtCoordinates` dict (e.g. `main_zone`)."""
+        polygon = np.asarray(zones[name], dtype=np.float64)
+        if polygon.shape != (4, 2):
+            raise ValueError(f"Zone {name!r} must have 4 corner points, got shape {polygon.shape}")
+        return cls(polygon, court_corners)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray, court_corners: np.ndarray | None = None) -> "CourtProjector":
+        """
+        Build from the court segmentation output: the largest region of `mask` is simplified to a
+        quadrilateral whose vertices are used as the court corners.
+        """
+        binary = (np.asarray(mask) > 0).astype(np.uint8)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            raise ValueError("The court mask is empty")
+        hull = cv2.convexHull(max(contours, key=cv2.contourArea))
+        perimeter = cv2.arcLength(hull, True)
+        for epsilon in np.linspace(0.01, 0.1, 10):
+            quad = cv2.approxPolyDP(hull, epsilon * perimeter, True)
+            if len(quad) == 4:
+                return cls(quad.reshape(4, 2), court_corners)
+        raise ValueError("Could not fit a quadrilateral to the court mask")
+
+    def project(self, points: np.ndarray) -> np.ndarray:
+        """
+        Image points (..., 2) -> court-plane points (..., 2) as float32. Any leading shape works,
+        e.g. (N, 2) for the tracks of one frame or (F, N, 2) for a NaN-padded batch of frames.
+        """
+        return apply_homography(self.matrix, points)
+
+    def to_image(self, court_points: np.ndarray) -> np.ndarray:
+        """Court-plane points (..., 2) -> image pixels (..., 2)."""
+        return apply_homography(self.inverse, court_points)
+
+    def in_court(self, court_points: np.ndarray, margin: float = 0.0) -> np.ndarray:
+        """Boolean mask of court-plane points inside the court rectangle (plus `margin` meters)."""
+        low = self.court_corners.min(axis=0) - margin
+        high = self.court_corners.max(axis=0) + margin
+        court_points = np.asarray(court_points)
+        return np.all((court_points >= low) & (court_points <= high), axis=-1)
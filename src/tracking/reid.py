@@ -0,0 +1,211 @@
+"""
+Appearance re-identification for the norfair player tracker.
+
+`ColorHistogramEmbedder` turns all player crops of a frame into HSV color histograms at once.
+The histograms are mean-centered and L2-normalized, so the Pearson correlation that
+`cv2.compareHist(..., cv2.HISTCMP_CORREL)` computes becomes a plain dot product.
+
+`ReIDGallery` keeps a fixed-size ring of recent embeddings per track in a single array and
+scores every re-identification candidate against every gallery with one `einsum`, instead of
+comparing histograms pair by pair in Python.
+"""
+from typing import Dict, Iterable, List
+
+import cv2
+import numpy as np
+from norfair.distances import Distance
+
+
+class ColorHistogramEmbedder:
+    """
+    Hue/saturation histogram embeddings of the boxes of one frame.
+    """
+
+    def __init__(self, h_bins: int = 16, s_bins: int = 4):
+        """
+        Args:
+            h_bins: Number of hue bins.
+            s_bins: Number of saturation bins.
+        """
+        self.h_bins = h_bins
+        self.s_bins = s_bins
+        self.dim = h_bins * s_bins
+        # Lookup tables from OpenCV's 8-bit HSV ranges (H: 0-179, S: 0-255) to bin indices.
+        self._h_lut = (np.arange(256) * h_bins // 180).clip(0, h_bins - 1).astype(np.int32) * s_bins
+        self._s_lut = (np.arange(256) * s_bins // 256).astype(np.int32)
+
+    def __call__(self, frame: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            frame: BGR frame.
+            boxes: (N, 4) array of xyxy boxes in pixels.
+
+        Returns:
+            (N, dim) float32 array of centered, unit-norm histograms (all zeros for empty boxes).
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        embeddings = np.zeros((len(boxes), self.dim), dtype=np.float32)
+        if len(boxes) == 0:
+            return embeddings
+
+        height, width = frame.shape[:2]
+        xyxy = np.round(boxes).astype(np.int64)
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+        valid = (xyxy[:, 2] > xyxy[:, 0]) & (xyxy[:, 3] > xyxy[:, 1])
+        if not valid.any():
+            return embeddings
+
+        # Convert only the region covering all boxes, once, and map every pixel to its bin.
+        x0, y0 = xyxy[valid, :2].min(axis=0)
+        x1, y1 = xyxy[valid, 2:].max(axis=0)
+        hsv = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2HSV)
+        bins = self._h_lut[hsv[..., 0]] + self._s_lut[hsv[..., 1]]
+
+        for i in np.flatnonzero(valid):
+            bx0, by0, bx1, by1 = xyxy[i] - (x0, y0, x0, y0)
+            embeddings[i] = np.bincount(bins[by0:by1, bx0:bx1].ravel(), minlength=self.dim)
+
+        return normalize(embeddings)
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    """Mean-center and L2-normalize rows so dot products are Pearson correlations."""
+    centered = embeddings - embeddings.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(centered, axis=1, keepdims=True)
+    return np.divide(centered, norms, out=np.zeros_like(centered), where=norms > 0)
+
+
+def _candidate_embedding(tracked_object) -> np.ndarray | None:
+    embedding = tracked_object.last_detection.embedding
+    if embedding is None:
+        for detection in reversed(tracked_object.past_detections):
+            if detection.embedding is not None:
+                return detection.embedding
+    return embedding
+
+
+class ReIDGallery(Distance):
+    """
+    Per-track embedding galleries used as the tracker's re-identification distance.
+
+    The distance between a candidate and a track is `1 - max correlation` between the
+    candidate's embedding and the embeddings in the track's gallery (1 when either side has
+    no embedding), matching the previous `compareHist` based distance.
+
+    Example:
+        gallery = ReIDGallery(gallery_size=16)
+        tracker = Tracker(..., reid_distance_function=gallery.pair_distance, reid_distance_threshold=0.5)
+        gallery.attach(tracker)
+        for frame in frames:
+            detections = [Detection(..., embedding=e) for e in embedder(frame, boxes)]
+            tracker.update(detections=detections)
+            gallery.update(tracker, detections)
+    """
+
+    def __init__(self, gallery_size: int = 16, capacity: int = 64):
+        """
+        Args:
+            gallery_size: Number of embeddings kept per track (oldest are overwritten).
+            capacity: Initial number of track slots; grows automatically.
+        """
+        self.gallery_size = gallery_size
+        self.capacity = capacity
+        self._rows: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._embeddings: np.ndarray | None = None
+        self._valid = np.zeros((capacity, gallery_size), dtype=bool)
+        self._cursor = np.zeros(capacity, dtype=np.int64)
+
+    def attach(self, tracker) -> None:
+        """
+        Make `tracker` use the batched `get_distances` for re-identification.
+
+        norfair wraps any `reid_distance_function` in a pairwise `ScalarDistance`, so the
+        gallery replaces it on the tracker after construction.
+        """
+        tracker.reid_distance_function = self
+
+    def _row(self, track_id: int, dim: int) -> int:
+        row = self._rows.get(track_id)
+        if row is not None:
+            return row
+        if self._embeddings is None:
+            self._embeddings = np.zeros((self.capacity, self.gallery_size, dim), dtype=np.float32)
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = len(self._rows)
+            if row >= len(self._embeddings):
+                self._grow()
+        self._rows[track_id] = row
+        self._valid[row] = False
+        self._cursor[row] = 0
+        return row
+
+    def _grow(self) -> None:
+        n = len(self._embeddings)
+        self._embeddings = np.concatenate([self._embeddings, np.zeros_like(self._embeddings)])
+        self._valid = np.concatenate([self._valid, np.zeros((n, self.gallery_size), dtype=bool)])
+        self._cursor = np.concatenate([self._cursor, np.zeros(n, dtype=np.int64)])
+
+    def add(self, track_id: int, embedding: np.ndarray) -> None:
+        """Store an embedding in the track's ring, overwriting its oldest entry when full."""
+        row = self._row(track_id, len(embedding))
+        slot = self._cursor[row] % self.gallery_size
+        self._embeddings[row, slot] = embedding
+        self._valid[row, slot] = True
+        self._cursor[row] += 1
+
+    def remove(self, track_ids: Iterable[int]) -> None:
+        for track_id in track_ids:
+            row = self._rows.pop(track_id, None)
+            if row is not None:
+                self._valid[row] = False
+                self._free.append(row)
+
+    def update(self, tracker, detections: Iterable) -> None:
+        """
+        After `tracker.update`, add the embedding of every track matched to one of this frame's
+        detections to its gallery, and drop the galleries of tracks the tracker has forgotten.
+        """
+        current = {id(detection) for detection in detections}
+        known = set()
+        for obj in tracker.tracked_objects:
+            if obj.id is None:
+                continue
+            known.add(obj.id)
+            detection = obj.last_detection
+            if id(detection) in current and detection.embedding is not None:
+                self.add(obj.id, detection.embedding)
+        self.remove([track_id for track_id in self._rows if track_id not in known])
+
+    def get_distances(self, objects, candidates) -> np.ndarray:
+        """
+        (n_candidates, n_objects) distance matrix between candidate tracks and track galleries.
+        """
+        distances = np.ones((len(candidates), len(objects)), dtype=np.float32)
+        if self._embeddings is None or not len(candidates) or not len(objects):
+            return distances
+
+        candidate_embeddings = [_candidate_embedding(candidate) for candidate in candidates]
+        has_embedding = np.array([e is not None for e in candidate_embeddings])
+        rows = np.array([self._rows.get(obj.id, -1) for obj in objects])
+        has_gallery = rows >= 0
+        if not has_embedding.any() or not has_gallery.any():
+            return distances
+
+        query = np.stack([e for e in candidate_embeddings if e is not None]).astype(np.float32)
+        galleries = self._embeddings[rows[has_gallery]]
+        valid = self._valid[rows[has_gallery]]
+
+        # (candidates, objects, gallery) correlations in one shot; empty slots never win.
+        correlation = np.einsum("cd,ogd->cog", query, galleries)
+        correlation = np.where(valid[None], correlation, -np.inf).max(axis=2)
+        block = np.where(np.isfinite(correlation), 1 - correlation, 1.0)
+        distances[np.ix_(has_embedding, has_gallery)] = block
+        return distances
+
+    def pair_distance(self, candidate, obj) -> float:
+        """Scalar version of `get_distances` for a single candidate/object pair."""
+        return float(self.get_distances([obj], [candidate])[0, 0])
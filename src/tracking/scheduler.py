@@ -0,0 +1,126 @@
+"""
+Decide on which frames the player detector runs; the tracker's Kalman filters carry the tracks
+on the other frames.
+
+Example:
+    scheduler = DetectionScheduler(every=5, max_uncertainty=20)
+    for frame_no, frame in enumerate(frames):
+        if scheduler.should_detect(frame_no, tracker.get_active_objects()):
+            detections = to_norfair(pose_estimator.predict(frame))
+            tracked = tracker.update(detections=detections, period=scheduler.period(frame_no))
+            scheduler.mark_inferred(frame_no)
+        else:
+            tracked = tracker.update()
+            scheduler.mark_propagated(frame_no)
+    scheduler.save("schedule.json")
+"""
+import json
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+
+def track_uncertainty(tracked_object, frames: int) -> float:
+    """
+    Estimated position error, in pixels, of a track that was propagated for `frames` frames.
+
+    norfair's optimized Kalman filter does not grow its covariance when predicting, so the
+    position variance is propagated here with the constant-velocity model
+    (`var + 2k cov + k^2 var_v`). The distance the track moved on its velocity alone is added,
+    so fast moving players are re-detected sooner than standing ones.
+    """
+    kalman = tracked_object.filter
+    k = float(frames)
+    variance = kalman.pos_variance + 2 * k * kalman.pos_vel_covariance + k * k * kalman.vel_variance
+    sigma = float(np.sqrt(np.clip(variance, 0, None)).max())
+    drift = float(np.linalg.norm(tracked_object.estimate_velocity, axis=1).max()) * k
+    return sigma + drift
+
+
+class DetectionScheduler:
+    """
+    Run the detector every `every` frames, or earlier when a track becomes too uncertain.
+
+    The first frame is always inferred. Which frames were inferred and which were propagated by
+    the tracker is recorded and can be saved as a JSON report.
+    """
+
+    def __init__(self, every: int = 1, max_uncertainty: float | None = None):
+        """
+        Args:
+            every: Maximum number of frames between two detector runs (1 runs it on every frame).
+            max_uncertainty: Run the detector as soon as any active track's estimated position
+                error (see `track_uncertainty`) exceeds this many pixels. None disables the check.
+        """
+        if every < 1:
+            raise ValueError(f"every must be >= 1, got {every}")
+        self.every = every
+        self.max_uncertainty = max_uncertainty
+        self.last_inferred = -1
+        self.inferred: List[int] = []
+        self.propagated: List[int] = []
+        self.triggered: List[int] = []
+
+    def should_detect(self, frame_no: int, tracked_objects: Iterable = ()) -> bool:
+        """
+        Args:
+            frame_no: Current frame number.
+            tracked_objects: Active tracks (`tracker.get_active_objects()`), for the uncertainty check.
+        """
+        if self.last_inferred < 0:
+            return True
+        since = frame_no - self.last_inferred
+        if since >= self.every:
+            return True
+        if self.max_uncertainty is not None:
+            for tracked_object in tracked_objects:
+                if track_uncertainty(tracked_object, since) > self.max_uncertainty:
+                    self.triggered.append(frame_no)
+                    return True
+        return False
+
+    def period(self, frame_no: int) -> int:
+        """Frames since the previous detector run, for `tracker.update(..., period=...)`."""
+        return 1 if self.last_inferred < 0 else frame_no - self.last_inferred
+
+    def mark_inferred(self, frame_no: int) -> None:
+        self.inferred.append(frame_no)
+        self.last_inferred = frame_no
+
+    def mark_propagated(self, frame_no: int) -> None:
+        self.propagated.append(frame_no)
+
+    @staticmethod
+    def to_ranges(frame_nos: List[int]) -> List[Tuple[int, int]]:
+        """Collapse sorted frame numbers into inclusive (first, last) ranges."""
+        ranges = []
+        for frame_no in frame_nos:
+            if ranges and frame_no == ranges[-1][1] + 1:
+                ranges[-1][1] = frame_no
+            else:
+                ranges.append([frame_no, frame_no])
+        return [(first, last) for first, last in ranges]
+
+    def report(self) -> dict:
+        n_frames = len(self.inferred) + len(self.propagated)
+        return {
+            "every": self.every,
+            "max_uncertainty": self.max_uncertainty,
+            "frames": n_frames,
+            "inferred_count": len(self.inferred),
+            "propagated_count": len(self.propagated),
+            "inference_ratio": len(self.inferred) / n_frames if n_frames else 0.0,
+            "inferred": self.inferred,
+            "uncertainty_triggered": self.triggered,
+            "propagated_ranges": self.to_ranges(self.propagated),
+        }
+
+    def save(self, path: str | Path, **metadata) -> dict:
+        """Write the report (plus `metadata`) as JSON and return it."""
+        report = {**metadata, **self.report()}
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
@@ -0,0 +1,195 @@
+"""
+Columnar, memory-mapped store of tracking output.
+
+A store is a directory with one raw binary file per column (fixed dtype and row shape), a
+`meta.json` describing them, and an index by track id. Rows are appended in frame order, so a
+frame range is two binary searches on the `frame` column, and a track is a contiguous slice of
+the `by_track` row order.
+
+Example:
+    with TrackStoreWriter("runs/inference/match_tracks", n_keypoints=17) as store:
+        for frame_no, ... in tracking_loop:
+            store.append(frame_no, track_ids, bboxes, keypoints, zones, court_xy)
+
+    tracks = TrackStore("runs/inference/match_tracks")
+    rally = tracks.frames(1200, 1800)       # dict of column views, no copy
+    player = tracks.track(7)                 # dict of column arrays of track 7
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+STORE_VERSION = 1
+N_KEYPOINTS = 17
+
+
+def track_columns(n_keypoints: int = N_KEYPOINTS) -> Dict[str, Tuple[np.dtype, Tuple[int, ...]]]:
+    """Column name -> (dtype, per-row shape)."""
+    return {
+        "frame": (np.dtype(np.int32), ()),
+        "track_id": (np.dtype(np.int32), ()),
+        "bbox": (np.dtype(np.float32), (4,)),
+        "keypoints": (np.dtype(np.float32), (n_keypoints, 3)),
+        "zone": (np.dtype(np.int16), ()),
+        "court_xy": (np.dtype(np.float32), (2,)),
+    }
+
+
+class TrackStoreWriter:
+    """
+    Append the tracks of each frame to the column files; the track index is written on `close`.
+    """
+
+    def __init__(self, path: str | Path, n_keypoints: int = N_KEYPOINTS, **metadata):
+        """
+        Args:
+            path: Store directory (created if needed; existing columns are overwritten).
+            n_keypoints: Number of pose keypoints per row (each stored as x, y, confidence).
+            metadata: Extra JSON-serializable fields saved in `meta.json` (video path, zone names, ...).
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.columns = track_columns(n_keypoints)
+        self.metadata = metadata
+        self.rows = 0
+        self.last_frame = -1
+        self._files = {name: open(self.path / f"{name}.bin", "wb") for name in self.columns}
+        self._track_ids: List[np.ndarray] = []
+
+    def append(
+            self,
+            frame_no: int,
+            track_ids: np.ndarray,
+            bboxes: np.ndarray | None = None,
+            keypoints: np.ndarray | None = None,
+            zones: np.ndarray | None = None,
+            court_xy: np.ndarray | None = None
+    ) -> None:
+        """
+        Append the N tracks of one frame. Missing columns are filled with NaN (zone: -1).
+
+        Args:
+            frame_no: Frame number; must not decrease between calls.
+            track_ids: (N,) track ids.
+            bboxes: (N, 4) xyxy boxes.
+            keypoints: (N, n_keypoints, 3) keypoints.
+            zones: (N,) zone indices (`CourtZoneIndex.classify`).
+            court_xy: (N, 2) court-plane positions (`CourtProjector.project`).
+        """
+        if frame_no < self.last_frame:
+            raise ValueError(f"Frames must be appended in order, got {frame_no} after {self.last_frame}")
+        self.last_frame = frame_no
+        n = len(track_ids)
+        if n == 0:
+            return
+
+        values = {
+            "frame": np.full(n, frame_no),
+            "track_id": track_ids,
+            "bbox": bboxes,
+            "keypoints": keypoints,
+            "zone": zones,
+            "court_xy": court_xy,
+        }
+        for name, (dtype, shape) in self.columns.items():
+            value = values[name]
+            if value is None:
+                column = np.full((n, *shape), -1 if dtype.kind == "i" else np.nan, dtype=dtype)
+            else:
+                column = np.ascontiguousarray(value, dtype=dtype).reshape(n, *shape)
+            self._files[name].write(column.tobytes())
+        self._track_ids.append(np.asarray(track_ids, dtype=np.int32))
+        self.rows += n
+
+    def close(self) -> None:
+        if not self._files:
+            return
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+        track_ids = np.concatenate(self._track_ids) if self._track_ids else np.empty(0, dtype=np.int32)
+        by_track = np.argsort(track_ids, kind="stable").astype(np.int64)
+        ids, starts, counts = np.unique(track_ids[by_track], return_index=True, return_counts=True)
+        np.save(self.path / "by_track.npy", by_track)
+        np.save(self.path / "track_index.npy", np.stack([ids, starts, counts], axis=1).astype(np.int64))
+
+        meta = {
+            "version": STORE_VERSION,
+            "rows": self.rows,
+            "columns": {
+                name: {"dtype": dtype.str, "shape": list(shape)} for name, (dtype, shape) in self.columns.items()
+            },
+            **self.metadata,
+        }
+        with open(self.path / "meta.json", "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TrackStore:
+    """
+    Read-only, memory-mapped view of a track store.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported track store version: {self.meta.get('version')}")
+        self.rows = self.meta["rows"]
+
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, spec in self.meta["columns"].items():
+            shape = (self.rows, *spec["shape"])
+            if self.rows == 0:
+                self.columns[name] = np.empty(shape, dtype=spec["dtype"])
+            else:
+                self.columns[name] = np.memmap(self.path / f"{name}.bin", dtype=spec["dtype"], mode="r", shape=shape)
+        self.by_track = np.load(self.path / "by_track.npy", mmap_mode="r")
+        index = np.load(self.path / "track_index.npy")
+        self._tracks = {int(track_id): (int(start), int(count)) for track_id, start, count in index}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def track_ids(self) -> List[int]:
+        return list(self._tracks)
+
+    def frame_rows(self, start: int, end: int) -> slice:
+        """Rows of frames `start <= frame < end`."""
+        frames = self.columns["frame"]
+        return slice(int(np.searchsorted(frames, start, "left")), int(np.searchsorted(frames, end, "left")))
+
+    def frames(self, start: int, end: int) -> Dict[str, np.ndarray]:
+        """All columns for frames `start <= frame < end`, as views of the memory maps."""
+        rows = self.frame_rows(start, end)
+        return {name: column[rows] for name, column in self.columns.items()}
+
+    def track(self, track_id: int, start: int | None = None, end: int | None = None) -> Dict[str, np.ndarray]:
+        """
+        All columns of one track, in frame order, optionally restricted to `start <= frame < end`.
+        """
+        first, count = self._tracks.get(int(track_id), (0, 0))
+        rows = np.asarray(self.by_track[first:first + count])
+        if start is not None or end is not None:
+            frames = self.columns["frame"][rows]
+            keep = np.ones(len(rows), dtype=bool)
+            if start is not None:
+                keep &= frames >= start
+            if end is not None:
+                keep &= frames < end
+            rows = rows[keep]
+        return {name: column[rows] for name, column in self.columns.items()}
@@ -0,0 +1,109 @@
+"""
+Court-zone lookup raster.
+
+The zone polygons are rasterized once into a label map at frame resolution. Each zone owns one
+bit of the label, so overlapping zones (e.g. `front_zone` inside `main_zone`) are kept apart,
+and classifying any number of points is a single fancy-indexing lookup instead of one
+`cv2.pointPolygonTest` per point and zone.
+
+Example:
+    zones = CourtZoneIndex(court_coordinates, frame_size=(1920, 1080))
+    zone_ids = zones.classify(foot_points(tracked_players))   # -1 outside every zone
+    in_front = zones.contains("front_zone", foot_points(tracked_players))
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+OUTSIDE = -1
+
+
+def foot_points(tracked_objects: Sequence) -> np.ndarray:
+    """
+    (N, 2) ground contact points of norfair tracked objects: the bottom center of the box for
+    bbox tracks (`[[x1, y1], [x2, y2]]` estimates), the point itself for centroid tracks.
+    """
+    points = np.zeros((len(tracked_objects), 2), dtype=np.float32)
+    for i, tracked_object in enumerate(tracked_objects):
+        estimate = np.asarray(tracked_object.estimate, dtype=np.float32)
+        if len(estimate) >= 2:
+            points[i] = (estimate[0, 0] + estimate[1, 0]) / 2, max(estimate[0, 1], estimate[1, 1])
+        else:
+            points[i] = estimate[0]
+    return points
+
+
+class CourtZoneIndex:
+    """
+    Integer label map of the court zones of a fixed camera view.
+    """
+
+    def __init__(self, zones: Dict[str, Sequence[Sequence[float]]], frame_size: Tuple[int, int]):
+        """
+        Args:
+            zones: Zone name -> polygon points in pixels, e.g. the `main_zone`/`front_zone` dict
+                of `players-tracking.py`. When zones overlap, `classify` reports the one listed last.
+            frame_size: (width, height) of the frames.
+        """
+        if len(zones) > 32:
+            raise ValueError(f"At most 32 zones are supported, got {len(zones)}")
+        self.names: List[str] = list(zones)
+        self.width, self.height = frame_size
+        dtype = np.uint8 if len(zones) <= 8 else np.uint16 if len(zones) <= 16 else np.uint32
+
+        self.labels = np.zeros((self.height, self.width), dtype=dtype)
+        mask = np.empty((self.height, self.width), dtype=np.uint8)
+        for bit, polygon in enumerate(zones.values()):
+            mask.fill(0)
+            cv2.fillPoly(mask, [np.round(np.asarray(polygon)).astype(np.int32)], 1)
+            self.labels |= mask.astype(dtype) << bit
+
+        # Label code -> index of the last listed zone whose bit is set (-1 for no zone)
+        codes = np.arange(1 << len(zones)) if len(zones) <= 16 else None
+        self._code_to_zone = None if codes is None else self._highest_bit(codes)
+
+    @staticmethod
+    def _highest_bit(codes: np.ndarray) -> np.ndarray:
+        zone = np.full(codes.shape, OUTSIDE, dtype=np.int16)
+        nonzero = codes > 0
+        zone[nonzero] = np.floor(np.log2(codes[nonzero])).astype(np.int16)
+        return zone
+
+    def zone_id(self, name: str) -> int:
+        return self.names.index(name)
+
+    def lookup(self, points: np.ndarray) -> np.ndarray:
+        """
+        Label codes (one bit per zone) of `points`.
+
+        Args:
+            points: (..., 2) array of x, y pixel coordinates. Points outside the frame get 0.
+
+        Returns:
+            Array of shape `points.shape[:-1]`.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        xy = np.round(points).astype(np.int64) if points.size else np.zeros(points.shape, dtype=np.int64)
+        x, y = xy[..., 0], xy[..., 1]
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        codes = np.zeros(x.shape, dtype=self.labels.dtype)
+        codes[inside] = self.labels[y[inside], x[inside]]
+        return codes
+
+    def classify(self, points: np.ndarray) -> np.ndarray:
+        """
+        Zone index (position in `names`) of each point, -1 when it lies in no zone.
+        """
+        codes = self.lookup(points)
+        if self._code_to_zone is not None:
+            return self._code_to_zone[codes]
+        return self._highest_bit(codes.astype(np.int64))
+
+    def contains(self, name: str, points: np.ndarray) -> np.ndarray:
+        """Boolean array telling which points lie inside zone `name`."""
+        return (self.lookup(points) >> self.zone_id(name)) & 1 == 1
+
+    def zone_names(self, points: np.ndarray) -> List[str | None]:
+        """Zone name of each point of an (N, 2) array (None outside every zone)."""
+        return [self.names[i] if i != OUTSIDE else None for i in self.classify(points).ravel()]
@@ -0,0 +1,8 @@
+"""
+Video decoding and encoding utilities shared by the demo and the scripts.
+"""
+from .frame_source import FrameSource, OpenCVFrameSource, PyAVFrameSource, open_frame_source
+from .writer import OpenCVVideoWriter, PyAVVideoWriter, VideoWriter, open_video_writer
+from .index import VideoIndex
+from .clips import ClipSpec, write_clips
+from .sidecar import fingerprint, load_sidecar, save_sidecar, sidecar_path
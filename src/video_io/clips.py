@@ -0,0 +1,110 @@
+"""
+Single-pass clip extraction.
+
+All clips of a video are planned first as `ClipSpec`s. `write_clips` then decodes the union of
+their frame ranges once, in order, and hands every frame to each clip writer that is open at that
+frame, including the writers of horizontally flipped variants. Overlapping clips (e.g. the service
+start and end windows of a short serve) share the decoded frames instead of seeking back.
+
+Example:
+    clips = [
+        ClipSpec("service", 120, 150, Path("service/a.mp4")),
+        ClipSpec("service", 120, 150, Path("service/a_flipped_LR.mp4"), flip_lr=True),
+    ]
+    write_clips(VideoIndex.load_or_build(video), clips, fps=30, frame_size=(1920, 1080))
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+from .index import VideoIndex
+from .writer import open_video_writer
+
+
+@dataclass(frozen=True)
+class ClipSpec:
+    """
+    One output clip: frames `[start, end)` of a video.
+
+    Attributes:
+        label: Class of the clip (e.g. "service", "inplay", "noplay").
+        start: First frame.
+        end: One past the last frame.
+        output_file: Where the clip is written.
+        flip_lr: Write the horizontally flipped frames.
+    """
+    label: str
+    start: int
+    end: int
+    output_file: Path
+    flip_lr: bool = False
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+
+def write_clips(
+        index: VideoIndex,
+        clips: Sequence[ClipSpec],
+        fps: float,
+        frame_size: tuple,
+        encoder: str = "opencv",
+        encoder_options: dict | None = None,
+        open_writer: Callable[[ClipSpec], object] | None = None
+) -> Dict[ClipSpec, int]:
+    """
+    Decode the frames covered by `clips` once and write every clip.
+
+    Args:
+        index: Index of the source video.
+        clips: Clips to write; clips with the same output file are written once.
+        fps: Output frame rate.
+        frame_size: (width, height) of the frames.
+        encoder: `open_video_writer` backend.
+        encoder_options: `open_video_writer` options.
+        open_writer: Custom factory returning an object with `write(frame)` / `release()` for a
+            clip; defaults to an `open_video_writer` on `clip.output_file`.
+
+    Returns:
+        Number of frames written per clip (shorter than `clip.length` if the video ends early).
+    """
+    if open_writer is None:
+        def open_writer(clip: ClipSpec):
+            return open_video_writer(clip.output_file, fps, frame_size, backend=encoder, **(encoder_options or {}))
+
+    unique = {clip.output_file: clip for clip in clips if clip.length > 0}
+    pending: List[ClipSpec] = sorted(unique.values(), key=lambda clip: (clip.start, clip.end))
+    written: Dict[ClipSpec, int] = {clip: 0 for clip in pending}
+    active: Dict[ClipSpec, object] = {}
+    next_clip = 0
+
+    try:
+        for frame_no, frame in index.get_frames([(clip.start, clip.end) for clip in pending]):
+            while next_clip < len(pending) and pending[next_clip].start <= frame_no:
+                clip = pending[next_clip]
+                active[clip] = open_writer(clip)
+                next_clip += 1
+
+            flipped = None
+            for clip, writer in list(active.items()):
+                if frame_no >= clip.end:
+                    writer.release()
+                    del active[clip]
+                    continue
+                if clip.flip_lr:
+                    if flipped is None:
+                        flipped = np.ascontiguousarray(frame[:, ::-1])
+                    writer.write(flipped)
+                else:
+                    writer.write(frame)
+                written[clip] += 1
+                if frame_no == clip.end - 1:
+                    writer.release()
+                    del active[clip]
+    finally:
+        for writer in active.values():
+            writer.release()
+    return written
@@ -0,0 +1,161 @@
+"""
+Frame sources: iterate over the decoded frames of a video file.
+
+`PyAVFrameSource` decodes with FFmpeg's frame/slice threading and can produce a second,
+downscaled copy of every frame (e.g. at the VideoMAE input size) directly from the decoded
+YUV picture, so the small stream costs one extra swscale conversion instead of a second
+decode or a Python-side `cv2.resize` of the full BGR frame.
+"""
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import av
+import cv2
+import numpy as np
+
+VIDEOMAE_INPUT_SIZE = (224, 224)
+
+
+class FrameSource:
+    """
+    Common interface of the frame sources.
+
+    Attributes:
+        width: Frame width in pixels.
+        height: Frame height in pixels.
+        fps: Frames per second (rounded to int, like `cv2.CAP_PROP_FPS` is used elsewhere).
+        total_frames: Number of frames reported by the container (may be an estimate).
+    """
+    width: int
+    height: int
+    fps: int
+    total_frames: int
+
+    def __init__(self, video_path: str | Path, secondary_size: Tuple[int, int] | None = None):
+        """
+        Args:
+            video_path: Path to the video file.
+            secondary_size: Optional (width, height) of the downscaled stream yielded by `frame_pairs`.
+        """
+        self.video_path = Path(video_path)
+        self.secondary_size = secondary_size
+
+    def frames(self) -> Iterator[np.ndarray]:
+        """Yield full resolution BGR frames."""
+        raise NotImplementedError
+
+    def frame_pairs(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (full resolution, downscaled) BGR frame pairs."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def __iter__(self):
+        return self.frames()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class OpenCVFrameSource(FrameSource):
+    """
+    `cv2.VideoCapture` backed frame source; the downscaled stream is made with `cv2.resize`.
+    """
+
+    def __init__(self, video_path: str | Path, secondary_size: Tuple[int, int] | None = None):
+        super().__init__(video_path, secondary_size)
+        self.cap = cv2.VideoCapture(self.video_path.as_posix())
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Could not open video: {video_path}")
+        self.width, self.height, self.fps, _, self.total_frames = [int(self.cap.get(prop)) for prop in range(3, 8)]
+
+    def frames(self) -> Iterator[np.ndarray]:
+        while True:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            yield frame
+
+    def frame_pairs(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        size = self.secondary_size or VIDEOMAE_INPUT_SIZE
+        for frame in self.frames():
+            yield frame, cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def close(self) -> None:
+        self.cap.release()
+
+
+class PyAVFrameSource(FrameSource):
+    """
+    PyAV backed frame source with multithreaded decoding.
+    """
+
+    def __init__(
+            self,
+            video_path: str | Path,
+            secondary_size: Tuple[int, int] | None = None,
+            thread_type: str = "AUTO",
+            thread_count: int = 0
+    ):
+        """
+        Args:
+            video_path: Path to the video file.
+            secondary_size: Optional (width, height) of the downscaled stream yielded by `frame_pairs`.
+            thread_type: FFmpeg threading mode: "AUTO", "FRAME", "SLICE" or "NONE".
+            thread_count: Number of decoder threads; 0 lets FFmpeg pick one per core.
+        """
+        super().__init__(video_path, secondary_size)
+        try:
+            self.container = av.open(self.video_path.as_posix())
+        except av.error.FFmpegError as e:
+            raise RuntimeError(f"Could not open video: {video_path}") from e
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = thread_type
+        self.stream.codec_context.thread_count = thread_count
+
+        self.width = self.stream.codec_context.width
+        self.height = self.stream.codec_context.height
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        self.fps = int(round(float(rate))) if rate else 0
+        self.total_frames = self.stream.frames
+        if not self.total_frames and self.stream.duration and self.stream.time_base:
+            self.total_frames = int(float(self.stream.duration * self.stream.time_base) * float(rate or 0))
+
+    def frames(self) -> Iterator[np.ndarray]:
+        for frame in self.container.decode(self.stream):
+            yield frame.to_ndarray(format="bgr24")
+
+    def frame_pairs(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        width, height = self.secondary_size or VIDEOMAE_INPUT_SIZE
+        for frame in self.container.decode(self.stream):
+            small = frame.reformat(width=width, height=height, format="bgr24")
+            yield frame.to_ndarray(format="bgr24"), small.to_ndarray()
+
+    def close(self) -> None:
+        self.container.close()
+
+
+def open_frame_source(
+        video_path: str | Path,
+        backend: str = "opencv",
+        secondary_size: Tuple[int, int] | None = None,
+        **kwargs
+) -> FrameSource:
+    """
+    Open a video with the requested decoder backend.
+
+    Args:
+        video_path: Path to the video file.
+        backend: "opencv" or "pyav".
+        secondary_size: Optional (width, height) of the downscaled stream yielded by `frame_pairs`.
+        **kwargs: Backend specific options, e.g. `thread_count` for PyAV.
+    """
+    if backend == "opencv":
+        return OpenCVFrameSource(video_path, secondary_size=secondary_size)
+    if backend == "pyav":
+        return PyAVFrameSource(video_path, secondary_size=secondary_size, **kwargs)
+    raise ValueError(f"Unknown decoder backend: {backend}")
@@ -0,0 +1,186 @@
+"""
+Keyframe index and sequential-read scheduler.
+
+`VideoIndex` demuxes a video once (no decoding) to record the presentation timestamp of every
+frame and which frames are keyframes, and caches that on disk next to the video. With the
+index, `get_frames(ranges)` serves arbitrary frame ranges with as few decodes as possible:
+the ranges are sorted and merged, consecutive ranges are served by one forward decode, and a
+seek is only issued when the next range starts after a later keyframe than the current
+decode position (i.e. when seeking is cheaper than decoding forward).
+"""
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import av
+import numpy as np
+
+from .sidecar import load_sidecar, save_sidecar, sidecar_path
+
+INDEX_VERSION = 1
+
+
+class VideoIndex:
+    """
+    Frame timestamps and keyframe positions of one video.
+
+    Example:
+        index = VideoIndex.load_or_build("match.mp4")
+        for frame_no, frame in index.get_frames([(300, 330), (100, 130), (310, 340)]):
+            ...
+    """
+
+    def __init__(self, video_path: str | Path, pts: np.ndarray, keyframes: np.ndarray,
+                 time_base: float, fps: float, width: int, height: int):
+        """
+        Args:
+            video_path: Path to the video file.
+            pts: (N,) presentation timestamps in frame order.
+            keyframes: Sorted frame indices of the keyframes.
+            time_base: Stream time base in seconds.
+            fps: Average frame rate.
+            width: Frame width.
+            height: Frame height.
+        """
+        self.video_path = Path(video_path)
+        self.pts = pts
+        self.keyframes = keyframes
+        self.time_base = time_base
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self._pts_to_frame: Dict[int, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.pts)
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Frame timestamps in seconds."""
+        return self.pts.astype(np.float64) * self.time_base
+
+    @staticmethod
+    def cache_path(video_path: str | Path) -> Path:
+        return sidecar_path(video_path)
+
+    @classmethod
+    def build(cls, video_path: str | Path) -> "VideoIndex":
+        """Demux the video stream once and collect frame timestamps and keyframe flags."""
+        video_path = Path(video_path)
+        with av.open(video_path.as_posix()) as container:
+            stream = container.streams.video[0]
+            pts, keyframe = [], []
+            for packet in container.demux(stream):
+                if packet.pts is None:
+                    continue
+                pts.append(packet.pts)
+                keyframe.append(packet.is_keyframe)
+            rate = stream.average_rate or stream.guessed_rate
+            time_base = float(stream.time_base)
+            width, height = stream.codec_context.width, stream.codec_context.height
+
+        # Packets come in decode order; sort them by presentation time to get frame order.
+        pts = np.asarray(pts, dtype=np.int64)
+        order = np.argsort(pts, kind="stable")
+        keyframes = np.flatnonzero(np.asarray(keyframe, dtype=bool)[order])
+        return cls(video_path, pts[order], keyframes, time_base, float(rate or 0), width, height)
+
+    def save(self, path: str | Path | None = None) -> Path:
+        data = {
+            "time_base": self.time_base,
+            "fps": self.fps,
+            "width": self.width,
+            "height": self.height,
+            "pts": self.pts.tolist(),
+            "keyframes": self.keyframes.tolist(),
+        }
+        return save_sidecar(self.video_path, INDEX_VERSION, data, path)
+
+    @classmethod
+    def load_or_build(cls, video_path: str | Path, cache: bool = True) -> "VideoIndex":
+        """
+        Load the cached index of `video_path`, or build (and cache) it when missing or stale.
+        """
+        video_path = Path(video_path)
+        data = load_sidecar(video_path, INDEX_VERSION) if cache else None
+        if data is not None:
+            return cls(
+                video_path,
+                pts=np.asarray(data["pts"], dtype=np.int64),
+                keyframes=np.asarray(data["keyframes"], dtype=np.int64),
+                time_base=data["time_base"], fps=data["fps"], width=data["width"], height=data["height"]
+            )
+        index = cls.build(video_path)
+        if cache:
+            index.save()
+        return index
+
+    def keyframe_before(self, frame_no: int) -> int:
+        """Index of the last keyframe at or before `frame_no`."""
+        i = np.searchsorted(self.keyframes, frame_no, side="right") - 1
+        return int(self.keyframes[max(i, 0)])
+
+    @staticmethod
+    def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Sort half-open `[start, end)` ranges and merge the overlapping or touching ones."""
+        merged: List[List[int]] = []
+        for start, end in sorted((int(s), int(e)) for s, e in ranges if e > s):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [(start, end) for start, end in merged]
+
+    def plan_reads(self, ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Group the requested ranges into sequential reads `(seek_keyframe, end)`.
+
+        A new read (seek) only starts when the next range begins at or after a keyframe that is
+        past the current decode position; otherwise decoding forward is never more work.
+        """
+        reads: List[List[int]] = []
+        for start, end in self.merge_ranges(ranges):
+            start, end = max(start, 0), min(end, len(self))
+            if start >= end:
+                continue
+            keyframe = self.keyframe_before(start)
+            if reads and keyframe <= reads[-1][1]:
+                reads[-1][1] = max(reads[-1][1], end)
+            else:
+                reads.append([keyframe, end])
+        return [(keyframe, end) for keyframe, end in reads]
+
+    def get_frames(self, ranges: Iterable[Tuple[int, int]],
+                   thread_count: int = 0) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Decode the frames of the half-open `[start, end)` ranges.
+
+        Frames are yielded once each in ascending frame order, even if the ranges overlap or
+        were given out of order.
+
+        Yields:
+            (frame index, BGR frame) tuples.
+        """
+        merged = self.merge_ranges(ranges)
+        if not merged:
+            return
+        if self._pts_to_frame is None:
+            self._pts_to_frame = {int(p): i for i, p in enumerate(self.pts)}
+        starts = np.asarray([start for start, _ in merged])
+        ends = np.asarray([end for _, end in merged])
+
+        with av.open(self.video_path.as_posix()) as container:
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"
+            stream.codec_context.thread_count = thread_count
+            for keyframe, end in self.plan_reads(merged):
+                container.seek(int(self.pts[keyframe]), backward=True, any_frame=False, stream=stream)
+                for frame in container.decode(stream):
+                    frame_no = self._pts_to_frame.get(frame.pts)
+                    if frame_no is None or frame_no < keyframe:
+                        continue
+                    if frame_no >= end:
+                        break
+                    # Is the frame inside one of the requested ranges?
+                    i = np.searchsorted(starts, frame_no, side="right") - 1
+                    if i >= 0 and frame_no < ends[i]:
+                        yield frame_no, frame.to_ndarray(format="bgr24")
@@ -0,0 +1,48 @@
+"""
+JSON caches stored next to the file they describe, e.g. `match.mp4.index.json`.
+
+A cache records a format version and a fingerprint of its source file (size and modification
+time). It is only used while both still match; otherwise the caller rebuilds and saves it again.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def fingerprint(path: str | Path) -> str:
+    """Cheap change detector of a file: md5 of its size and modification time."""
+    stat = os.stat(path)
+    return hashlib.md5(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+
+
+def sidecar_path(source: str | Path, suffix: str = ".index.json") -> Path:
+    source = Path(source)
+    return source.with_name(source.name + suffix)
+
+
+def load_sidecar(source: str | Path, version: int, path: str | Path | None = None) -> dict | None:
+    """
+    The cached data of `source`, or None when the cache is missing, of another version or stale.
+
+    Args:
+        source: File the cache describes.
+        version: Expected format version.
+        path: Cache file; `sidecar_path(source)` by default.
+    """
+    path = Path(path) if path is not None else sidecar_path(source)
+    if not path.is_file():
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("version") != version or data.get("fingerprint") != fingerprint(source):
+        return None
+    return data
+
+
+def save_sidecar(source: str | Path, version: int, data: dict, path: str | Path | None = None) -> Path:
+    """Save `data` with the version and the current fingerprint of `source`; returns the cache file."""
+    path = Path(path) if path is not None else sidecar_path(source)
+    with open(path, "w") as f:
+        json.dump({"version": version, "fingerprint": fingerprint(source), **data}, f)
+    return path
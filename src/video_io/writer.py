@@ -0,0 +1,177 @@
+"""
+Video writers for annotated output and generated clips.
+
+`OpenCVVideoWriter` keeps the previous `cv2.VideoWriter` + mp4v behaviour. `PyAVVideoWriter`
+encodes with libx264 (or any FFmpeg encoder) and exposes the encoder thread count, preset
+and CRF, and can downscale the output while encoding.
+"""
+from fractions import Fraction
+from pathlib import Path
+from typing import Tuple
+
+import av
+import cv2
+import numpy as np
+
+# Pixel formats with 4:2:0 chroma subsampling, which need an even width and height
+SUBSAMPLED_PIX_FMTS = ('yuv420p', 'yuvj420p', 'nv12', 'nv21')
+
+
+class VideoWriter:
+    """
+    Common interface of the video writers: `write(frame)` BGR frames, then `release()`.
+    """
+
+    def __init__(
+            self,
+            output_path: str | Path,
+            fps: float,
+            frame_size: Tuple[int, int],
+            output_size: Tuple[int, int] | None = None
+    ):
+        """
+        Args:
+            output_path: Path of the output video file.
+            fps: Frame rate of the output video.
+            frame_size: (width, height) of the frames passed to `write`.
+            output_size: Optional (width, height) of the encoded video, e.g. to store a smaller copy.
+        """
+        self.output_path = Path(output_path)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.fps = fps
+        self.frame_size = tuple(frame_size)
+        self.output_size = tuple(output_size) if output_size else self.frame_size
+
+    def write(self, frame: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def release(self) -> None:
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class OpenCVVideoWriter(VideoWriter):
+    """
+    `cv2.VideoWriter` backend.
+    """
+
+    def __init__(
+            self,
+            output_path: str | Path,
+            fps: float,
+            frame_size: Tuple[int, int],
+            output_size: Tuple[int, int] | None = None,
+            fourcc: str = 'mp4v'
+    ):
+        super().__init__(output_path, fps, frame_size, output_size)
+        self.writer = cv2.VideoWriter(
+            self.output_path.as_posix(),
+            cv2.VideoWriter_fourcc(*fourcc),
+            fps,
+            self.output_size
+        )
+
+    def write(self, frame: np.ndarray) -> None:
+        if self.output_size != self.frame_size:
+            frame = cv2.resize(frame, self.output_size, interpolation=cv2.INTER_AREA)
+        self.writer.write(frame)
+
+    def release(self) -> None:
+        self.writer.release()
+
+
+class PyAVVideoWriter(VideoWriter):
+    """
+    PyAV (FFmpeg) backend, libx264 by default.
+    """
+
+    def __init__(
+            self,
+            output_path: str | Path,
+            fps: float,
+            frame_size: Tuple[int, int],
+            output_size: Tuple[int, int] | None = None,
+            codec: str = 'libx264',
+            preset: str = 'veryfast',
+            crf: int = 23,
+            threads: int = 0,
+            pix_fmt: str = 'yuv420p'
+    ):
+        """
+        Args:
+            output_path: Path of the output video file.
+            fps: Frame rate of the output video.
+            frame_size: (width, height) of the frames passed to `write`.
+            output_size: Optional (width, height) of the encoded video.
+            codec: FFmpeg encoder name.
+            preset: x264/x265 speed preset, e.g. "ultrafast", "veryfast", "medium".
+            crf: Constant rate factor; lower is better quality and bigger files.
+            threads: Number of encoder threads; 0 lets FFmpeg pick one per core.
+            pix_fmt: Pixel format of the encoded stream.
+
+        Raises:
+            ValueError: `fps` is not positive, or the encoded size is not positive, or odd with a 4:2:0
+                `pix_fmt`. Checked before the output file is created.
+        """
+        if not fps > 0:
+            raise ValueError(f"fps must be positive, got {fps}")
+        width, height = output_size or frame_size
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Output size must be positive, got {width}x{height}")
+        if pix_fmt in SUBSAMPLED_PIX_FMTS and (width % 2 or height % 2):
+            raise ValueError(f"{pix_fmt} needs an even output width and height, got {width}x{height}")
+        super().__init__(output_path, fps, frame_size, output_size)
+        self.container = av.open(self.output_path.as_posix(), mode='w')
+        self.stream = self.container.add_stream(
+            codec,
+            rate=Fraction(fps).limit_denominator(1001),
+            options={'preset': preset, 'crf': str(crf)}
+        )
+        self.stream.width, self.stream.height = self.output_size
+        self.stream.pix_fmt = pix_fmt
+        self.stream.thread_type = 'AUTO'
+        self.stream.codec_context.thread_count = threads
+
+    def write(self, frame: np.ndarray) -> None:
+        video_frame = av.VideoFrame.from_ndarray(frame, format='bgr24')
+        # Scale and convert to the stream format in one swscale pass
+        width, height = self.output_size
+        video_frame = video_frame.reformat(width=width, height=height, format=self.stream.pix_fmt)
+        for packet in self.stream.encode(video_frame):
+            self.container.mux(packet)
+
+    def release(self) -> None:
+        for packet in self.stream.encode():
+            self.container.mux(packet)
+        self.container.close()
+
+
+def open_video_writer(
+        output_path: str | Path,
+        fps: float,
+        frame_size: Tuple[int, int],
+        backend: str = 'opencv',
+        output_size: Tuple[int, int] | None = None,
+        **kwargs
+) -> VideoWriter:
+    """
+    Open a video writer with the requested backend.
+
+    Args:
+        output_path: Path of the output video file.
+        fps: Frame rate of the output video.
+        frame_size: (width, height) of the frames passed to `write`.
+        backend: "opencv" (mp4v) or "pyav" (libx264 by default).
+        output_size: Optional (width, height) of the encoded video.
+        **kwargs: Backend specific options, e.g. `preset`, `crf` and `threads` for PyAV.
+    """
+    if backend == 'opencv':
+        return OpenCVVideoWriter(output_path, fps, frame_size, output_size=output_size, **kwargs)
+    if backend == 'pyav':
+        return PyAVVideoWriter(output_path, fps, frame_size, output_size=output_size, **kwargs)
+    raise ValueError(f"Unknown encoder backend: {backend}")